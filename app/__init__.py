@@ -1,28 +1,66 @@
 import os
-from flask import Flask, jsonify
+import time
+from flask import Flask, Response, g, jsonify, request
 from flask_apscheduler import APScheduler
-import pymongo
 
 from app.core.config import Config
 from app.core.database import db, init_db
+from app.core.startup_profile import profiler
 
 scheduler = APScheduler()
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
+    if getattr(config_class, "PROFILE_STARTUP", False):
+        profiler.enable()
+
+    with profiler.phase('flask app + config'):
+        app = Flask(__name__)
+        app.config.from_object(config_class)
+
+    # jsonify goes through the configured JSON backend (orjson by default)
+    with profiler.phase('json encoder'):
+        from app.core.json_encoding import encoder_for
+        app.json_encoder = encoder_for(app.config)
+
+    # Mongo command/pool listeners must be registered before the client is created
+    if app.config.get("METRICS_ENABLED", True):
+        with profiler.phase('metrics listeners'):
+            from app.core import metrics
+            metrics.install_mongo_listeners()
+            metrics.registry.configure(
+                multiproc_dir=app.config.get("METRICS_MULTIPROC_DIR"),
+                flush_seconds=app.config.get("METRICS_FLUSH_SECONDS"),
+            )
 
     # Initialize MongoEngine
-    init_db(app)
+    with profiler.phase('database'):
+        init_db(app)
+
+    with profiler.phase('token cache'):
+        from app.core.security import token_cache
+        token_cache.configure(app.config)
+
+    if app.config.get("SUBSCRIPTION_CACHE_BACKEND"):
+        with profiler.phase('subscription cache'):
+            from app.services.subscription_cache import subscription_cache
+            subscription_cache.configure(app.config)
+
+    if app.config.get("RATE_LIMIT_BACKEND"):
+        with profiler.phase('rate limiter'):
+            from app.core.rate_limit import rate_limiter
+            rate_limiter.configure(app.config)
 
     # Initialize APScheduler if enabled
     if app.config.get("SCHEDULER_API_ENABLED", False):
         if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or app.config.get("FLASK_ENV") != "development":
             if not scheduler.running:
                 try:
-                    scheduler.init_app(app)
-                    from app.tasks import expiration_checker  # noqa: F401
-                    scheduler.start()
+                    with profiler.phase('scheduler'):
+                        scheduler.init_app(app)
+                        from app.tasks import expiration_checker  # noqa: F401
+                        if app.config.get("WEBHOOKS_ENABLED", False):
+                            from app.tasks import webhook_delivery  # noqa: F401
+                        scheduler.start()
                     app.logger.info("APScheduler initialized and started.")
                 except Exception as e:
                     app.logger.error(f"Failed to initialize or start APScheduler: {e}")
@@ -34,66 +72,93 @@ def create_app(config_class=Config):
         app.logger.info("APScheduler is disabled via config.")
 
     # Register Blueprints
-    from app.api.subscriptions_api import subscriptions_bp
-    from app.api.plans_api import plans_bp
-    app.register_blueprint(subscriptions_bp, url_prefix='/api')
-    app.register_blueprint(plans_bp, url_prefix='/api')
+    with profiler.phase('blueprints'):
+        from app.api.subscriptions_api import subscriptions_bp
+        from app.api.plans_api import plans_bp
+        from app.api.analytics_api import analytics_bp
+        from app.api.events_api import events_bp
+        from app.api.webhooks_api import webhooks_bp
+        app.register_blueprint(subscriptions_bp, url_prefix='/api')
+        app.register_blueprint(plans_bp, url_prefix='/api')
+        app.register_blueprint(analytics_bp, url_prefix='/api')
+        app.register_blueprint(events_bp, url_prefix='/api')
+        app.register_blueprint(webhooks_bp, url_prefix='/api')
     app.logger.info("Blueprints registered.")
 
     # Register Error Handlers
-    from app.utils import error_handlers
-    error_handlers.register_error_handlers(app)
+    with profiler.phase('error handlers'):
+        from app.utils import error_handlers
+        error_handlers.register_error_handlers(app)
     app.logger.info("Error handlers registered.")
 
+    # Negotiated gzip/brotli compression of JSON responses
+    with profiler.phase('compression'):
+        from app.core.compression import init_compression
+        init_compression(app)
+
+    # Register CLI commands
+    with profiler.phase('cli commands'):
+        from app import cli
+        cli.register_commands(app)
+
     # Import models
-    from app.models import plan, subscription  # noqa: F401
+    with profiler.phase('models'):
+        from app.models import plan, subscription  # noqa: F401
     app.logger.info("Models module imported.")
 
-    # Health check endpoint
+    # Health endpoints answer from state refreshed by a background prober. It is
+    # started by the first health request, so CLI and task apps never run it.
+    with profiler.phase('health prober'):
+        from app.core.health import health_prober
+
+    def scheduler_status():
+        if not scheduler:
+            return "Scheduler object not found"
+        if not app.config.get("SCHEDULER_API_ENABLED", False):
+            return "Scheduler disabled by config"
+        return "Scheduler running" if scheduler.running else "Scheduler initialized but not running"
+
+    def db_connection():
+        return db.connection
+
     @app.route('/health')
     def health_check():
-        db_status = "DB Not Connected or Check Failed"
-        db_name_str = ""
-        scheduler_status = "Scheduler Not Initialized or Not Running"
-        http_status_code = 503
-
-        try:
-            if db.connection:
-                admin_db = db.connection.admin
-                admin_db.command('ping')
-
-                default_db_name = db.connection.get_default_database().name
-                db_name_str = f" (Default DB: {default_db_name})"
-                db_status = "DB Connected"
-                http_status_code = 200
-            else:
-                db_status = "DB Connection object not available"
-
-            if scheduler:
-                if app.config.get("SCHEDULER_API_ENABLED", False):
-                    scheduler_status = "Scheduler running" if scheduler.running else "Scheduler initialized but not running"
-                else:
-                    scheduler_status = "Scheduler disabled by config"
-            else:
-                scheduler_status = "Scheduler object not found"
-
-        except pymongo.errors.ConnectionFailure as e:
-            app.logger.error(f"Health check DB connection failure: {e}")
-            db_status = "DB Connection Failure"
-            http_status_code = 503
-        except pymongo.errors.PyMongoError as e:
-            app.logger.error(f"Health check DB PyMongo error: {e}")
-            db_status = f"DB Error ({type(e).__name__})"
-            http_status_code = 503
-        except Exception as e:
-            app.logger.error(f"Health check failed with unexpected error: {e}, Type: {type(e)}")
-            db_status = "Unexpected Error during health check"
-            http_status_code = 503
-
-        final_status_message = f"Status: {'OK' if http_status_code == 200 else 'ERROR'}"
-        final_status_message += f" - {db_status}{db_name_str}"
-        final_status_message += f" - {scheduler_status}"
-        return final_status_message, http_status_code
+        health_prober.ensure_running(app, db_connection, scheduler_status)
+        payload, http_status_code = health_prober.health(app.config)
+        return jsonify(payload), http_status_code
+
+    @app.route('/health/live')
+    def liveness_check():
+        health_prober.ensure_running(app, db_connection, scheduler_status)
+        payload, http_status_code = health_prober.liveness()
+        return jsonify(payload), http_status_code
+
+    @app.route('/health/ready')
+    def readiness_check():
+        health_prober.ensure_running(app, db_connection, scheduler_status)
+        payload, http_status_code = health_prober.readiness(app.config)
+        return jsonify(payload), http_status_code
+
+    # Metrics: per-route latency and status counts for blueprint routes
+    if app.config.get("METRICS_ENABLED", True):
+        from app.core import metrics
+
+        @app.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def record_request_metrics(response):
+            started = g.get('request_started')
+            if started is not None and request.blueprint and request.url_rule is not None:
+                labels = dict(blueprint=request.blueprint, route=request.url_rule.rule, method=request.method)
+                metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, **labels)
+                metrics.HTTP_REQUESTS.inc(status=response.status_code, **labels)
+            return response
+
+        @app.route('/metrics')
+        def metrics_endpoint():
+            return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
 
     # --- TEST TOKEN ENDPOINT (FOR DEBUG MODE ONLY) ---
     if app.debug:
@@ -114,5 +179,7 @@ def create_app(config_class=Config):
     app.logger.info(f"Flask app created with env: {app.config.get('FLASK_ENV')}")
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
         app.logger.info("Running in Werkzeug main process.")
+    if profiler.enabled:
+        app.logger.info("Startup profile:\n" + profiler.report())
 
     return app
@@ -0,0 +1,42 @@
+from datetime import date, datetime, timedelta, timezone
+
+from flask import Blueprint, request, jsonify, current_app
+
+from app.core.security import admin_required
+from app.services.analytics_service import AnalyticsService
+
+analytics_bp = Blueprint('analytics_bp', __name__)
+
+
+def _parse_day(value: str | None, default: date) -> date:
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+@analytics_bp.route('/analytics/subscriptions', methods=['GET'])
+@admin_required
+def get_subscription_analytics_endpoint():
+    """
+    Daily active subscribers, MRR and churn per plan, read from the rollups
+    (see app/services/analytics_service.py). Query parameters: from and to
+    (YYYY-MM-DD, UTC, inclusive); the default is the last 30 days.
+    """
+    max_days = current_app.config.get("ANALYTICS_MAX_DAYS", 366)
+    try:
+        end = _parse_day(request.args.get("to"), datetime.now(timezone.utc).date())
+        start = _parse_day(request.args.get("from"), end - timedelta(days=29))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start > end:
+        return jsonify({"error": "'from' must not be after 'to'."}), 400
+    if (end - start).days + 1 > max_days:
+        return jsonify({"error": f"Date range too long: at most {max_days} days."}), 400
+    try:
+        return jsonify(AnalyticsService.daily_report(start, end)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error building subscription analytics for {start}..{end}: {e}")
+        return jsonify({"error": "Could not retrieve subscription analytics."}), 500
@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify, current_app
+
+from app.core.security import admin_required
+from app.services.outbox_service import OutboxService
+
+events_bp = Blueprint('events_bp', __name__)
+
+
+def _parse_seq(value, name: str) -> int:
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer.")
+    if seq < 0:
+        raise ValueError(f"'{name}' must not be negative.")
+    return seq
+
+
+@events_bp.route('/events', methods=['GET'])
+@admin_required
+def list_events_endpoint():
+    """
+    The next batch of subscription lifecycle events from the outbox (see
+    app/services/outbox_service.py), in sequence order. Query parameters:
+    after (the last sequence number already read) or consumer (read after
+    that consumer's checkpoint), and limit.
+    """
+    default_limit = current_app.config.get("OUTBOX_READ_BATCH_SIZE", 100)
+    max_limit = current_app.config.get("OUTBOX_MAX_READ_BATCH_SIZE", 1000)
+    consumer = request.args.get("consumer")
+    try:
+        limit = _parse_seq(request.args.get("limit", default_limit), "limit")
+        if not 1 <= limit <= max_limit:
+            raise ValueError(f"'limit' must be between 1 and {max_limit}.")
+        if "after" in request.args:
+            after = _parse_seq(request.args["after"], "after")
+        elif consumer:
+            after = OutboxService.get_checkpoint(consumer)["seq"]
+        else:
+            after = 0
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        events = OutboxService.read(after, limit)
+    except Exception as e:
+        current_app.logger.error(f"Error reading subscription events after {after}: {e}")
+        return jsonify({"error": "Could not retrieve subscription events."}), 500
+    return jsonify({"events": events, "last_seq": events[-1]["seq"] if events else after}), 200
+
+
+@events_bp.route('/events/checkpoints/<string:consumer>', methods=['GET'])
+@admin_required
+def get_event_checkpoint_endpoint(consumer: str):
+    return jsonify(OutboxService.get_checkpoint(consumer)), 200
+
+
+@events_bp.route('/events/checkpoints/<string:consumer>', methods=['PUT'])
+@admin_required
+def commit_event_checkpoint_endpoint(consumer: str):
+    """Records that `consumer` has processed every event up to {"seq": n}. Checkpoints never move back."""
+    data = request.get_json(silent=True) or {}
+    try:
+        seq = _parse_seq(data.get("seq"), "seq")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(OutboxService.commit_checkpoint(consumer, seq)), 200
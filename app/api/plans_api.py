@@ -1,25 +1,28 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from app.services.plan_service import PlanService
-from app.schemas.plan_schemas import PlanResponse
+from app.utils.http_caching import caching_headers, is_not_modified
 
 plans_bp = Blueprint('plans_bp', __name__)
 plan_service = PlanService()
 
+def _conditional_json(payload, validators):
+    """
+    200 with the payload, or 304 without a body when the request's
+    If-None-Match / If-Modified-Since still match. Both carry the validators
+    and Cache-Control (PLANS_CACHE_CONTROL), so CDNs and browsers can revalidate.
+    """
+    headers = caching_headers(validators, current_app.config.get("PLANS_CACHE_CONTROL"))
+    if is_not_modified(validators, request.headers.get("If-None-Match"), request.headers.get("If-Modified-Since")):
+        return Response(status=304, headers=headers)
+    return jsonify(payload), 200, headers
+
 @plans_bp.route('/plans', methods=['GET'])
 def get_all_plans_endpoint():
     try:
-        plans_from_db = plan_service.get_all_plans()
-        response_data = []
-        for plan_model in plans_from_db:
-            try:
-                plan_schema_instance = PlanResponse.model_validate(plan_model) # Pydantic V2
-                # plan_schema_instance = PlanResponse.from_orm(plan_model) # Pydantic V1
-                response_data.append(plan_schema_instance.model_dump(mode='json')) # Pydantic V2
-                # response_data.append(plan_schema_instance.dict()) # Pydantic V1
-            except Exception as e:
-                current_app.logger.error(f"Error serializing plan {getattr(plan_model, 'id', 'UNKNOWN_ID')}: {e}")
-                continue
-        return jsonify(response_data), 200
+        # Payloads are pre-serialized PlanResponse dicts (see app/schemas/read_models.py);
+        # the validators come from the same cached catalog, so a 304 reads nothing.
+        response_data, validators = plan_service.get_all_plan_payloads_with_validators()
+        return _conditional_json(response_data, validators)
     except Exception as e:
         current_app.logger.error(f"Error in get_all_plans_endpoint: {e}")
         return jsonify({"error": "An unexpected error occurred while retrieving plans."}), 500
@@ -27,13 +30,10 @@ def get_all_plans_endpoint():
 @plans_bp.route('/plans/<string:plan_id>', methods=['GET'])
 def get_plan_by_id_endpoint(plan_id: str):
     try:
-        plan_model = plan_service.get_plan_by_id(plan_id)
-        if not plan_model:
+        plan_payload, validators = plan_service.get_plan_payload_with_validators(plan_id)
+        if not plan_payload:
             return jsonify({"error": "Plan not found"}), 404
-        plan_schema_instance = PlanResponse.model_validate(plan_model) # Pydantic V2
-        # plan_schema_instance = PlanResponse.from_orm(plan_model) # Pydantic V1
-        return jsonify(plan_schema_instance.model_dump(mode='json')), 200 # Pydantic V2
-        # return jsonify(plan_schema_instance.dict()), 200 # Pydantic V1
+        return _conditional_json(plan_payload, validators)
     except Exception as e:
         current_app.logger.error(f"Error in get_plan_by_id_endpoint for ID {plan_id}: {e}")
         return jsonify({"error": "An unexpected error occurred."}), 500
\ No newline at end of file
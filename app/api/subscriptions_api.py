@@ -1,14 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app, g
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, g, stream_with_context
 from pydantic import ValidationError
 
 from app.services.subscription_service import SubscriptionService
 from app.schemas.subscription_schemas import (
     SubscriptionCreateRequest,
     SubscriptionUpdateRequest,
-    SubscriptionResponse,
     SubscriptionCreateInternal
 )
-from app.core.security import jwt_required, get_current_user_id
+from app.core.security import jwt_required, admin_required, get_current_user_id, is_admin
+from app.services import subscription_history
 
 # This is the correct way: Define the blueprint in this file.
 # This line should have been present from our initial setup of this file.
@@ -37,7 +38,7 @@ def create_subscription_endpoint():
     )
     try:
         new_subscription = subscription_service.create_subscription(internal_sub_data)
-        response_data = SubscriptionResponse.model_validate(new_subscription).model_dump(mode='json')
+        response_data = subscription_service.to_payload(new_subscription)
         return jsonify(response_data), 201
     except ValueError as e:
         status_code = 409 # Default to conflict
@@ -48,6 +49,40 @@ def create_subscription_endpoint():
         current_app.logger.error(f"Error creating subscription for user {user_id}: {e}")
         return jsonify({"error": "Could not create subscription."}), 500
 
+@subscriptions_bp.route('/subscriptions/bulk', methods=['POST'])
+@admin_required
+def bulk_import_subscriptions_endpoint():
+    """
+    Provisions subscriptions for many users. Accepts a JSON array or NDJSON
+    (Content-Type: application/x-ndjson) of {"user_id": ..., "plan_id": ...}
+    objects and streams back one NDJSON result per row, followed by a summary line.
+    """
+    # Imported on first use: an admin-only path that workers need not load at boot
+    from app.services.bulk_import_service import BulkImportService, parse_ndjson
+
+    max_rows = current_app.config.get("BULK_IMPORT_MAX_ROWS", 100000)
+    try:
+        if request.mimetype in ("application/x-ndjson", "application/ndjson", "application/jsonlines"):
+            rows = list(parse_ndjson(request.get_data(as_text=True).splitlines()))
+        else:
+            rows = request.get_json(force=True)
+            if not isinstance(rows, list):
+                return jsonify({"error": "Request body must be a JSON array or NDJSON."}), 400
+    except Exception:
+        return jsonify({"error": "Invalid request body or content type"}), 400
+
+    if len(rows) > max_rows:
+        return jsonify({"error": f"Too many rows: {len(rows)} (maximum {max_rows})."}), 413
+
+    current_app.logger.info(f"Bulk import of {len(rows)} subscriptions requested by {get_current_user_id()}")
+
+    def generate():
+        results = BulkImportService.summarize(BulkImportService.import_subscriptions(rows))
+        for result in results:
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), status=200, mimetype="application/x-ndjson")
+
 @subscriptions_bp.route('/subscriptions/<string:user_id_param>', methods=['GET'])
 @jwt_required
 def get_user_subscription_endpoint(user_id_param: str):
@@ -55,15 +90,54 @@ def get_user_subscription_endpoint(user_id_param: str):
     if token_user_id != user_id_param:
         return jsonify({"error": "Forbidden: You can only access your own subscription details."}), 403
     try:
-        subscription = subscription_service.get_subscription_details_for_user(token_user_id)
-        if not subscription:
+        if current_app.config.get("SUBSCRIPTION_PURE_READS", True):
+            # Fast path: projected raw read, no document hydration or Pydantic round trip.
+            response_data = subscription_service.get_subscription_payload_for_user(token_user_id)
+        else:
+            subscription = subscription_service.get_subscription_details_for_user(token_user_id)
+            response_data = subscription_service.to_payload(subscription) if subscription else None
+        if not response_data:
             return jsonify({"message": "No subscription found for this user."}), 404
-        response_data = SubscriptionResponse.model_validate(subscription).model_dump(mode='json')
         return jsonify(response_data), 200
     except Exception as e:
         current_app.logger.error(f"Error retrieving subscription for user {token_user_id}: {e}")
         return jsonify({"error": "Could not retrieve subscription details."}), 500
 
+@subscriptions_bp.route('/subscriptions/<string:user_id_param>/history', methods=['GET'])
+@jwt_required
+def get_user_subscription_history_endpoint(user_id_param: str):
+    """
+    A user's subscriptions, newest first, one page at a time. Query parameters:
+    limit (page size), cursor (next_cursor of the previous page) and fields
+    (comma-separated response fields). Administrators may read any user's history.
+    """
+    token_user_id = get_current_user_id()
+    if token_user_id != user_id_param and not is_admin(token_user_id):
+        return jsonify({"error": "Forbidden: You can only access your own subscription history."}), 403
+    try:
+        limit = subscription_history.parse_limit(
+            request.args.get("limit"),
+            current_app.config.get("SUBSCRIPTION_HISTORY_PAGE_SIZE", 20),
+            current_app.config.get("SUBSCRIPTION_HISTORY_MAX_PAGE_SIZE", 100),
+        )
+        fields = subscription_history.parse_fields(request.args.get("fields"))
+        cursor = request.args.get("cursor") or None
+        if cursor:
+            subscription_history.decode_cursor(cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        page = subscription_service.get_subscription_history(user_id_param, limit, cursor=cursor, fields=fields)
+        return jsonify(page), 200
+    except ValueError as e:
+        status_code = 409
+        if "not found" in str(e).lower():
+            status_code = 404
+        return jsonify({"error": str(e)}), status_code
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving subscription history for user {user_id_param}: {e}")
+        return jsonify({"error": "Could not retrieve subscription history."}), 500
+
 @subscriptions_bp.route('/subscriptions/<string:user_id_param>', methods=['PUT'])
 @jwt_required
 def update_user_subscription_endpoint(user_id_param: str):
@@ -78,7 +152,7 @@ def update_user_subscription_endpoint(user_id_param: str):
         return jsonify({"error": "Invalid request body or content type"}), 400
     try:
         updated_subscription = subscription_service.update_user_subscription(token_user_id, request_data)
-        response_data = SubscriptionResponse.model_validate(updated_subscription).model_dump(mode='json')
+        response_data = subscription_service.to_payload(updated_subscription)
         return jsonify(response_data), 200
     except ValueError as e:
         status_code = 409
@@ -97,7 +171,7 @@ def cancel_user_subscription_endpoint(user_id_param: str):
         return jsonify({"error": "Forbidden: You can only cancel your own subscription."}), 403
     try:
         cancelled_subscription = subscription_service.cancel_user_subscription(token_user_id)
-        response_data = SubscriptionResponse.model_validate(cancelled_subscription).model_dump(mode='json')
+        response_data = subscription_service.to_payload(cancelled_subscription)
         return jsonify(response_data), 200
     except ValueError as e:
         status_code = 409
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify, current_app
+from pydantic import ValidationError
+
+from app.core.security import admin_required
+from app.schemas.webhook_schemas import WebhookTargetCreateRequest
+from app.services.webhook_service import WebhookService
+
+webhooks_bp = Blueprint('webhooks_bp', __name__)
+
+
+def _error_status(error: ValueError) -> int:
+    return 404 if "not found" in str(error).lower() else 409
+
+
+@webhooks_bp.route('/webhooks', methods=['POST'])
+@admin_required
+def register_webhook_endpoint():
+    """Registers a partner endpoint for subscription lifecycle events (see app/services/webhook_service.py)."""
+    try:
+        request_data = WebhookTargetCreateRequest(**request.json)
+    except ValidationError as e:
+        return jsonify({"error": "Invalid request data", "details": e.errors(include_context=False)}), 400
+    except Exception:
+        return jsonify({"error": "Invalid request body or content type"}), 400
+    if not current_app.config.get("OUTBOX_ENABLED", False):
+        current_app.logger.warning("Webhook target registered while OUTBOX_ENABLED is off; it will receive no events.")
+    try:
+        target = WebhookService.register_target(request_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), _error_status(e)
+    return jsonify(WebhookService.to_payload(target)), 201
+
+
+@webhooks_bp.route('/webhooks', methods=['GET'])
+@admin_required
+def list_webhooks_endpoint():
+    return jsonify([WebhookService.to_payload(target) for target in WebhookService.list_targets()]), 200
+
+
+@webhooks_bp.route('/webhooks/<string:target_id>', methods=['DELETE'])
+@admin_required
+def delete_webhook_endpoint(target_id: str):
+    try:
+        WebhookService.delete_target(target_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), _error_status(e)
+    return jsonify({"deleted": target_id}), 200
+
+
+@webhooks_bp.route('/webhooks/<string:target_id>/dead-letters', methods=['GET'])
+@admin_required
+def list_dead_letters_endpoint(target_id: str):
+    """The target's most recent dead-lettered batches, newest first (?limit=, default 50, at most 500)."""
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    if not 1 <= limit <= 500:
+        return jsonify({"error": "'limit' must be between 1 and 500."}), 400
+    try:
+        return jsonify(WebhookService.list_dead_letters(target_id, limit)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), _error_status(e)
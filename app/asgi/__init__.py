@@ -0,0 +1,145 @@
+"""
+Optional ASGI serving mode.
+
+Serves the same /api/plans, /api/subscriptions and /health contract as the
+Flask app, on Starlette with PyMongo's async client, so waiting on MongoDB
+does not hold a thread per request:
+
+    uvicorn asgi:app --workers 4
+
+Reuses the Pydantic schemas, read models and business rules of the Flask
+services. Background jobs (expiration) and admin endpoints such as bulk
+import stay on the Flask app.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import pymongo
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from app.core.async_database import AsyncDatabase
+from app.core.config import Config
+from app.core.health import HealthProber
+from app.core.rate_limit import rate_limiter
+from app.core.security import token_cache
+from app.services.async_plan_service import AsyncPlanService
+from app.services.async_subscription_service import AsyncSubscriptionService
+from app.services.subscription_cache import subscription_cache
+from app.utils.error_handlers import AppError
+
+logger = logging.getLogger(__name__)
+
+
+def _config_dict(config_class) -> dict:
+    # Same rule as flask.Config.from_object: every uppercase attribute.
+    return {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+
+SCHEDULER_STATUS = "Scheduler not run in ASGI mode"
+
+
+async def _probe_loop(database: AsyncDatabase, prober: HealthProber, interval: float) -> None:
+    """Async counterpart of HealthProber's thread: ping, record, sleep."""
+    while True:
+        db_ok = False
+        ping_ms = None
+        try:
+            started = time.perf_counter()
+            await database.client.admin.command('ping')
+            ping_ms = round((time.perf_counter() - started) * 1000, 3)
+            db_status = "DB Connected"
+            db_ok = True
+        except pymongo.errors.ConnectionFailure as e:
+            logger.error(f"Health check DB connection failure: {e}")
+            db_status = "DB Connection Failure"
+        except pymongo.errors.PyMongoError as e:
+            logger.error(f"Health check DB PyMongo error: {e}")
+            db_status = f"DB Error ({type(e).__name__})"
+        except Exception as e:
+            logger.error(f"Health check failed with unexpected error: {e}, Type: {type(e)}")
+            db_status = "Unexpected Error during health check"
+        prober.record(db_ok, db_status, database.database.name, ping_ms, SCHEDULER_STATUS)
+        await asyncio.sleep(interval)
+
+
+async def health_check(request):
+    payload, status_code = request.app.state.health_prober.health(request.app.state.config)
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def liveness_check(request):
+    payload, status_code = request.app.state.health_prober.liveness()
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def readiness_check(request):
+    payload, status_code = request.app.state.health_prober.readiness(request.app.state.config)
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def _handle_app_error(request, error: AppError):
+    return JSONResponse({'error': error.message}, status_code=error.status_code)
+
+
+async def _handle_http_error(request, error: HTTPException):
+    if error.status_code == 404:
+        return JSONResponse({'error': 'Endpoint not found', 'message': str(error.detail)}, status_code=404)
+    return JSONResponse({'error': error.detail}, status_code=error.status_code)
+
+
+async def _handle_internal_error(request, error: Exception):
+    logger.error(f"Unhandled Internal Server Error: {error}", exc_info=error)
+    return JSONResponse({'error': 'Internal Server Error', 'message': "An unexpected error occurred."}, status_code=500)
+
+
+def create_asgi_app(config_class=Config) -> Starlette:
+    config = _config_dict(config_class)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        database = AsyncDatabase()
+        database.init_app(config)
+        token_cache.configure(config)
+        if config.get('SUBSCRIPTION_CACHE_BACKEND'):
+            subscription_cache.configure(config)
+        if config.get('RATE_LIMIT_BACKEND'):
+            rate_limiter.configure(config)
+        plan_service = AsyncPlanService(database, config)
+        app.state.database = database
+        app.state.plan_service = plan_service
+        app.state.subscription_service = AsyncSubscriptionService(database, plan_service, config)
+        logger.info("Async MongoDB client initialized.")
+        interval = float(config.get('HEALTH_PROBE_INTERVAL_SECONDS', HealthProber.DEFAULT_INTERVAL_SECONDS))
+        probe_task = asyncio.create_task(_probe_loop(database, app.state.health_prober, interval))
+        try:
+            yield
+        finally:
+            probe_task.cancel()
+            await database.close()
+
+    from app.asgi import plans, subscriptions
+
+    app = Starlette(
+        debug=config.get('DEBUG', False),
+        routes=[
+            Route('/health', health_check, methods=['GET']),
+            Route('/health/live', liveness_check, methods=['GET']),
+            Route('/health/ready', readiness_check, methods=['GET']),
+            Mount('/api', routes=plans.routes + subscriptions.routes),
+        ],
+        exception_handlers={
+            AppError: _handle_app_error,
+            HTTPException: _handle_http_error,
+            500: _handle_internal_error,
+        },
+        lifespan=lifespan,
+    )
+    app.state.config = config
+    app.state.health_prober = HealthProber()
+    logger.info(f"ASGI app created with env: {config.get('FLASK_ENV')}")
+    return app
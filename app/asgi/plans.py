@@ -0,0 +1,43 @@
+import logging
+
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.utils.http_caching import caching_headers, is_not_modified
+
+logger = logging.getLogger(__name__)
+
+
+def _conditional_json(request, payload, validators):
+    """Same conditional GET handling as the Flask blueprint."""
+    headers = caching_headers(validators, request.app.state.config.get("PLANS_CACHE_CONTROL"))
+    if is_not_modified(validators, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, status_code=200, headers=headers)
+
+
+async def get_all_plans_endpoint(request):
+    try:
+        response_data, validators = await request.app.state.plan_service.get_all_plan_payloads_with_validators()
+        return _conditional_json(request, response_data, validators)
+    except Exception as e:
+        logger.error(f"Error in get_all_plans_endpoint: {e}")
+        return JSONResponse({"error": "An unexpected error occurred while retrieving plans."}, status_code=500)
+
+
+async def get_plan_by_id_endpoint(request):
+    plan_id = request.path_params['plan_id']
+    try:
+        plan_payload, validators = await request.app.state.plan_service.get_plan_payload_with_validators(plan_id)
+        if not plan_payload:
+            return JSONResponse({"error": "Plan not found"}, status_code=404)
+        return _conditional_json(request, plan_payload, validators)
+    except Exception as e:
+        logger.error(f"Error in get_plan_by_id_endpoint for ID {plan_id}: {e}")
+        return JSONResponse({"error": "An unexpected error occurred."}, status_code=500)
+
+
+routes = [
+    Route('/plans', get_all_plans_endpoint, methods=['GET']),
+    Route('/plans/{plan_id:str}', get_plan_by_id_endpoint, methods=['GET']),
+]
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from functools import wraps
+
+from starlette.responses import JSONResponse
+
+from app.core.rate_limit import rate_limiter, retry_after_header
+from app.core.security import parse_bearer_token, verify_token
+
+logger = logging.getLogger(__name__)
+
+
+def jwt_required(endpoint):
+    """
+    ASGI counterpart of app.core.security.jwt_required: same header rules and
+    error responses and rate limits, stores the token's 'sub' in
+    request.state.user_id. A shared (Redis) limiter is asked from a worker
+    thread so its round trip does not block the event loop.
+    """
+    route = endpoint.__name__
+
+    @wraps(endpoint)
+    async def decorated_endpoint(request):
+        token, error = parse_bearer_token(request.headers.get('Authorization'))
+        if error:
+            return JSONResponse({"error": error}, status_code=401)
+
+        payload = verify_token(token, request.app.state.config, logger)
+        if payload is None:
+            return JSONResponse({"error": "Invalid or expired token"}, status_code=401)
+
+        user_id_from_token = payload.get('sub')
+        if not user_id_from_token:
+            return JSONResponse({"error": "Token does not contain user identifier ('sub' claim)"}, status_code=401)
+
+        request.state.user_id = user_id_from_token
+
+        if rate_limiter.shared:
+            wait = await asyncio.to_thread(rate_limiter.check, user_id_from_token, route)
+        else:
+            wait = rate_limiter.check(user_id_from_token, route)
+        if wait:
+            return JSONResponse({"error": "Too many requests"}, status_code=429,
+                                headers={"Retry-After": retry_after_header(wait)})
+
+        return await endpoint(request)
+    return decorated_endpoint
+
+
+def get_current_user_id(request) -> str | None:
+    """The authenticated user's ID, or None outside a jwt_required endpoint."""
+    return getattr(request.state, 'user_id', None)
+
+
+def is_admin(request, user_id: str | None) -> bool:
+    """ASGI counterpart of app.core.security.is_admin (ADMIN_USER_IDS)."""
+    return bool(user_id) and user_id in request.app.state.config.get('ADMIN_USER_IDS', ())
@@ -0,0 +1,139 @@
+import logging
+
+from pydantic import ValidationError
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.asgi.security import jwt_required, get_current_user_id, is_admin
+from app.services import subscription_history
+from app.schemas.subscription_schemas import (
+    SubscriptionCreateRequest,
+    SubscriptionUpdateRequest,
+    SubscriptionCreateInternal
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _business_error(e: ValueError) -> JSONResponse:
+    # Same mapping as the Flask blueprint: "not found" -> 404, other rule violations -> 409
+    status_code = 404 if "not found" in str(e).lower() else 409
+    return JSONResponse({"error": str(e)}, status_code=status_code)
+
+
+async def _parse_body(request, schema):
+    """Returns (model, None) or (None, error response)."""
+    try:
+        return schema(**await request.json()), None
+    except ValidationError as e:
+        details = e.errors(include_url=False, include_context=False)
+        return None, JSONResponse({"error": "Invalid request data", "details": details}, status_code=400)
+    except Exception:
+        return None, JSONResponse({"error": "Invalid request body or content type"}, status_code=400)
+
+
+@jwt_required
+async def create_subscription_endpoint(request):
+    user_id = get_current_user_id(request)
+    if not user_id:
+        return JSONResponse({"error": "User ID not found in token"}, status_code=401)
+    request_data, error_response = await _parse_body(request, SubscriptionCreateRequest)
+    if error_response:
+        return error_response
+
+    internal_sub_data = SubscriptionCreateInternal(user_id=user_id, plan_id=request_data.plan_id)
+    try:
+        response_data = await request.app.state.subscription_service.create_subscription(internal_sub_data)
+        return JSONResponse(response_data, status_code=201)
+    except ValueError as e:
+        return _business_error(e)
+    except Exception as e:
+        logger.error(f"Error creating subscription for user {user_id}: {e}")
+        return JSONResponse({"error": "Could not create subscription."}, status_code=500)
+
+
+@jwt_required
+async def get_user_subscription_endpoint(request):
+    token_user_id = get_current_user_id(request)
+    if token_user_id != request.path_params['user_id_param']:
+        return JSONResponse({"error": "Forbidden: You can only access your own subscription details."}, status_code=403)
+    try:
+        response_data = await request.app.state.subscription_service.get_subscription_payload_for_user(token_user_id)
+        if not response_data:
+            return JSONResponse({"message": "No subscription found for this user."}, status_code=404)
+        return JSONResponse(response_data, status_code=200)
+    except Exception as e:
+        logger.error(f"Error retrieving subscription for user {token_user_id}: {e}")
+        return JSONResponse({"error": "Could not retrieve subscription details."}, status_code=500)
+
+
+@jwt_required
+async def get_user_subscription_history_endpoint(request):
+    token_user_id = get_current_user_id(request)
+    user_id_param = request.path_params['user_id_param']
+    if token_user_id != user_id_param and not is_admin(request, token_user_id):
+        return JSONResponse({"error": "Forbidden: You can only access your own subscription history."}, status_code=403)
+    config = request.app.state.config
+    try:
+        limit = subscription_history.parse_limit(
+            request.query_params.get("limit"),
+            config.get("SUBSCRIPTION_HISTORY_PAGE_SIZE", 20),
+            config.get("SUBSCRIPTION_HISTORY_MAX_PAGE_SIZE", 100),
+        )
+        fields = subscription_history.parse_fields(request.query_params.get("fields"))
+        cursor = request.query_params.get("cursor") or None
+        if cursor:
+            subscription_history.decode_cursor(cursor)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    try:
+        page = await request.app.state.subscription_service.get_subscription_history(
+            user_id_param, limit, cursor=cursor, fields=fields)
+        return JSONResponse(page, status_code=200)
+    except ValueError as e:
+        return _business_error(e)
+    except Exception as e:
+        logger.error(f"Error retrieving subscription history for user {user_id_param}: {e}")
+        return JSONResponse({"error": "Could not retrieve subscription history."}, status_code=500)
+
+
+@jwt_required
+async def update_user_subscription_endpoint(request):
+    token_user_id = get_current_user_id(request)
+    if token_user_id != request.path_params['user_id_param']:
+        return JSONResponse({"error": "Forbidden: You can only update your own subscription."}, status_code=403)
+    request_data, error_response = await _parse_body(request, SubscriptionUpdateRequest)
+    if error_response:
+        return error_response
+    try:
+        response_data = await request.app.state.subscription_service.update_user_subscription(token_user_id, request_data)
+        return JSONResponse(response_data, status_code=200)
+    except ValueError as e:
+        return _business_error(e)
+    except Exception as e:
+        logger.error(f"Error updating subscription for user {token_user_id}: {e}")
+        return JSONResponse({"error": "Could not update subscription."}, status_code=500)
+
+
+@jwt_required
+async def cancel_user_subscription_endpoint(request):
+    token_user_id = get_current_user_id(request)
+    if token_user_id != request.path_params['user_id_param']:
+        return JSONResponse({"error": "Forbidden: You can only cancel your own subscription."}, status_code=403)
+    try:
+        response_data = await request.app.state.subscription_service.cancel_user_subscription(token_user_id)
+        return JSONResponse(response_data, status_code=200)
+    except ValueError as e:
+        return _business_error(e)
+    except Exception as e:
+        logger.error(f"Error cancelling subscription for user {token_user_id}: {e}")
+        return JSONResponse({"error": "Could not cancel subscription."}, status_code=500)
+
+
+routes = [
+    Route('/subscriptions', create_subscription_endpoint, methods=['POST']),
+    Route('/subscriptions/{user_id_param:str}', get_user_subscription_endpoint, methods=['GET']),
+    Route('/subscriptions/{user_id_param:str}/history', get_user_subscription_history_endpoint, methods=['GET']),
+    Route('/subscriptions/{user_id_param:str}', update_user_subscription_endpoint, methods=['PUT']),
+    Route('/subscriptions/{user_id_param:str}', cancel_user_subscription_endpoint, methods=['DELETE']),
+]
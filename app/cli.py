@@ -0,0 +1,87 @@
+import click
+
+
+def register_commands(app):
+    """Registers maintenance commands on the Flask CLI (`flask <command>`)."""
+
+    @app.cli.command('backfill-plan-snapshots')
+    @click.option('--batch-size', default=1000, show_default=True, help='Subscriptions per bulk write.')
+    @click.option('--dry-run', is_flag=True, help='Report what would be updated without writing.')
+    def backfill_plan_snapshots_command(batch_size, dry_run):
+        """Embed plan snapshots in subscriptions created before snapshots existed."""
+        from app.migrations.backfill_plan_snapshots import backfill_plan_snapshots
+
+        stats = backfill_plan_snapshots(batch_size=batch_size, dry_run=dry_run)
+        click.echo(
+            f"{'Would update' if dry_run else 'Updated'} {stats['updated']} of {stats['scanned']} subscriptions "
+            f"in {stats['batches']} batches ({stats['missing_plan']} reference missing plans)."
+        )
+
+    @app.cli.command('rebuild-analytics')
+    @click.option('--batch-size', default=1000, show_default=True, help='Subscriptions read per batch.')
+    @click.option('--dry-run', is_flag=True, help='Compute the rollups without replacing the collection.')
+    def rebuild_analytics_command(batch_size, dry_run):
+        """Recompute the subscription analytics rollups from the subscriptions collection."""
+        from app.migrations.rebuild_subscription_rollups import rebuild_subscription_rollups
+
+        stats = rebuild_subscription_rollups(batch_size=batch_size, dry_run=dry_run)
+        click.echo(
+            f"{'Would write' if dry_run else 'Wrote'} {stats['documents']} rollup documents from "
+            f"{stats['scanned']} subscriptions in {stats['batches']} batches."
+        )
+
+    @app.cli.command('import-subscriptions')
+    @click.argument('source', type=click.File('r'))
+    @click.option('--chunk-size', default=None, type=int, help='Rows per insert_many (default: BULK_IMPORT_CHUNK_SIZE).')
+    @click.option('--quiet', is_flag=True, help='Only print the summary, not one result per row.')
+    def import_subscriptions_command(source, chunk_size, quiet):
+        """
+        Bulk-provision subscriptions from SOURCE ('-' for stdin): a JSON array
+        or NDJSON of {"user_id": ..., "plan_id": ...} objects. Prints one NDJSON
+        result per row and a final summary line.
+        """
+        import json
+        from app.services.bulk_import_service import BulkImportService, parse_ndjson
+
+        content = source.read()
+        if content.lstrip().startswith('['):
+            rows = json.loads(content)
+        else:
+            rows = parse_ndjson(content.splitlines())
+
+        results = BulkImportService.summarize(BulkImportService.import_subscriptions(rows, chunk_size=chunk_size))
+        for result in results:
+            if quiet and 'summary' not in result:
+                continue
+            click.echo(json.dumps(result))
+
+    @app.cli.command('sync-indexes')
+    @click.option('--drop-redundant', is_flag=True, help='Drop indexes that are no longer declared.')
+    @click.option('--dry-run', is_flag=True, help='Report what would change without writing.')
+    def sync_indexes_command(drop_redundant, dry_run):
+        """Build the indexes declared on the models and optionally drop undeclared ones."""
+        from app.migrations.indexes import sync_indexes
+
+        report = sync_indexes(drop_redundant=drop_redundant, dry_run=dry_run, log=click.echo)
+        for collection, plan in report.items():
+            click.echo(
+                f"{collection}: {len(plan['keep'])} up to date, {len(plan['create'])} to create, "
+                f"{len(plan['drop'])} redundant, {len(plan['conflict'])} conflicting."
+            )
+
+    @app.cli.command('verify-indexes')
+    def verify_indexes_command():
+        """Explain every service query; exit 1 if any does a COLLSCAN or an in-memory sort."""
+        from app.migrations.indexes import verify_query_plans
+
+        results = verify_query_plans()
+        for result in results:
+            status = 'OK  ' if result['ok'] else 'FAIL'
+            details = f" ({', '.join(result['problems'])})" if result['problems'] else ''
+            click.echo(f"{status} {result['query']}: {' > '.join(result['stages'])}{details}")
+        failed = [result for result in results if not result['ok']]
+        if failed:
+            raise click.ClickException(f"{len(failed)} of {len(results)} queries are not fully indexed.")
+        click.echo(f"All {len(results)} queries are index-backed.")
+
+    app.logger.info("CLI commands registered.")
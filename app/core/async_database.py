@@ -0,0 +1,36 @@
+from pymongo import AsyncMongoClient
+
+from app.core.mongo_options import client_settings
+
+
+class AsyncDatabase:
+    """
+    Non-blocking MongoDB connection for the ASGI serving mode, using PyMongo's
+    native asyncio client. Reads the same MONGODB_SETTINGS and MONGO_* client
+    options as MongoEngine, so both serving modes talk to the same database
+    with the same pool settings.
+    """
+
+    def __init__(self):
+        self.client: AsyncMongoClient | None = None
+        self.database = None
+
+    def init_app(self, config) -> None:
+        settings = client_settings(config)
+        host = settings.pop('host', None)
+        db_name = settings.pop('db', None)
+        # MongoEngine-only keys have no AsyncMongoClient equivalent
+        settings.pop('alias', None)
+        settings.pop('mongo_client_class', None)
+        self.client = AsyncMongoClient(host, **settings)
+        self.database = self.client[db_name] if db_name else self.client.get_default_database()
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+            self.database = None
+
+    def collection(self, name: str, **options):
+        """The collection, with `options` (read_preference, write_concern, ...) overriding the client's."""
+        return self.database.get_collection(name, **options) if options else self.database[name]
@@ -0,0 +1,94 @@
+"""
+Response compression negotiated with Accept-Encoding.
+
+`init_compression(app)` registers an after_request hook that compresses
+buffered responses of a compressible content type once they reach
+COMPRESSION_MIN_SIZE bytes. Brotli is offered when the optional `brotli`
+package is installed; gzip always is. Streamed responses (e.g. the NDJSON
+bulk import) and responses that already have a Content-Encoding are left
+alone.
+
+A compressed body is a different representation, so its strong ETag gets
+an encoding suffix ("<tag>-gzip"). app/utils/http_caching.py ignores the
+suffix when matching If-None-Match, so revalidation still returns 304.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'application/problem+json',
+    'text/plain', 'text/html', 'text/csv',
+})
+ENCODING_SUFFIXES = ('-gzip', '-br')
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+
+
+def available_encodings() -> list[str]:
+    """Encodings this process can produce, most preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = DEFAULT_GZIP_LEVEL,
+             brotli_quality: int = DEFAULT_BROTLI_QUALITY) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output deterministic for identical bodies
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+
+def _add_vary(headers, value: str) -> None:
+    existing = [item.strip() for item in headers.get('Vary', '').split(',') if item.strip()]
+    if value.lower() not in (item.lower() for item in existing):
+        headers['Vary'] = ', '.join(existing + [value])
+
+
+def _suffix_etag(headers, encoding: str) -> None:
+    etag = headers.get('ETag')
+    if etag and etag.endswith('"'):
+        headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+
+
+def init_compression(app) -> None:
+    """Registers the compression hook when COMPRESSION_ENABLED is set."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        app.logger.info("Response compression is disabled via config.")
+        return
+    from flask import request
+
+    min_size = int(app.config.get('COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE))
+    gzip_level = int(app.config.get('COMPRESSION_GZIP_LEVEL', DEFAULT_GZIP_LEVEL))
+    brotli_quality = int(app.config.get('COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY))
+    encodings = available_encodings()
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        # The representation depends on Accept-Encoding even when sent uncompressed.
+        _add_vary(response.headers, 'Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None or request.accept_encodings[encoding] <= 0:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(compress(data, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        _suffix_etag(response.headers, encoding)
+        return response
+
+    app.logger.info(f"Response compression enabled ({', '.join(encodings)}, min {min_size} bytes).")
@@ -15,9 +15,159 @@ class Config:
     }
     if not MONGODB_SETTINGS.get('host'):
         print("WARNING: MONGODB_SETTINGS_HOST is not set in the environment!")
+    # Driver options added to MONGODB_SETTINGS by app/core/mongo_options.py,
+    # unless MONGODB_SETTINGS sets them itself. Defaults are the driver's.
+    # Size the pool per process against the worker thread count and watch
+    # mongo_pool_checkout_wait_seconds; 0 = no limit for the idle/wait/socket timeouts.
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_CONNECTING = int(os.environ.get('MONGO_MAX_CONNECTING', 2))  # Connections being opened at once
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0))  # Pool checkout wait
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 20000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 0))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000))
+    # Comma-separated, in order of preference: zstd, snappy (optional packages), zlib. Empty = none.
+    MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')
+    MONGO_APP_NAME = os.environ.get('MONGO_APP_NAME', 'subscription-service')
+    # Read preference of every read without its own setting below
+    MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+    # Plan catalog loads and subscription history pages may be served by a
+    # secondary at most MONGO_MAX_STALENESS_SECONDS behind (-1 = no bound, else >= 90).
+    MONGO_CATALOG_READ_PREFERENCE = os.environ.get('MONGO_CATALOG_READ_PREFERENCE', 'secondaryPreferred')
+    MONGO_HISTORY_READ_PREFERENCE = os.environ.get('MONGO_HISTORY_READ_PREFERENCE', 'secondaryPreferred')
+    MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', 90))
+    # Write concern of subscription status writes and their outbox transactions
+    MONGO_STATUS_WRITE_CONCERN = os.environ.get('MONGO_STATUS_WRITE_CONCERN', 'majority')
+    MONGO_STATUS_WRITE_TIMEOUT_MS = int(os.environ.get('MONGO_STATUS_WRITE_TIMEOUT_MS', 5000))  # 0 = wait indefinitely
 
     JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
+    # Verified-token LRU cache used by jwt_required. Entries never outlive the
+    # token's 'exp'; JWT_CACHE_MAX_TTL_SECONDS optionally caps them further.
+    JWT_CACHE_ENABLED = os.environ.get('JWT_CACHE_ENABLED', 'True').lower() == 'true'
+    JWT_CACHE_MAX_SIZE = int(os.environ.get('JWT_CACHE_MAX_SIZE', 10000))
+    JWT_CACHE_MAX_TTL_SECONDS = int(os.environ.get('JWT_CACHE_MAX_TTL_SECONDS', 0))  # 0 = until 'exp'
+    # Users (JWT 'sub') allowed to call administrative endpoints, e.g. bulk import
+    ADMIN_USER_IDS = frozenset(
+        uid.strip() for uid in os.environ.get('ADMIN_USER_IDS', '').split(',') if uid.strip()
+    )
+    # Token-bucket rate limits of authenticated requests (app/core/rate_limit.py):
+    # '' (off), 'local' (buckets per worker process) or 'redis' (shared; needs the 'redis' package).
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', '').lower()
+    # Per user and route: tokens refilled per second, and the most a user can spend at once
+    RATE_LIMIT_USER_RATE = float(os.environ.get('RATE_LIMIT_USER_RATE', 5))
+    RATE_LIMIT_USER_BURST = float(os.environ.get('RATE_LIMIT_USER_BURST', 20))
+    # Per-route overrides, e.g. 'create_subscription_endpoint=0.5/5,get_user_subscription_endpoint=10/30'
+    RATE_LIMIT_ROUTES = os.environ.get('RATE_LIMIT_ROUTES', '')
+    # One bucket across all users and routes; 0 = no global limit. Burst defaults to the rate (at least 1).
+    # Rates must be above 0 and bursts at least 1; anything else fails at startup.
+    RATE_LIMIT_GLOBAL_RATE = float(os.environ.get('RATE_LIMIT_GLOBAL_RATE', 0))
+    RATE_LIMIT_GLOBAL_BURST = float(os.environ.get('RATE_LIMIT_GLOBAL_BURST', 0))
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))  # 'local' buckets before pruning
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
     SCHEDULER_API_ENABLED = os.environ.get('SCHEDULER_API_ENABLED', 'True').lower() == 'true'
+    # Time each create_app() component and log the report (see app/core/startup_profile.py;
+    # `python run.py --profile-startup` prints it and exits).
+    PROFILE_STARTUP = os.environ.get('PROFILE_STARTUP', 'False').lower() == 'true'
+
+    # Expiration job: 'bulk' flips status with chunked server-side update_many,
+    # 'per_document' is the legacy load-and-save loop.
+    EXPIRATION_STRATEGY = os.environ.get('EXPIRATION_STRATEGY', 'bulk').lower()
+    EXPIRATION_BATCH_SIZE = int(os.environ.get('EXPIRATION_BATCH_SIZE', 1000))
+    EXPIRATION_MAX_BATCHES_PER_RUN = int(os.environ.get('EXPIRATION_MAX_BATCHES_PER_RUN', 0))  # 0 = no limit
+    # The job runs when the next ACTIVE subscription becomes due, but never
+    # more than EXPIRATION_MAX_SLEEP_SECONDS apart nor less than EXPIRATION_MIN_SLEEP_SECONDS.
+    EXPIRATION_MAX_SLEEP_SECONDS = float(os.environ.get('EXPIRATION_MAX_SLEEP_SECONDS', 300))
+    EXPIRATION_MIN_SLEEP_SECONDS = float(os.environ.get('EXPIRATION_MIN_SLEEP_SECONDS', 1))
+    # Only the process holding the Mongo lease ('job_leases' collection) runs
+    # an expiration cycle. The holder renews it every third of the lease on a
+    # separate timer; a dead leader is replaced once it expires.
+    EXPIRATION_LEADER_ELECTION = os.environ.get('EXPIRATION_LEADER_ELECTION', 'True').lower() == 'true'
+    EXPIRATION_LEASE_SECONDS = float(os.environ.get('EXPIRATION_LEASE_SECONDS', 45))
+
+    # Plan catalog cache. Saves through MongoEngine invalidate it immediately in
+    # this process and bump a version document other workers poll.
+    PLAN_CACHE_ENABLED = os.environ.get('PLAN_CACHE_ENABLED', 'True').lower() == 'true'
+    PLAN_CACHE_TTL_SECONDS = float(os.environ.get('PLAN_CACHE_TTL_SECONDS', 300))
+    PLAN_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('PLAN_CACHE_VERSION_CHECK_SECONDS', 5))  # 0 = TTL only
+    # Cache-Control of GET /api/plans and /api/plans/<id>, sent with their ETag
+    # and Last-Modified. Empty = no Cache-Control header.
+    PLANS_CACHE_CONTROL = os.environ.get('PLANS_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=300')
+
+    # GET /api/subscriptions/<user_id> computes the effective status in memory
+    # (one query, no writes) instead of expiring the subscription on read.
+    SUBSCRIPTION_PURE_READS = os.environ.get('SUBSCRIPTION_PURE_READS', 'True').lower() == 'true'
+    # GET /api/subscriptions/<user_id>/history: default and maximum ?limit=
+    SUBSCRIPTION_HISTORY_PAGE_SIZE = int(os.environ.get('SUBSCRIPTION_HISTORY_PAGE_SIZE', 20))
+    SUBSCRIPTION_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('SUBSCRIPTION_HISTORY_MAX_PAGE_SIZE', 100))
+    # Read-through cache of GET /api/subscriptions/<user_id> (app/services/subscription_cache.py):
+    # '' (off), 'local' (in-process LRU, per worker) or 'redis' (shared; needs the 'redis' package).
+    SUBSCRIPTION_CACHE_BACKEND = os.environ.get('SUBSCRIPTION_CACHE_BACKEND', '').lower()
+    # Entries also end at the subscription's end_date. With 'local' and several
+    # workers this is how long another worker's change can go unseen.
+    SUBSCRIPTION_CACHE_TTL_SECONDS = float(os.environ.get('SUBSCRIPTION_CACHE_TTL_SECONDS', 60))
+    SUBSCRIPTION_CACHE_MAX_SIZE = int(os.environ.get('SUBSCRIPTION_CACHE_MAX_SIZE', 100000))  # 'local' entries
+    SUBSCRIPTION_CACHE_REDIS_URL = os.environ.get('SUBSCRIPTION_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    # Longest a miss waits for another thread's or process's load of the same user
+    SUBSCRIPTION_CACHE_LOCK_SECONDS = float(os.environ.get('SUBSCRIPTION_CACHE_LOCK_SECONDS', 2))
+
+    # Analytics rollups ('subscription_rollups'), kept up to date by every
+    # subscription write and served by GET /api/analytics/subscriptions.
+    ANALYTICS_ROLLUPS_ENABLED = os.environ.get('ANALYTICS_ROLLUPS_ENABLED', 'True').lower() == 'true'
+    ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', 366))
+
+    # Transactional outbox of subscription lifecycle events ('subscription_events'),
+    # written in the same transaction as each change. Transactions need a replica set.
+    OUTBOX_ENABLED = os.environ.get('OUTBOX_ENABLED', 'False').lower() == 'true'
+    # GET /api/events: default and maximum ?limit=
+    OUTBOX_READ_BATCH_SIZE = int(os.environ.get('OUTBOX_READ_BATCH_SIZE', 100))
+    OUTBOX_MAX_READ_BATCH_SIZE = int(os.environ.get('OUTBOX_MAX_READ_BATCH_SIZE', 1000))
+    # Events are removed by a TTL index this long after they occurred (0 = keep forever)
+    OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
+
+    # Webhook delivery of outbox events (needs OUTBOX_ENABLED). A scheduler job
+    # polls every WEBHOOK_POLL_SECONDS in the process holding the delivery
+    # lease; keep WEBHOOK_LEASE_SECONDS well above the poll interval.
+    WEBHOOKS_ENABLED = os.environ.get('WEBHOOKS_ENABLED', 'False').lower() == 'true'
+    WEBHOOK_POLL_SECONDS = float(os.environ.get('WEBHOOK_POLL_SECONDS', 5))
+    WEBHOOK_LEASE_SECONDS = float(os.environ.get('WEBHOOK_LEASE_SECONDS', 30))
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))  # Events per POST
+    WEBHOOK_MAX_IN_FLIGHT_PER_TARGET = int(os.environ.get('WEBHOOK_MAX_IN_FLIGHT_PER_TARGET', 2))
+    WEBHOOK_MAX_WORKERS = int(os.environ.get('WEBHOOK_MAX_WORKERS', 8))  # HTTP threads shared by all targets
+    WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', 10))
+    # Retry delay after the n-th consecutive failure: random in [0, min(max, base * 2^(n-1))]
+    WEBHOOK_BACKOFF_BASE_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_BASE_SECONDS', 1))
+    WEBHOOK_BACKOFF_MAX_SECONDS = float(os.environ.get('WEBHOOK_BACKOFF_MAX_SECONDS', 300))
+    # Failed attempts before a batch moves to 'webhook_dead_letters'
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+
+    # JSON encoding for jsonify: 'orjson' (falls back to 'stdlib' if orjson is not installed) or 'stdlib'
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson').lower()
+    # gzip/brotli response compression, negotiated with Accept-Encoding. Brotli
+    # needs the optional 'brotli' package. Smaller bodies are sent as is.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+    # Bulk subscription import (POST /api/subscriptions/bulk, `flask import-subscriptions`)
+    BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 1000))
+    BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 100000))
+
+    # Health endpoints answer from a background probe refreshed every
+    # HEALTH_PROBE_INTERVAL_SECONDS. Readiness fails after
+    # HEALTH_READY_FAILURE_THRESHOLD failed pings in a row, or when the last
+    # probe is older than HEALTH_MAX_PROBE_AGE_SECONDS.
+    HEALTH_PROBE_INTERVAL_SECONDS = float(os.environ.get('HEALTH_PROBE_INTERVAL_SECONDS', 5))
+    HEALTH_READY_FAILURE_THRESHOLD = int(os.environ.get('HEALTH_READY_FAILURE_THRESHOLD', 3))
+    HEALTH_MAX_PROBE_AGE_SECONDS = float(os.environ.get('HEALTH_MAX_PROBE_AGE_SECONDS', 30))
+
+    # Prometheus metrics at /metrics. With several worker processes, point
+    # METRICS_MULTIPROC_DIR at a directory shared by the workers so any of
+    # them can serve the merged values.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
     
     # MONGODB_SETTINGS_HOST should be your Atlas SRV string
     # MONGODB_SCHEDULER_DB = os.environ.get('MONGODB_SCHEDULER_DB', 'scheduler_jobs_db') # Or use main DB
@@ -1,7 +1,11 @@
 from flask_mongoengine import MongoEngine
 
+from app.core.mongo_options import client_settings
+
 db = MongoEngine()
 
 def init_db(app):
+    # Pool, timeout, compression and read preference options (see app/core/mongo_options.py)
+    app.config['MONGODB_SETTINGS'] = client_settings(app.config)
     db.init_app(app)
     app.logger.info("MongoEngine initialized with Flask app.")
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Background health probing.
+
+A daemon thread pings MongoDB and reads the scheduler state every
+HEALTH_PROBE_INTERVAL_SECONDS and publishes the result as an immutable
+HealthState. /health, /health/live and /health/ready only read the latest
+state, so probes from load balancers and Kubernetes never touch the database.
+"""
+import os
+import threading
+import time
+
+import pymongo
+
+
+class HealthState:
+    """Result of one probe. Replaced as a whole, never mutated."""
+    __slots__ = ('probed_at', 'db_ok', 'db_status', 'db_name', 'ping_ms', 'scheduler_status',
+                 'consecutive_failures')
+
+    def __init__(self, db_ok: bool, db_status: str, db_name: str | None, ping_ms: float | None,
+                 scheduler_status: str, consecutive_failures: int):
+        self.probed_at = time.monotonic()
+        self.db_ok = db_ok
+        self.db_status = db_status
+        self.db_name = db_name
+        self.ping_ms = ping_ms
+        self.scheduler_status = scheduler_status
+        self.consecutive_failures = consecutive_failures
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.probed_at
+
+
+class HealthProber:
+    """
+    Holds the latest HealthState and, in the Flask app, the thread that
+    refreshes it. The ASGI app runs its own async loop and only calls record().
+    """
+
+    DEFAULT_INTERVAL_SECONDS = 5.0
+    DEFAULT_MAX_AGE_SECONDS = 30.0
+    DEFAULT_FAILURE_THRESHOLD = 3
+
+    def __init__(self):
+        self._state: HealthState | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._db_name: str | None = None
+
+    @property
+    def state(self) -> HealthState | None:
+        return self._state
+
+    def record(self, db_ok: bool, db_status: str, db_name: str | None, ping_ms: float | None,
+               scheduler_status: str) -> HealthState:
+        previous = self._state
+        failures = 0 if db_ok else (previous.consecutive_failures + 1 if previous else 1)
+        self._state = HealthState(db_ok, db_status, db_name, ping_ms, scheduler_status, failures)
+        return self._state
+
+    # --- Flask probing thread ---
+
+    def probe_once(self, app, connection_factory, scheduler_status) -> HealthState:
+        """Pings MongoDB through `connection_factory()` (a MongoClient) inside an app context."""
+        db_ok = False
+        ping_ms = None
+        try:
+            with app.app_context():
+                connection = connection_factory()
+                if connection:
+                    started = time.perf_counter()
+                    connection.admin.command('ping')
+                    ping_ms = round((time.perf_counter() - started) * 1000, 3)
+                    if self._db_name is None:
+                        self._db_name = connection.get_default_database().name
+                    db_status = "DB Connected"
+                    db_ok = True
+                else:
+                    db_status = "DB Connection object not available"
+        except pymongo.errors.ConnectionFailure as e:
+            app.logger.error(f"Health check DB connection failure: {e}")
+            db_status = "DB Connection Failure"
+        except pymongo.errors.PyMongoError as e:
+            app.logger.error(f"Health check DB PyMongo error: {e}")
+            db_status = f"DB Error ({type(e).__name__})"
+        except Exception as e:
+            app.logger.error(f"Health check failed with unexpected error: {e}, Type: {type(e)}")
+            db_status = "Unexpected Error during health check"
+        return self.record(db_ok, db_status, self._db_name, ping_ms, scheduler_status())
+
+    def start(self, app, connection_factory, scheduler_status) -> None:
+        """
+        Starts the probing thread once per process (a forked worker starts its
+        own). Unless the state inherited across a fork is younger than one
+        interval, probes once before returning, so the caller never answers
+        from a missing or stale state.
+        """
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            interval = float(app.config.get('HEALTH_PROBE_INTERVAL_SECONDS', self.DEFAULT_INTERVAL_SECONDS))
+            state = self._state
+            if state is None or state.age_seconds() > interval:
+                self.probe_once(app, connection_factory, scheduler_status)
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    self.probe_once(app, connection_factory, scheduler_status)
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=run, name='health-prober', daemon=True)
+            self._thread.start()
+
+    def ensure_running(self, app, connection_factory, scheduler_status) -> None:
+        # Cheap check on every health request; starts the thread on the first
+        # one and restarts it after a fork.
+        if self._pid != os.getpid():
+            self.start(app, connection_factory, scheduler_status)
+
+    # --- Responses ---
+
+    def _probe_fields(self, state: HealthState | None) -> dict:
+        if state is None:
+            return {"probe_age_seconds": None, "last_ping_ms": None}
+        return {"probe_age_seconds": round(state.age_seconds(), 3), "last_ping_ms": state.ping_ms}
+
+    def is_ready(self, config) -> bool:
+        """
+        Ready unless MongoDB failed FAILURE_THRESHOLD probes in a row or the
+        last probe is older than MAX_AGE (the prober is stuck).
+        """
+        state = self._state
+        if state is None:
+            return False
+        max_age = float(config.get('HEALTH_MAX_PROBE_AGE_SECONDS', self.DEFAULT_MAX_AGE_SECONDS))
+        threshold = int(config.get('HEALTH_READY_FAILURE_THRESHOLD', self.DEFAULT_FAILURE_THRESHOLD))
+        if state.age_seconds() > max_age:
+            return False
+        return state.db_ok or state.consecutive_failures < threshold
+
+    def liveness(self) -> tuple[dict, int]:
+        """The process is serving requests; does not depend on MongoDB."""
+        return dict({"status": "alive"}, **self._probe_fields(self._state)), 200
+
+    def readiness(self, config) -> tuple[dict, int]:
+        state = self._state
+        ready = self.is_ready(config)
+        payload = {"status": "ready" if ready else "not_ready"}
+        payload.update(self._probe_fields(state))
+        if state is not None:
+            payload["db_status"] = state.db_status
+            payload["consecutive_failures"] = state.consecutive_failures
+        return payload, 200 if ready else 503
+
+    def health(self, config) -> tuple[dict, int]:
+        state = self._state
+        ready = self.is_ready(config)
+        payload = {"status": "OK" if ready else "ERROR"}
+        if state is None:
+            payload.update(database={"status": "Health probe has not completed yet", "name": None},
+                           scheduler=None)
+        else:
+            payload.update(database={"status": state.db_status, "name": state.db_name},
+                           scheduler=state.scheduler_status,
+                           consecutive_failures=state.consecutive_failures)
+        payload.update(self._probe_fields(state))
+        return payload, 200 if ready else 503
+
+
+health_prober = HealthProber()
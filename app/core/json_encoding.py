@@ -0,0 +1,76 @@
+"""
+Pluggable JSON encoding for Flask's jsonify.
+
+Flask 1.1 serializes through `app.json_encoder`. FastJSONEncoder keeps that
+entry point, so every jsonify call in the app uses it, and swaps the
+encoding itself for orjson when JSON_BACKEND is 'orjson' (the default) and
+orjson is installed. Pretty-printed output (indent, e.g. in debug mode) and
+the 'stdlib' backend use the standard library encoder.
+
+Both backends encode Decimal as float, ObjectId as str, datetime/date with
+isoformat() and Enum members by value, the same as the response schemas'
+json_encoders and app/schemas/read_models.py. Keys are sorted when
+JSON_SORT_KEYS is set, as before. orjson writes non-ASCII characters as
+UTF-8 instead of \\u escapes (same JSON, fewer bytes).
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+from bson import ObjectId
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+BACKENDS = ('orjson', 'stdlib')
+
+
+def encode_default(o):
+    """Types beyond plain JSON, encoded as the response schemas encode them."""
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Enum):
+        return o.value
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def orjson_dumps(obj, sort_keys: bool = True) -> bytes:
+    # Datetimes go through encode_default so they match isoformat() exactly.
+    option = orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(obj, default=encode_default, option=option)
+
+
+class StdlibJSONEncoder(JSONEncoder):
+    """Flask's encoder with the response schemas' handling of Decimal, ObjectId, datetime and Enum."""
+
+    def default(self, o):
+        try:
+            return encode_default(o)
+        except TypeError:
+            return super().default(o)
+
+
+class FastJSONEncoder(StdlibJSONEncoder):
+    """orjson for compact output; the stdlib encoder for pretty-printing."""
+
+    def encode(self, o):
+        if self.indent is None:
+            return orjson_dumps(o, sort_keys=self.sort_keys).decode('utf-8')
+        return super().encode(o)
+
+
+def encoder_for(config) -> type:
+    """The json_encoder class for JSON_BACKEND ('orjson' needs the orjson package)."""
+    backend = str(config.get('JSON_BACKEND', 'orjson')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON_BACKEND '{backend}'; expected one of {', '.join(BACKENDS)}.")
+    if backend == 'orjson' and orjson is not None:
+        return FastJSONEncoder
+    return StdlibJSONEncoder
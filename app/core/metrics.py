@@ -0,0 +1,420 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Every thread writes into its own shard (a plain dict owned by that thread),
+so recording a sample takes no lock. A scrape merges the shards. Shards of
+finished threads are folded into a "retired" shard so counters survive the
+thread.
+
+With several worker processes (gunicorn), set METRICS_MULTIPROC_DIR to a
+directory shared by the workers of one host/pod. Each process periodically
+writes its merged values there, and /metrics in any worker merges every
+process's file. Counters and histograms are summed over all files, including
+those of processes that have exited. Gauges only count live processes.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+LAG_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 21600.0, 86400.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return (self.name, tuple(str(labels[label]) for label in self.labelnames))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        values = self._registry._shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0.0) + amount
+
+
+class Gauge(Counter):
+    """Up/down value. Per-thread deltas are summed, so inc and dec may happen on different threads."""
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        values = self._registry._shard()
+        key = self._key(labels)
+        data = values.get(key)
+        if data is None:
+            # One (non-cumulative) count per bucket, then +Inf, then the sum.
+            data = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+
+def _merge_into(target: dict, source: dict) -> None:
+    for key, value in source.items():
+        if isinstance(value, list):
+            existing = target.get(key)
+            if existing is None:
+                target[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    existing[i] += v
+        else:
+            target[key] = target.get(key, 0.0) + value
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return f'{int(value)}'
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Holds metric definitions and the per-thread shards they record into."""
+
+    DEFAULT_FLUSH_SECONDS = 5.0
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._local = threading.local()
+        self._shards: dict[int, dict] = {}  # id(shard) -> shard, one per live thread
+        self._retired: dict = {}
+        self._shards_lock = threading.Lock()  # Only taken when a thread creates or retires its shard
+        self.multiproc_dir: str | None = None
+        self.flush_seconds = self.DEFAULT_FLUSH_SECONDS
+        self._flusher: threading.Thread | None = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    # --- Definitions ---
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    # --- Recording ---
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+            if self.multiproc_dir and self._flusher is None:
+                self._start_flusher()
+        return shard
+
+    def _retire(self, shard: dict) -> None:
+        with self._shards_lock:
+            # A shard inherited across fork() is no longer registered; skip it.
+            if self._shards.pop(id(shard), None) is shard:
+                _merge_into(self._retired, shard)
+
+    def _reset_after_fork(self) -> None:
+        # Values recorded by the parent belong to the parent's file, not ours.
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        self._flusher = None
+
+    # --- Collection ---
+
+    def collect(self) -> dict:
+        """Merged values of this process: {(name, label_values): float | [bucket counts..., sum]}."""
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            merged = {}
+            _merge_into(merged, self._retired)
+        for shard in shards:
+            # dict() of a dict is atomic under the GIL; histogram lists may be
+            # read mid-update, which at worst skews one sample into the next scrape.
+            _merge_into(merged, dict(shard))
+        return merged
+
+    # --- Multi-process ---
+
+    def configure(self, multiproc_dir: str | None = None, flush_seconds: float | None = None) -> None:
+        self.multiproc_dir = multiproc_dir or None
+        if flush_seconds is not None:
+            self.flush_seconds = max(0.5, float(flush_seconds))
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+
+    def _process_file(self, pid: int | None = None) -> str:
+        return os.path.join(self.multiproc_dir, f'metrics_{pid or os.getpid()}.json')
+
+    def flush(self) -> None:
+        """Writes this process's values to its file in METRICS_MULTIPROC_DIR (atomic replace)."""
+        if not self.multiproc_dir:
+            return
+        samples = [[name, list(label_values), value] for (name, label_values), value in self.collect().items()]
+        fd, tmp_path = tempfile.mkstemp(dir=self.multiproc_dir, prefix='.metrics_', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'pid': os.getpid(), 'samples': samples}, f)
+        os.replace(tmp_path, self._process_file())
+
+    def _start_flusher(self) -> None:
+        def run():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.flush()
+                except Exception:
+                    pass  # Best effort; the next flush retries
+        self._flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _collect_all_processes(self) -> dict:
+        self.flush()
+        merged = {}
+        for entry in os.scandir(self.multiproc_dir):
+            if not (entry.name.startswith('metrics_') and entry.name.endswith('.json')):
+                continue
+            try:
+                with open(entry.path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = data.get('pid') == os.getpid() or _pid_alive(data.get('pid', 0))
+            values = {}
+            for name, label_values, value in data.get('samples', []):
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values[(name, tuple(label_values))] = value
+            _merge_into(merged, values)
+        return merged
+
+    # --- Exposition ---
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        values = self._collect_all_processes() if self.multiproc_dir else self.collect()
+        by_metric: dict[str, list] = {}
+        for (name, label_values), value in values.items():
+            by_metric.setdefault(name, []).append((label_values, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for label_values, value in sorted(by_metric.get(name, [])):
+                labels = _format_labels(metric.labelnames, label_values)
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{labels} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                bounds = [repr(b) for b in metric.buckets] + ['+Inf']
+                for bound, count in zip(bounds, value):
+                    cumulative += count
+                    bucket_labels = _format_labels(metric.labelnames + ('le',), label_values + (bound,))
+                    lines.append(f'{name}_bucket{bucket_labels} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{labels} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{labels} {_format_value(cumulative)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Request latency per blueprint route.',
+    ('blueprint', 'route', 'method'))
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'Requests per blueprint route and status code.',
+    ('blueprint', 'route', 'method', 'status'))
+MONGO_COMMAND_DURATION = registry.histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency as reported by the driver.',
+    ('command',))
+MONGO_COMMAND_ERRORS = registry.counter(
+    'mongo_command_errors_total', 'Failed MongoDB commands.',
+    ('command',))
+MONGO_POOL_CONNECTIONS = registry.gauge(
+    'mongo_pool_connections', 'Open connections in the driver connection pool.',
+    ('address',))
+MONGO_POOL_CHECKED_OUT = registry.gauge(
+    'mongo_pool_checked_out_connections', 'Pool connections currently checked out by a thread.',
+    ('address',))
+MONGO_POOL_CHECKOUT_WAIT = registry.histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time an operation waited for a pool connection, including failed checkouts.',
+    ('address',))
+MONGO_POOL_CHECKOUT_FAILURES = registry.counter(
+    'mongo_pool_checkout_failures_total', 'Failed pool checkouts by reason (timeout, connectionError, poolClosed).',
+    ('address', 'reason'))
+SUBSCRIPTION_CACHE_LOOKUPS = registry.counter(
+    'subscription_cache_lookups_total',
+    'Subscription cache lookups by result (hit, miss, coalesced onto another load, error).',
+    ('result',))
+PLAN_CACHE_LOOKUPS = registry.counter(
+    'plan_cache_lookups_total', 'Plan cache lookups by result (hit, miss); a bulk lookup counts each plan.',
+    ('result',))
+PLAN_CACHE_LOADS = registry.counter(
+    'plan_cache_loads_total', 'Plan catalog loads from MongoDB into the plan cache.')
+JWT_CACHE_LOOKUPS = registry.counter(
+    'jwt_cache_lookups_total', 'Verified-token cache lookups by result (hit, miss).',
+    ('result',))
+JWT_CACHE_EVICTIONS = registry.counter(
+    'jwt_cache_evictions_total', 'Verified tokens evicted from the cache to stay within JWT_CACHE_MAX_SIZE.')
+RATE_LIMITED_REQUESTS = registry.counter(
+    'rate_limited_requests_total', 'Requests answered with 429 by route and the bucket that ran out (user, global).',
+    ('route', 'scope'))
+EXPIRATION_RUN_DURATION = registry.histogram(
+    'expiration_job_duration_seconds', 'Duration of expiration job runs.',
+    ('strategy',), buckets=JOB_DURATION_BUCKETS)
+EXPIRATION_RUNS = registry.counter(
+    'expiration_job_runs_total', 'Expiration job runs by outcome (complete, partial, error).',
+    ('strategy', 'outcome'))
+EXPIRATION_EXPIRED = registry.counter(
+    'expiration_job_expired_subscriptions_total', 'Subscriptions flipped to EXPIRED by the job.',
+    ('strategy',))
+WEBHOOK_BATCHES = registry.counter(
+    'webhook_batches_total', 'Webhook batches by outcome (delivered, failed, dead_lettered).',
+    ('target', 'outcome'))
+WEBHOOK_EVENTS = registry.counter(
+    'webhook_events_total', 'Events in webhook batches by outcome (delivered, failed, dead_lettered).',
+    ('target', 'outcome'))
+WEBHOOK_REQUEST_DURATION = registry.histogram(
+    'webhook_request_duration_seconds', 'Latency of webhook POSTs, including failed ones.',
+    ('target',))
+WEBHOOK_DELIVERY_LAG = registry.histogram(
+    'webhook_delivery_lag_seconds', 'Time from an event occurring to its delivery being acknowledged.',
+    ('target',), buckets=LAG_BUCKETS)
+
+
+def _address(address) -> str:
+    host, port = address
+    return f'{host}:{port}'
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records driver-reported command latency and failures."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_ERRORS.inc(command=event.command_name)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out pool connections and checkout wait time per server address."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.inc(address=_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.dec(address=_address(event.address))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        address = _address(event.address)
+        if event.duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(event.duration, address=address)
+        MONGO_POOL_CHECKOUT_FAILURES.inc(address=address, reason=event.reason)
+
+    def connection_checked_out(self, event):
+        address = _address(event.address)
+        if event.duration is not None:
+            MONGO_POOL_CHECKOUT_WAIT.observe(event.duration, address=address)
+        MONGO_POOL_CHECKED_OUT.inc(address=address)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec(address=_address(event.address))
+
+
+_listeners_installed = False
+
+
+def install_mongo_listeners() -> None:
+    """
+    Registers the command and pool listeners with the driver. Only clients
+    created afterwards are monitored, so call this before init_db.
+    """
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    monitoring.register(MongoCommandMetrics())
+    monitoring.register(MongoPoolMetrics())
+    _listeners_installed = True
@@ -0,0 +1,125 @@
+"""
+MongoDB client options and per-operation routing.
+
+`client_settings` adds the MONGO_* pool, timeout, compression and default
+read preference settings to MONGODB_SETTINGS, for MongoEngine and for the
+ASGI app's AsyncMongoClient alike. Keys already present in MONGODB_SETTINGS
+win.
+
+Individual operations ask for their own options:
+- `read_preference(config, 'catalog' | 'history')` for the plan catalog load
+  and subscription history pages, which may read from a secondary that is at
+  most MONGO_MAX_STALENESS_SECONDS behind the primary;
+- `status_write_concern(config)` for subscription status writes (create,
+  upgrade, cancel, expire), also used as the write concern of their outbox
+  transactions.
+
+Every other operation uses the client's defaults.
+"""
+from contextlib import nullcontext
+from functools import lru_cache
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+
+READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primarypreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondarypreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+# Operations with their own read preference setting
+WORKLOAD_READ_PREFERENCES = {
+    'catalog': 'MONGO_CATALOG_READ_PREFERENCE',
+    'history': 'MONGO_HISTORY_READ_PREFERENCE',
+}
+# The server rejects a smaller maxStalenessSeconds
+MIN_MAX_STALENESS_SECONDS = 90
+
+# MongoClient option -> config key. A value of None (or 0 for the limits
+# where the driver has no 0) leaves the driver default.
+_CLIENT_OPTIONS = (
+    ('maxPoolSize', 'MONGO_MAX_POOL_SIZE'),
+    ('minPoolSize', 'MONGO_MIN_POOL_SIZE'),
+    ('maxConnecting', 'MONGO_MAX_CONNECTING'),
+    ('maxIdleTimeMS', 'MONGO_MAX_IDLE_TIME_MS'),
+    ('waitQueueTimeoutMS', 'MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+    ('connectTimeoutMS', 'MONGO_CONNECT_TIMEOUT_MS'),
+    ('socketTimeoutMS', 'MONGO_SOCKET_TIMEOUT_MS'),
+    ('serverSelectionTimeoutMS', 'MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+    ('compressors', 'MONGO_COMPRESSORS'),
+    ('appname', 'MONGO_APP_NAME'),
+)
+_ZERO_MEANS_UNSET = {'maxConnecting', 'maxIdleTimeMS', 'waitQueueTimeoutMS', 'socketTimeoutMS'}
+
+
+@lru_cache(maxsize=None)
+def make_read_preference(mode: str, max_staleness: int = -1):
+    """
+    A pymongo read preference from its name ('secondaryPreferred', 'nearest', ...).
+    `max_staleness` (seconds, -1 for no bound) applies to every mode but primary.
+    """
+    try:
+        preference_class = READ_PREFERENCE_MODES[mode.replace('_', '').lower()]
+    except KeyError:
+        raise ValueError(f"Unknown read preference '{mode}'; expected one of "
+                         f"primary, primaryPreferred, secondary, secondaryPreferred, nearest.")
+    if preference_class is Primary:
+        return Primary()
+    if max_staleness != -1 and max_staleness < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"MONGO_MAX_STALENESS_SECONDS must be -1 or at least {MIN_MAX_STALENESS_SECONDS}.")
+    return preference_class(max_staleness=max_staleness)
+
+
+def read_preference(config, workload: str | None = None):
+    """
+    Read preference of `workload` ('catalog', 'history'). Workloads without
+    a setting of their own, and an empty setting, use MONGO_READ_PREFERENCE.
+    """
+    default_mode = config.get('MONGO_READ_PREFERENCE') or 'primary'
+    mode = config.get(WORKLOAD_READ_PREFERENCES.get(workload, 'MONGO_READ_PREFERENCE')) or default_mode
+    return make_read_preference(mode, int(config.get('MONGO_MAX_STALENESS_SECONDS', -1)))
+
+
+def reads_secondaries(preference) -> bool:
+    return not isinstance(preference, Primary)
+
+
+def causal_session(client, preference):
+    """
+    A causally consistent session for reads under `preference`, or a context
+    yielding None when they all go to the primary. A read routed to a
+    secondary within the session waits until that secondary has applied
+    everything the session's earlier reads saw.
+    """
+    if not reads_secondaries(preference):
+        return nullcontext(None)
+    return client.start_session(causal_consistency=True)
+
+
+@lru_cache(maxsize=None)
+def _write_concern(w, wtimeout: int | None) -> WriteConcern:
+    return WriteConcern(w=w, wtimeout=wtimeout)
+
+
+def status_write_concern(config) -> WriteConcern:
+    """MONGO_STATUS_WRITE_CONCERN ('majority', or a number of members) with MONGO_STATUS_WRITE_TIMEOUT_MS."""
+    w = str(config.get('MONGO_STATUS_WRITE_CONCERN') or 'majority')
+    timeout = int(config.get('MONGO_STATUS_WRITE_TIMEOUT_MS', 0))
+    return _write_concern(int(w) if w.isdigit() else w, timeout or None)
+
+
+def client_settings(config) -> dict:
+    """MONGODB_SETTINGS with the configured MONGO_* client options added."""
+    settings = dict(config.get('MONGODB_SETTINGS') or {})
+    present = {key.lower() for key in settings}
+    for option, key in _CLIENT_OPTIONS:
+        value = config.get(key)
+        if value is None or value == '' or (value == 0 and option in _ZERO_MEANS_UNSET):
+            continue
+        if option.lower() not in present:
+            settings[option] = value
+    if 'read_preference' not in present:
+        settings['read_preference'] = read_preference(config)
+    return settings
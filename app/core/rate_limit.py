@@ -0,0 +1,228 @@
+"""
+Token-bucket rate limiting of authenticated requests.
+
+jwt_required (Flask and ASGI) asks the limiter once the token's user is
+known. A request takes one token from two buckets:
+- the user's bucket for the route (the view function), refilled at
+  RATE_LIMIT_USER_RATE tokens per second up to RATE_LIMIT_USER_BURST, or at
+  the route's own rate from RATE_LIMIT_ROUTES;
+- with RATE_LIMIT_GLOBAL_RATE set, one bucket shared by all users and routes.
+A request is only admitted if both buckets have a token; otherwise it is
+answered with 429 and a Retry-After header, and no token is taken.
+
+Stores (RATE_LIMIT_BACKEND):
+- 'local': buckets in process memory, one lock, no I/O; a check costs a
+  few microseconds. Limits apply per worker process.
+- 'redis': buckets in a Redis-protocol server shared by every worker,
+  checked and updated atomically by one Lua script per request. Needs the
+  optional `redis` package. If Redis is unreachable requests are admitted.
+"""
+import logging
+import math
+import threading
+import time
+
+from app.core import metrics
+
+try:
+    import redis
+except ImportError:  # Optional: only the 'redis' store needs it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY = 'global'
+SCOPES = ('user', 'global')
+
+# KEYS: bucket keys; ARGV: rate, burst for each key. Returns {admitted, retry_after, denied key index}.
+_TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local tokens = {}
+local wait, denied = 0, 0
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = burst
+    if state[1] then
+        available = math.min(burst, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+    end
+    tokens[i] = available
+    if available < 1 and (1 - available) / rate > wait then
+        wait, denied = (1 - available) / rate, i
+    end
+end
+if denied > 0 then
+    return {0, tostring(wait), denied - 1}
+end
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return {1, '0', -1}
+"""
+
+
+def validate_limit(name: str, rate: float, burst: float) -> tuple[float, float]:
+    """(rate, burst) if a bucket with them can ever admit a request; raises ValueError otherwise."""
+    if not rate > 0:
+        raise ValueError(f"{name}: the rate must be above 0 tokens per second, got {rate:g}.")
+    if not burst >= 1:
+        raise ValueError(f"{name}: the burst must be at least 1, got {burst:g}.")
+    return rate, burst
+
+
+def parse_route_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """'create_subscription_endpoint=0.5/5,get_user_subscription_endpoint=10/30' -> {route: (rate, burst)}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            route, limit = item.split('=', 1)
+            rate, burst = limit.split('/', 1)
+            rate, burst = float(rate), float(burst)
+        except ValueError:
+            raise ValueError(f"Invalid RATE_LIMIT_ROUTES entry '{item}'; expected <view function>=<rate>/<burst>.")
+        limits[route.strip()] = validate_limit(f"RATE_LIMIT_ROUTES entry '{item}'", rate, burst)
+    return limits
+
+
+class LocalBucketStore:
+    """Token buckets in process memory. Buckets that have refilled completely are pruned past max_keys."""
+    shared = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [tokens, updated_at, rate, burst]
+        self._buckets: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets: list[tuple[str, float, float]]) -> tuple[float, int]:
+        """
+        Takes a token from every (key, rate, burst) bucket if all have one.
+        Returns (0.0, -1) if admitted, else (seconds until the emptiest
+        bucket has a token, index of that bucket).
+        """
+        now = time.monotonic()
+        with self._lock:
+            states = []
+            wait, denied = 0.0, -1
+            for index, (key, rate, burst) in enumerate(buckets):
+                state = self._buckets.get(key)
+                if state is None:
+                    state = [burst, now, rate, burst]
+                else:
+                    state[0] = min(burst, state[0] + (now - state[1]) * rate)
+                    state[1] = now
+                if state[0] < 1 and (1 - state[0]) / rate > wait:
+                    wait, denied = (1 - state[0]) / rate, index
+                states.append((key, state))
+            if denied >= 0:
+                return wait, denied
+            for key, state in states:
+                state[0] -= 1
+                self._buckets[key] = state
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0.0, -1
+
+    def _prune(self, now: float) -> None:
+        # Caller holds the lock. A full bucket is the same as no bucket.
+        full = [key for key, (tokens, updated_at, rate, burst) in self._buckets.items()
+                if tokens + (now - updated_at) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Token buckets in a Redis-protocol server, shared by every process using it."""
+    shared = True
+
+    def __init__(self, client, prefix: str = 'ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, timeout_seconds: float = 0.1) -> 'RedisBucketStore':
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package (pip install redis).")
+        return cls(redis.Redis.from_url(url, socket_timeout=timeout_seconds, socket_connect_timeout=timeout_seconds))
+
+    def acquire(self, buckets: list[tuple[str, float, float]]) -> tuple[float, int]:
+        args = []
+        for _, rate, burst in buckets:
+            args.extend((rate, burst))
+        admitted, wait, denied = self._script(keys=[self.prefix + key for key, _, _ in buckets], args=args)
+        return (0.0, -1) if admitted else (float(wait), int(denied))
+
+
+class RateLimiter:
+    """See the module docstring. Admits everything until configure() picks a store."""
+
+    def __init__(self):
+        self.store = None
+        self.user_limit = (5.0, 20.0)
+        self.global_limit: tuple[float, float] | None = None
+        self.route_limits: dict[str, tuple[float, float]] = {}
+
+    def configure(self, config, store=None) -> None:
+        """
+        Builds the store named by RATE_LIMIT_BACKEND ('local', 'redis'), or
+        uses `store` if given. Raises ValueError for a limit that could never
+        admit a request (rate <= 0 or burst < 1).
+        """
+        self.user_limit = validate_limit('RATE_LIMIT_USER_RATE/RATE_LIMIT_USER_BURST',
+                                         float(config.get('RATE_LIMIT_USER_RATE', 5)),
+                                         float(config.get('RATE_LIMIT_USER_BURST', 20)))
+        global_rate = float(config.get('RATE_LIMIT_GLOBAL_RATE', 0))
+        global_burst = float(config.get('RATE_LIMIT_GLOBAL_BURST', 0)) or max(global_rate, 1.0)
+        self.global_limit = None
+        if global_rate > 0:
+            self.global_limit = validate_limit('RATE_LIMIT_GLOBAL_RATE/RATE_LIMIT_GLOBAL_BURST', global_rate, global_burst)
+        self.route_limits = parse_route_limits(config.get('RATE_LIMIT_ROUTES', ''))
+        if store is None:
+            name = (config.get('RATE_LIMIT_BACKEND') or '').lower()
+            if name == 'local':
+                store = LocalBucketStore(int(config.get('RATE_LIMIT_MAX_KEYS', 100000)))
+            elif name == 'redis':
+                store = RedisBucketStore.from_url(config.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0'))
+            elif name not in ('', 'none'):
+                logger.warning(f"Unknown RATE_LIMIT_BACKEND '{name}'; rate limiting disabled.")
+        self.store = store
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    @property
+    def shared(self) -> bool:
+        return self.store is not None and self.store.shared
+
+    def check(self, user_id: str, route: str) -> float:
+        """Takes a token for `user_id` on `route`: 0.0 if admitted, else the seconds to wait before retrying."""
+        store = self.store
+        if store is None:
+            return 0.0
+        rate, burst = self.route_limits.get(route, self.user_limit)
+        buckets = [(f"{user_id}:{route}", rate, burst)]
+        if self.global_limit is not None:
+            buckets.append((GLOBAL_KEY, *self.global_limit))
+        try:
+            wait, denied = store.acquire(buckets)
+        except Exception as e:
+            # Fail open: a broken limiter must not take the API down with it.
+            logger.warning(f"Rate limit check failed, request admitted: {e}")
+            return 0.0
+        if denied < 0:
+            return 0.0
+        metrics.RATE_LIMITED_REQUESTS.inc(route=route, scope=SCOPES[denied])
+        return wait
+
+
+def retry_after_header(wait: float) -> str:
+    """Retry-After is whole seconds; round up so a client retrying on time finds a token."""
+    return str(max(1, math.ceil(wait)))
+
+
+rate_limiter = RateLimiter()
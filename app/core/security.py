@@ -1,10 +1,114 @@
 from functools import wraps
+from collections import OrderedDict
 from flask import request, jsonify, g, current_app
+import hashlib
+import threading
+import time
 import jwt
 from datetime import datetime, timedelta, timezone
 
+from app.core import metrics
+from app.core.rate_limit import rate_limiter, retry_after_header
+
 # This is a simplified JWT setup. For production, consider robust libraries.
 
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of successfully verified JWT payloads.
+
+    Keys are SHA-256 digests of the raw token, so tokens themselves are never
+    held in memory longer than the request. An entry expires at the token's
+    'exp' claim (or earlier, if max_ttl_seconds is set); tokens without 'exp'
+    are never cached. The whole cache is flushed when the signing key or
+    algorithm changes.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._signing_key: tuple | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, config) -> None:
+        """Applies JWT_CACHE_MAX_SIZE; called once when the app is set up."""
+        with self._lock:
+            self.max_size = int(config.get('JWT_CACHE_MAX_SIZE', self.max_size))
+            self._evict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def _check_signing_key(self, signing_key: tuple) -> None:
+        # Caller holds the lock. Plain equality is enough: the secret itself
+        # never leaves the app config.
+        if self._signing_key != signing_key:
+            self._entries.clear()
+            self._signing_key = signing_key
+
+    def get(self, digest: bytes, signing_key: tuple, now: float) -> dict | None:
+        with self._lock:
+            self._check_signing_key(signing_key)
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                metrics.JWT_CACHE_LOOKUPS.inc(result='miss')
+                return None
+            payload, expires_at = entry
+            if expires_at <= now:
+                del self._entries[digest]
+                self.misses += 1
+                metrics.JWT_CACHE_LOOKUPS.inc(result='miss')
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            metrics.JWT_CACHE_LOOKUPS.inc(result='hit')
+            return payload
+
+    def put(self, digest: bytes, signing_key: tuple, payload: dict, expires_at: float) -> None:
+        with self._lock:
+            self._check_signing_key(signing_key)
+            self._entries[digest] = (payload, expires_at)
+            self._entries.move_to_end(digest)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds the lock.
+        evicted = 0
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            metrics.JWT_CACHE_EVICTIONS.inc(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache()
+
+
+def get_token_cache_stats() -> dict:
+    """Hit/miss counters of the verified-token cache, for sizing JWT_CACHE_MAX_SIZE."""
+    return token_cache.stats()
+
 def generate_token(user_id: any, expires_delta_minutes: int = 60 * 24 * 7) -> str: # e.g., 7 days
     """
     Generates a JWT token.
@@ -29,53 +133,87 @@ def decode_token(token: str) -> dict | None:
     """
     Decodes a JWT token.
     Returns the payload if valid, None otherwise.
+    Verified payloads are served from the token cache until the token expires.
     """
-    secret_key = current_app.config['SECRET_KEY']
-    algorithms = [current_app.config['JWT_ALGORITHM']] # PyJWT expects a list of algorithms
+    return verify_token(token, current_app.config, current_app.logger)
+
+def verify_token(token: str, config, logger) -> dict | None:
+    """
+    decode_token without the Flask app context: `config` is any mapping with
+    the app settings (SECRET_KEY, JWT_ALGORITHM, JWT_CACHE_*). Used by both
+    the Flask and the ASGI serving modes.
+    """
+    secret_key = config['SECRET_KEY']
+    algorithms = [config['JWT_ALGORITHM']] # PyJWT expects a list of algorithms
 
     if not secret_key or not algorithms[0]:
-        current_app.logger.error("JWT SECRET_KEY or JWT_ALGORITHM not configured for decoding.")
+        logger.error("JWT SECRET_KEY or JWT_ALGORITHM not configured for decoding.")
         return None # Or raise an error
 
+    use_cache = config.get('JWT_CACHE_ENABLED', True)
+    if use_cache:
+        signing_key = (secret_key, algorithms[0])
+        digest = token_cache.digest(token)
+        now = time.time()
+        cached_payload = token_cache.get(digest, signing_key, now)
+        if cached_payload is not None:
+            return cached_payload
+
     try:
         payload = jwt.decode(token, secret_key, algorithms=algorithms)
+        if use_cache and isinstance(payload.get('exp'), (int, float)):
+            expires_at = float(payload['exp'])
+            max_ttl = config.get('JWT_CACHE_MAX_TTL_SECONDS', 0)
+            if max_ttl:
+                expires_at = min(expires_at, now + max_ttl)
+            token_cache.put(digest, signing_key, payload, expires_at)
         return payload
     except jwt.ExpiredSignatureError:
-        current_app.logger.warning("Token has expired.")
+        logger.warning("Token has expired.")
         return None 
     except jwt.InvalidTokenError as e:
-        current_app.logger.warning(f"Invalid token: {e}")
+        logger.warning(f"Invalid token: {e}")
         return None
     except Exception as e: # Catch any other unexpected JWT errors
-        current_app.logger.error(f"Error decoding token: {e}")
+        logger.error(f"Error decoding token: {e}")
         return None
 
-def jwt_required(f):
+def parse_bearer_token(auth_header: str | None) -> tuple[str | None, str | None]:
     """
-    Decorator to protect routes that require JWT authentication.
-    Extracts user_id from token and stores it in Flask's 'g.user_id'.
+    Extracts the token from an 'Authorization: Bearer <token>' header.
+    Returns (token, None) on success, or (None, error_message) for a 401.
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        token = None
+    if not auth_header:
+        return None, "Authorization header is missing"
 
-        if not auth_header:
-            return jsonify({"error": "Authorization header is missing"}), 401
+    parts = auth_header.split()
 
-        parts = auth_header.split()
+    if not parts or parts[0].lower() != 'bearer':
+        return None, "Invalid Authorization header format. Expected 'Bearer <token>'"
+    elif len(parts) == 1:
+        return None, "Token not found after 'Bearer'"
+    elif len(parts) > 2:
+        return None, "Invalid Authorization header format. Too many parts."
 
-        if parts[0].lower() != 'bearer':
-            return jsonify({"error": "Invalid Authorization header format. Expected 'Bearer <token>'"}), 401
-        elif len(parts) == 1:
-            return jsonify({"error": "Token not found after 'Bearer'"}), 401
-        elif len(parts) > 2:
-            return jsonify({"error": "Invalid Authorization header format. Too many parts."}), 401
-        
-        token = parts[1]
+    token = parts[1]
+
+    if not token: # Should be caught by len(parts) == 1, but defensive
+        return None, "Token is missing"
+    return token, None
 
-        if not token: # Should be caught by len(parts) == 1, but defensive
-            return jsonify({"error": "Token is missing"}), 401
+def jwt_required(f):
+    """
+    Decorator to protect routes that require JWT authentication.
+    Extracts user_id from token and stores it in Flask's 'g.user_id', then
+    applies the user's rate limit for this route (app/core/rate_limit.py).
+    """
+    route = f.__name__
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token, error = parse_bearer_token(request.headers.get('Authorization'))
+        if error:
+            return jsonify({"error": error}), 401
 
         payload = decode_token(token)
 
@@ -88,7 +226,11 @@ def jwt_required(f):
             return jsonify({"error": "Token does not contain user identifier ('sub' claim)"}), 401
         
         g.user_id = user_id_from_token # Store user_id in Flask's global context 'g'
-        
+
+        wait = rate_limiter.check(user_id_from_token, route)
+        if wait:
+            return jsonify({"error": "Too many requests"}), 429, {"Retry-After": retry_after_header(wait)}
+
         return f(*args, **kwargs)
     return decorated_function
 
@@ -99,15 +241,24 @@ def get_current_user_id() -> str | None:
     """
     return getattr(g, 'user_id', None)
 
-# Optional: Admin-specific decorator (if you had roles)
-# def admin_required(f):
-#     @wraps(f)
-#     @jwt_required # Ensures user is authenticated first
-#     def decorated_function(*args, **kwargs):
-#         user_id = get_current_user_id()
-#         # Example: Check if user_id belongs to an admin
-#         # This would typically involve a database lookup or checking another claim in the token
-#         if not is_admin(user_id): # is_admin() is a hypothetical function
-#             return jsonify({"error": "Administrator access required"}), 403
-#         return f(*args, **kwargs)
-#     return decorated_function
\ No newline at end of file
+def is_admin(user_id: str | None) -> bool:
+    """
+    Returns True if the user is an administrator.
+    Administrators are listed in the ADMIN_USER_IDS config (comma-separated in the environment).
+    """
+    return bool(user_id) and user_id in current_app.config.get('ADMIN_USER_IDS', ())
+
+def admin_required(f):
+    """
+    Decorator for administrative routes: requires a valid JWT (see jwt_required)
+    whose 'sub' is listed in ADMIN_USER_IDS.
+    """
+    # wraps(f) first, so jwt_required keys the rate limit by the view's own name
+    @jwt_required # Ensures user is authenticated first
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_id = get_current_user_id()
+        if not is_admin(user_id):
+            return jsonify({"error": "Administrator access required"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Startup profiling: where worker boot time goes.
+
+create_app() wraps each component it sets up in `profiler.phase(name)`.
+Phases cost nothing until the profiler is enabled (`python run.py
+--profile-startup`, or PROFILE_STARTUP=1 for any entry point); then each one
+records its wall time and the modules first imported while it ran, grouped
+by top-level package, so import cost and initialization cost show up
+against the component that pays them.
+
+For a per-module breakdown of a single phase, combine it with
+`python -X importtime run.py --profile-startup`.
+"""
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import NamedTuple
+
+
+class Phase(NamedTuple):
+    name: str
+    seconds: float
+    modules: tuple  # Modules first imported during the phase
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.phases: list[Phase] = []
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        modules_before = set(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, modules_before)
+
+    def record(self, name: str, started: float, modules_before: set) -> None:
+        """Records a phase that began at `started` (perf_counter) with `modules_before` loaded."""
+        if self.enabled:
+            new_modules = tuple(sorted(set(sys.modules) - modules_before))
+            self.phases.append(Phase(name, time.perf_counter() - started, new_modules))
+
+    def report(self, top_packages: int = 4) -> str:
+        total = sum(phase.seconds for phase in self.phases)
+        lines = [f"{'component':<28}{'ms':>9}{'share':>8}{'imports':>9}  heaviest packages (modules)"]
+        for phase in self.phases:
+            packages = Counter(module.partition('.')[0] for module in phase.modules)
+            heaviest = ', '.join(f"{package} ({count})" for package, count in packages.most_common(top_packages))
+            share = phase.seconds / total * 100 if total else 0.0
+            lines.append(f"{phase.name:<28}{phase.seconds * 1000:>9.1f}{share:>7.1f}%{len(phase.modules):>9}  {heaviest}".rstrip())
+        lines.append(f"{'total':<28}{total * 1000:>9.1f}{100.0 if total else 0.0:>7.1f}%"
+                     f"{sum(len(phase.modules) for phase in self.phases):>9}")
+        return '\n'.join(lines)
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,60 @@
+from flask import current_app
+from pymongo import UpdateOne
+
+from app.models.plan import PlanSnapshot
+from app.models.subscription import Subscription
+from app.services.plan_service import PlanService
+
+
+def backfill_plan_snapshots(batch_size: int = 1000, dry_run: bool = False) -> dict:
+    """
+    Embeds a PlanSnapshot in every Subscription that does not have one yet.
+
+    Walks subscriptions without a snapshot in _id order (keyset, so documents
+    whose plan no longer exists are skipped instead of re-read forever),
+    resolves each batch's plans with one batched lookup and writes the
+    snapshots with one unordered bulk_write per batch. Safe to re-run.
+    """
+    collection = Subscription._get_collection()
+    query = {'plan_snapshot': {'$exists': False}}
+    stats = {'scanned': 0, 'updated': 0, 'missing_plan': 0, 'batches': 0}
+    last_id = None
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query['_id'] = {'$gt': last_id}
+        docs = list(collection.find(batch_query, {'plan': 1}).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]['_id']
+        stats['batches'] += 1
+        stats['scanned'] += len(docs)
+
+        plans = PlanService.get_plans_by_ids([doc.get('plan') for doc in docs])
+        snapshots = {}
+        operations = []
+        for doc in docs:
+            plan_id = str(doc.get('plan'))
+            plan = plans.get(plan_id)
+            if plan is None:
+                stats['missing_plan'] += 1
+                current_app.logger.warning(f"Subscription {doc['_id']} references missing plan {plan_id}; not backfilled.")
+                continue
+            if plan_id not in snapshots:
+                snapshots[plan_id] = PlanSnapshot.from_plan(plan).to_mongo().to_dict()
+            operations.append(UpdateOne(
+                {'_id': doc['_id'], 'plan_snapshot': {'$exists': False}},
+                {'$set': {'plan_snapshot': snapshots[plan_id]}},
+            ))
+
+        if operations and not dry_run:
+            result = collection.bulk_write(operations, ordered=False)
+            stats['updated'] += result.modified_count
+        elif dry_run:
+            stats['updated'] += len(operations)
+
+        if len(docs) < batch_size:
+            break
+
+    return stats
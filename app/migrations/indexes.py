@@ -0,0 +1,187 @@
+"""
+Index management for the service's collections.
+
+`sync_indexes` compares the indexes declared in each Document's meta with the
+ones that exist. It builds the missing ones and, optionally, drops indexes no
+longer declared. `verify_query_plans` runs explain() on every query shape the
+services issue and reports any that would scan the whole collection or sort
+in memory.
+"""
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.models.outbox import SubscriptionEvent
+from app.models.plan import Plan
+from app.models.subscription import Subscription
+from app.models.webhook import WebhookDeadLetter, WebhookTarget
+from app.utils.enums import SubscriptionStatus
+
+MANAGED_DOCUMENTS = (Subscription, Plan, SubscriptionEvent, WebhookTarget, WebhookDeadLetter)
+
+# Options of a MongoEngine index spec that are passed on to create_index
+_INDEX_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds', 'collation')
+
+
+def _declared_indexes(document) -> list[dict]:
+    declared = []
+    for spec in document._meta.get('index_specs', []):
+        options = {key: spec[key] for key in _INDEX_OPTIONS if spec.get(key)}
+        declared.append({'key': list(spec['fields']), 'name': spec.get('name'), 'options': options})
+    return declared
+
+
+def _same_options(declared: dict, existing: dict) -> bool:
+    return (bool(declared['options'].get('unique')) == bool(existing.get('unique'))
+            and declared['options'].get('partialFilterExpression') == existing.get('partialFilterExpression'))
+
+
+def index_plan(document) -> dict:
+    """
+    {'create': [...], 'drop': [...], 'keep': [...], 'conflict': [...]} for one collection.
+    A conflict is an existing index with a declared key pattern but different
+    unique/partial options; it is reported, never changed automatically.
+    """
+    existing = {name: info for name, info in document._get_collection().index_information().items() if name != '_id_'}
+    plan = {'create': [], 'drop': [], 'keep': [], 'conflict': []}
+    matched = set()
+
+    for declared in _declared_indexes(document):
+        same_key = [name for name, info in existing.items() if list(info['key']) == declared['key']]
+        exact = [name for name in same_key if _same_options(declared, existing[name])]
+        if exact:
+            matched.update(exact)
+            plan['keep'].append(exact[0])
+        elif same_key:
+            matched.update(same_key)
+            plan['conflict'].append({'existing': same_key, 'declared': declared})
+        else:
+            plan['create'].append(declared)
+
+    plan['drop'] = sorted(name for name in existing if name not in matched)
+    return plan
+
+
+def sync_indexes(drop_redundant: bool = False, dry_run: bool = False, log=print) -> dict:
+    """
+    Builds missing declared indexes (background=True, i.e. without blocking
+    the collection on servers before 4.2, which ignore it) and, with
+    `drop_redundant`, drops undeclared ones after the new ones are built.
+    """
+    report = {}
+    for document in MANAGED_DOCUMENTS:
+        collection = document._get_collection()
+        plan = index_plan(document)
+        report[collection.name] = plan
+
+        for declared in plan['create']:
+            description = f"{collection.name}: create {declared['name'] or declared['key']} {declared['options'] or ''}"
+            log(("[dry-run] " if dry_run else "") + description)
+            if not dry_run:
+                options = dict(declared['options'])
+                if declared['name']:
+                    options['name'] = declared['name']
+                collection.create_index(declared['key'], background=True, **options)
+
+        for conflict in plan['conflict']:
+            log(f"{collection.name}: CONFLICT {conflict['existing']} differ from declared "
+                f"{conflict['declared']['key']} {conflict['declared']['options']}; resolve manually")
+
+        for name in plan['drop']:
+            if not drop_redundant:
+                log(f"{collection.name}: redundant {name} (pass --drop-redundant to drop)")
+                continue
+            log(("[dry-run] " if dry_run else "") + f"{collection.name}: drop {name}")
+            if not dry_run:
+                collection.drop_index(name)
+    return report
+
+
+def query_shapes() -> list[tuple[str, object, dict, list | None, int]]:
+    """
+    (name, collection, filter, sort, limit) for every query the services
+    issue. Keep in sync with SubscriptionService, ExpirationService,
+    PlanService/PlanCache, OutboxService and WebhookService when adding queries.
+    """
+    subscriptions = Subscription._get_collection()
+    plans = Plan._get_collection()
+    events = SubscriptionEvent._get_collection()
+    webhook_targets = WebhookTarget._get_collection()
+    dead_letters = WebhookDeadLetter._get_collection()
+    now = datetime.now(timezone.utc)
+    active = SubscriptionStatus.ACTIVE.value
+    user_id = 'explain-probe-user'
+    plan_id = ObjectId()
+    return [
+        ('SubscriptionService._get_active_subscription_for_user / cancel / current subscription read',
+         subscriptions, {'user_id': user_id, 'status': active}, None, 1),
+        ('SubscriptionService current subscription read (newest end_date)',
+         subscriptions, {'user_id': user_id}, [('end_date', -1)], 1),
+        ('SubscriptionService.get_subscription_history (first page)',
+         subscriptions, {'user_id': user_id}, [('end_date', -1), ('_id', -1)], 21),
+        ('SubscriptionService.get_subscription_history (after cursor)',
+         subscriptions, {'user_id': user_id, '$or': [{'end_date': {'$lt': now}},
+                                                     {'end_date': now, '_id': {'$lt': plan_id}}]},
+         [('end_date', -1), ('_id', -1)], 21),
+        ('SubscriptionService.update_user_subscription',
+         subscriptions, {'user_id': user_id, 'status': active, 'plan': {'$ne': plan_id}}, None, 1),
+        ('SubscriptionService.check_and_expire_user_subscription',
+         subscriptions, {'user_id': user_id, 'status': active, 'end_date': {'$lt': now}}, None, 1),
+        ('SubscriptionService.expire_all_due_subscriptions (per_document)',
+         subscriptions, {'status': active, 'end_date': {'$lt': now}}, None, 0),
+        ('ExpirationService due batch',
+         subscriptions, {'status': active, 'end_date': {'$lt': now}}, [('end_date', 1)], 1000),
+        ('ExpirationService batch update filter',
+         subscriptions, {'status': active, 'end_date': {'$lt': now}, '_id': {'$in': [ObjectId()]}}, None, 0),
+        ('ExpirationService.next_due_at',
+         subscriptions, {'status': active}, [('end_date', 1)], 1),
+        ('PlanService catalog (all plans by name)', plans, {}, [('name', 1)], 0),
+        ('PlanService.get_plan_by_id', plans, {'_id': plan_id}, None, 1),
+        ('PlanService.get_plans_by_ids', plans, {'_id': {'$in': [plan_id, ObjectId()]}}, None, 0),
+        ('OutboxService.read (after a checkpoint)', events, {'_id': {'$gt': 0}}, [('_id', 1)], 100),
+        ('WebhookDeliveryWorker enabled targets', webhook_targets, {'enabled': True}, None, 0),
+        ('WebhookService.list_targets', webhook_targets, {}, [('name', 1)], 0),
+        ('WebhookService.list_dead_letters',
+         dead_letters, {'target_id': plan_id}, [('created_at', -1)], 50),
+    ]
+
+
+def _plan_stages(node) -> list[str]:
+    """Every 'stage' name in an explain plan tree (classic and slot-based engine output)."""
+    stages = []
+    if isinstance(node, dict):
+        if 'stage' in node:
+            stages.append(node['stage'])
+        for value in node.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(node, list):
+        for item in node:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def verify_query_plans() -> list[dict]:
+    """
+    Explains each query shape and returns one result per shape:
+    {'query', 'stages', 'ok', 'problems'}. A shape fails if its winning plan
+    contains a COLLSCAN or an in-memory SORT.
+    """
+    results = []
+    for name, collection, query, sort, limit in query_shapes():
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = _plan_stages(winning_plan)
+        problems = []
+        if stages == ['EOF']:
+            problems.append('collection does not exist, nothing verified')
+        if 'COLLSCAN' in stages:
+            problems.append('collection scan')
+        if 'SORT' in stages:
+            problems.append('in-memory sort')
+        results.append({'query': name, 'stages': stages, 'ok': not problems, 'problems': problems})
+    return results
+
@@ -0,0 +1,80 @@
+from flask import current_app
+
+from app.models.subscription import Subscription
+from app.services import analytics_service
+from app.services.plan_service import PlanService
+from app.utils.enums import SubscriptionStatus
+
+_REBUILD_COLLECTION = analytics_service.ROLLUP_COLLECTION + '_rebuild'
+
+
+def _history_events(doc: dict, plan) -> list[tuple]:
+    """
+    The events a subscription's stored state implies. Upgrades rewrite plan
+    and start_date in place, so an upgraded subscription is counted as
+    started on its current plan at created_at, and upgraded_in/out are 0.
+    """
+    created_at = doc.get('created_at') or doc.get('start_date')
+    events = analytics_service.started_events(doc, created_at, plan)
+    status = doc.get('status')
+    if status == SubscriptionStatus.EXPIRED.value:
+        events += analytics_service.expired_events(doc, plan)
+    elif status == SubscriptionStatus.CANCELLED.value:
+        events += analytics_service.cancelled_events(doc, doc.get('updated_at') or created_at, plan)
+    elif status != SubscriptionStatus.ACTIVE.value:
+        plan_id, mrr = analytics_service.subscription_terms(doc, plan)
+        events.append((doc.get('updated_at') or created_at, plan_id, None, -1, -mrr))
+    return events
+
+
+def rebuild_subscription_rollups(batch_size: int = 1000, dry_run: bool = False) -> dict:
+    """
+    Recomputes the analytics rollups from the subscriptions collection.
+
+    Streams subscriptions in _id order (keyset batches, projected to the
+    fields the events need), resolving each batch's legacy plans with one
+    batched lookup. Events are aggregated in memory, which is O(plans x days)
+    and not O(subscriptions), then written to a scratch collection that
+    replaces the live one with an atomic rename. Rollup updates made by the
+    service while the rebuild runs are lost, so run it when write traffic is low.
+    """
+    collection = Subscription._get_collection()
+    projection = dict(analytics_service.AnalyticsService.TERMS_PROJECTION,
+                      status=1, created_at=1, start_date=1, updated_at=1)
+    stats = {'scanned': 0, 'batches': 0, 'documents': 0}
+    daily, totals = {}, {}
+    last_id = None
+
+    while True:
+        batch_query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(collection.find(batch_query, projection).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]['_id']
+        stats['batches'] += 1
+        stats['scanned'] += len(docs)
+
+        legacy_ids = [doc.get('plan') for doc in docs if not doc.get('plan_snapshot')]
+        plans = PlanService.get_plans_by_ids(legacy_ids) if legacy_ids else {}
+        events = [event for doc in docs for event in _history_events(doc, plans.get(str(doc.get('plan'))))]
+        analytics_service.aggregate_events(events, daily, totals)
+
+        if len(docs) < batch_size:
+            break
+
+    documents = list(daily.values()) + list(totals.values())
+    stats['documents'] = len(documents)
+    if dry_run:
+        return stats
+
+    database = Subscription._get_db()
+    scratch = database[_REBUILD_COLLECTION]
+    scratch.drop()
+    for start in range(0, len(documents), batch_size):
+        scratch.insert_many(documents[start:start + batch_size], ordered=False)
+    if documents:
+        scratch.rename(analytics_service.ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        database[analytics_service.ROLLUP_COLLECTION].drop()
+    current_app.logger.info(f"Rebuilt subscription rollups: {stats}")
+    return stats
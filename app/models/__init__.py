@@ -1,2 +1,3 @@
-from .plan import Plan
-from .subscription import Subscription
\ No newline at end of file
+from .plan import Plan, PlanSnapshot
+from .subscription import Subscription
+from .outbox import SubscriptionEvent
\ No newline at end of file
@@ -0,0 +1,45 @@
+from mongoengine import (
+    Document,
+    StringField,
+    IntField,
+    DateTimeField,
+    ObjectIdField,
+)
+
+from app.core.config import Config
+from app.utils.enums import SubscriptionEventType
+
+_RETENTION_SECONDS = Config.OUTBOX_RETENTION_DAYS * 24 * 3600
+
+
+class SubscriptionEvent(Document):
+    """
+    A subscription lifecycle event in the transactional outbox. Records are
+    inserted with raw writes inside the subscription change's transaction
+    (see app/services/outbox_service.py); this model declares the collection
+    and its indexes.
+    """
+    meta = {
+        'collection': 'subscription_events',
+        # Reads are _id (sequence) range scans; the only other index expires old events.
+        'indexes': [
+            {
+                'fields': ['occurred_at'],
+                'expireAfterSeconds': _RETENTION_SECONDS,
+                'name': 'outbox_retention',
+            },
+        ] if _RETENTION_SECONDS > 0 else [],
+    }
+
+    id = IntField(primary_key=True)  # Outbox sequence number, gapless and in commit order
+    type = StringField(required=True, choices=[event_type.value for event_type in SubscriptionEventType])
+    subscription_id = ObjectIdField(required=True)
+    user_id = StringField(required=True)
+    plan_id = ObjectIdField()
+    previous_plan_id = ObjectIdField()  # Upgrades only
+    status = StringField()
+    end_date = DateTimeField()
+    occurred_at = DateTimeField(required=True)
+
+    def __repr__(self):
+        return f'<SubscriptionEvent seq={self.id} type="{self.type}" subscription_id={self.subscription_id}>'
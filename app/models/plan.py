@@ -1,10 +1,12 @@
 from mongoengine import (
     Document,
+    EmbeddedDocument,
     StringField,
     DecimalField,
     ListField,
     IntField,
     DateTimeField,
+    ObjectIdField,
 )
 from datetime import datetime
 
@@ -29,4 +31,34 @@ class Plan(Document):
         return super(Plan, self).save(*args, **kwargs)
 
     def __repr__(self):
-        return f'<Plan id={self.id} name="{self.name}">'
\ No newline at end of file
+        return f'<Plan id={self.id} name="{self.name}">'
+
+
+class PlanSnapshot(EmbeddedDocument):
+    """
+    Denormalized copy of a Plan, embedded in a Subscription at subscribe/upgrade
+    time. Serializing a subscription no longer needs to dereference its plan,
+    and the price the user signed up at is preserved if the plan changes later.
+    """
+    plan_id = ObjectIdField(required=True)
+    name = StringField(required=True, max_length=100)
+    price = DecimalField(required=True, precision=2, min_value=0.0)
+    features = ListField(StringField(max_length=255), default=list)
+    duration_days = IntField(required=True, min_value=1)
+    # The plan's own timestamps, so the snapshot can stand in for PlanResponse
+    plan_created_at = DateTimeField()
+    plan_updated_at = DateTimeField()
+    captured_at = DateTimeField(default=datetime.utcnow)
+
+    @classmethod
+    def from_plan(cls, plan: Plan) -> 'PlanSnapshot':
+        return cls(
+            plan_id=plan.id,
+            name=plan.name,
+            price=plan.price,
+            features=list(plan.features or []),
+            duration_days=plan.duration_days,
+            plan_created_at=plan.created_at,
+            plan_updated_at=plan.updated_at,
+            captured_at=datetime.utcnow(),
+        )
\ No newline at end of file
@@ -2,12 +2,13 @@ from mongoengine import (
     Document,
     StringField,
     ReferenceField, # To link to the Plan document
+    EmbeddedDocumentField, # Denormalized plan snapshot
     DateTimeField,
     EnumField,      # To store the subscription status
     # QuerySet
 )
 from datetime import datetime, timedelta
-from app.models.plan import Plan # Import the Plan model
+from app.models.plan import Plan, PlanSnapshot # Import the Plan model
 from app.utils.enums import SubscriptionStatus # Import our status enum
 
 # Optional: Base document for timestamps, similar to Plan model
@@ -19,16 +20,35 @@ class Subscription(Document): # Or Subscription(BaseDocument):
     """
     meta = {
         'collection': 'subscriptions',
+        # Tuned set, see `flask sync-indexes` / `flask verify-indexes` (app/migrations/indexes.py).
+        # Indexes dropped in its favour: user_id, status, (user_id, status), end_date, (status, end_date),
+        # (user_id, -end_date).
         'indexes': [
-            'user_id',
-            'status',
-            ('user_id', 'status'), # Compound index for finding user's active/inactive subs
-            'end_date' # For the expiration checker task
+            # A user's subscriptions newest first; _id breaks end_date ties for the keyset-paginated
+            # history. Also serves the current-subscription read and plain user_id lookups.
+            ('user_id', '-end_date', '-id'),
+            { # At most one ACTIVE subscription per user; enforced by MongoDB, not a pre-check.
+              # Also serves every (user_id, status=ACTIVE) lookup.
+                'fields': ['user_id'],
+                'unique': True,
+                'partialFilterExpression': {'status': SubscriptionStatus.ACTIVE.value},
+                'name': 'uniq_active_subscription_per_user',
+            },
+            { # Due / next-due ACTIVE subscriptions for the expiration job, in end_date order.
+              # Partial, so EXPIRED and CANCELLED history is not indexed. 'status' is constant
+              # here; it keeps the key pattern distinct from the legacy end_date_1 index.
+                'fields': ['end_date', 'status'],
+                'partialFilterExpression': {'status': SubscriptionStatus.ACTIVE.value},
+                'name': 'active_end_date',
+            },
         ]
     }
 
     user_id = StringField(required=True) # Assuming user ID is a string from JWT 'sub'
     plan = ReferenceField(Plan, required=True) # Reference to a Plan document
+    # Copy of the plan at subscribe/upgrade time; serialization reads this instead
+    # of dereferencing `plan`. Older documents get it from the backfill command.
+    plan_snapshot = EmbeddedDocumentField(PlanSnapshot)
     
     start_date = DateTimeField(required=True, default=datetime.utcnow)
     end_date = DateTimeField(required=True) # Will be calculated based on plan duration
@@ -52,6 +72,19 @@ class Subscription(Document): # Or Subscription(BaseDocument):
         self.updated_at = datetime.utcnow()
         return super(Subscription, self).save(*args, **kwargs)
 
+    def set_plan(self, plan: Plan):
+        """Points the subscription at `plan` and refreshes the embedded snapshot."""
+        self.plan = plan
+        self.plan_snapshot = PlanSnapshot.from_plan(plan)
+
+    @property
+    def plan_id(self):
+        """The referenced plan's id, without dereferencing the plan."""
+        if self.plan_snapshot:
+            return self.plan_snapshot.plan_id
+        ref = self._data.get('plan')
+        return getattr(ref, 'id', ref)
+
     def _calculate_end_date(self):
         """Helper to calculate end_date based on start_date and plan duration."""
         if self.start_date and self.plan and self.plan.duration_days:
@@ -62,5 +95,8 @@ class Subscription(Document): # Or Subscription(BaseDocument):
             pass 
 
     def __repr__(self):
-        plan_name = self.plan.name if self.plan else "N/A"
+        if self.plan_snapshot:
+            plan_name = self.plan_snapshot.name
+        else:
+            plan_name = self.plan.name if self.plan else "N/A"
         return f'<Subscription id={self.id} user_id="{self.user_id}" plan="{plan_name}" status="{self.status.value}">'
\ No newline at end of file
@@ -0,0 +1,80 @@
+from mongoengine import (
+    Document,
+    StringField,
+    BooleanField,
+    IntField,
+    ListField,
+    DictField,
+    DateTimeField,
+    ObjectIdField,
+)
+from datetime import datetime
+
+from app.utils.enums import SubscriptionEventType
+
+EVENT_TYPES = [event_type.value for event_type in SubscriptionEventType]
+
+
+class WebhookTarget(Document):
+    """
+    A partner endpoint that receives subscription lifecycle events from the
+    outbox (see app/services/webhook_service.py). The delivery fields are
+    maintained by the delivery worker.
+    """
+    meta = {
+        'collection': 'webhook_targets',
+        'indexes': [
+            'enabled',
+        ]
+    }
+    name = StringField(required=True, unique=True, max_length=100)
+    url = StringField(required=True, max_length=2048)
+    secret = StringField(max_length=255)  # HMAC-SHA256 key for X-Webhook-Signature; unsigned if empty
+    event_types = ListField(StringField(choices=EVENT_TYPES), default=list)  # Empty = every type
+    enabled = BooleanField(default=True)
+    # Per-target overrides of WEBHOOK_BATCH_SIZE / WEBHOOK_MAX_IN_FLIGHT_PER_TARGET
+    batch_size = IntField(min_value=1)
+    max_in_flight = IntField(min_value=1)
+
+    # Delivery state: consecutive failed attempts of the oldest undelivered batch
+    failures = IntField(default=0)
+    retry_at = DateTimeField()
+    last_error = StringField()
+    last_delivered_at = DateTimeField()
+
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    def save(self, *args, **kwargs):
+        if not self.created_at:
+            self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        return super(WebhookTarget, self).save(*args, **kwargs)
+
+    @property
+    def consumer(self) -> str:
+        """The outbox consumer name holding this target's checkpoint."""
+        return f"webhook:{self.id}"
+
+    def __repr__(self):
+        return f'<WebhookTarget id={self.id} name="{self.name}" url="{self.url}">'
+
+
+class WebhookDeadLetter(Document):
+    """A batch of events given up on after WEBHOOK_MAX_ATTEMPTS failed deliveries."""
+    meta = {
+        'collection': 'webhook_dead_letters',
+        'indexes': [
+            ('target_id', '-created_at'),
+        ]
+    }
+    target_id = ObjectIdField(required=True)
+    target_name = StringField()
+    url = StringField()
+    first_seq = IntField(required=True)
+    last_seq = IntField(required=True)
+    events = ListField(DictField())
+    attempts = IntField()
+    status_code = IntField()  # Of the last attempt; None if no response
+    error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
@@ -0,0 +1,163 @@
+"""
+Hydration-free read models.
+
+These build the exact JSON payloads of PlanResponse / SubscriptionResponse
+(`model_dump(mode='json')`) straight from raw BSON documents, skipping the
+MongoEngine Document and Pydantic layers on hot read paths. Any change to the
+response schemas must be mirrored here.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from app.utils.enums import SubscriptionStatus
+
+
+def _iso(value: datetime | None) -> str | None:
+    # Mirrors the `datetime: lambda dt: dt.isoformat()` json_encoder.
+    return value.isoformat() if value is not None else None
+
+
+def _price(value) -> float | None:
+    # Mirrors the `Decimal: float` json_encoder. DecimalField stores floats
+    # unless force_string is set, in which case the value is a string.
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return value
+    return float(Decimal(str(value)))
+
+
+class PlanReadModel:
+    """Compact, read-only view of a plan."""
+    __slots__ = ('id', 'name', 'price', 'features', 'duration_days', 'created_at', 'updated_at')
+
+    # Fields to request from Mongo when building this model from raw documents.
+    PROJECTION = {
+        'name': 1, 'price': 1, 'features': 1, 'duration_days': 1,
+        'created_at': 1, 'updated_at': 1,
+    }
+
+    def __init__(self, id, name, price, features, duration_days, created_at, updated_at):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.features = features
+        self.duration_days = duration_days
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_raw(cls, doc: dict) -> 'PlanReadModel':
+        return cls(
+            id=doc['_id'],
+            name=doc.get('name'),
+            price=doc.get('price'),
+            features=doc.get('features') or [],
+            duration_days=doc.get('duration_days'),
+            created_at=doc.get('created_at'),
+            updated_at=doc.get('updated_at'),
+        )
+
+    @classmethod
+    def from_document(cls, plan) -> 'PlanReadModel':
+        return cls(
+            id=plan.id,
+            name=plan.name,
+            price=plan.price,
+            features=plan.features or [],
+            duration_days=plan.duration_days,
+            created_at=plan.created_at,
+            updated_at=plan.updated_at,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'PlanReadModel':
+        """From an embedded PlanSnapshot, either a raw dict or the EmbeddedDocument."""
+        if isinstance(snapshot, dict):
+            get = snapshot.get
+        else:
+            def get(key):
+                return getattr(snapshot, key, None)
+        return cls(
+            id=get('plan_id'),
+            name=get('name'),
+            price=get('price'),
+            features=get('features') or [],
+            duration_days=get('duration_days'),
+            created_at=get('plan_created_at'),
+            updated_at=get('plan_updated_at'),
+        )
+
+    def to_dict(self) -> dict:
+        """Same output as PlanResponse.model_validate(plan).model_dump(mode='json')."""
+        return {
+            'name': self.name,
+            'price': _price(self.price),
+            'features': list(self.features),
+            'duration_days': self.duration_days,
+            'id': str(self.id),
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+        }
+
+
+class SubscriptionReadModel:
+    """Compact, read-only view of a subscription with its plan payload."""
+    __slots__ = ('id', 'user_id', 'plan', 'start_date', 'end_date', 'status', 'created_at', 'updated_at')
+
+    PROJECTION = {
+        'user_id': 1, 'plan': 1, 'plan_snapshot': 1, 'start_date': 1, 'end_date': 1, 'status': 1,
+        'created_at': 1, 'updated_at': 1,
+    }
+
+    def __init__(self, id, user_id, plan, start_date, end_date, status, created_at, updated_at):
+        self.id = id
+        self.user_id = user_id
+        self.plan = plan  # Serialized plan payload (dict), see PlanReadModel.to_dict
+        self.start_date = start_date
+        self.end_date = end_date
+        self.status = status
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_raw(cls, doc: dict, plan_payload: dict, status: str | None = None) -> 'SubscriptionReadModel':
+        """`status` overrides the stored status, e.g. with an effective EXPIRED."""
+        return cls(
+            id=doc['_id'],
+            user_id=doc.get('user_id'),
+            plan=plan_payload,
+            start_date=doc.get('start_date'),
+            end_date=doc.get('end_date'),
+            status=status or doc.get('status'),
+            created_at=doc.get('created_at'),
+            updated_at=doc.get('updated_at'),
+        )
+
+    @classmethod
+    def from_document(cls, subscription, plan_payload: dict) -> 'SubscriptionReadModel':
+        return cls(
+            id=subscription.id,
+            user_id=subscription.user_id,
+            plan=plan_payload,
+            start_date=subscription.start_date,
+            end_date=subscription.end_date,
+            status=subscription.status,
+            created_at=subscription.created_at,
+            updated_at=subscription.updated_at,
+        )
+
+    def to_dict(self) -> dict:
+        """Same output as SubscriptionResponse.model_validate(sub).model_dump(mode='json')."""
+        # Mirrors EnumField + use_enum_values, including the enum's lenient lookup.
+        status = SubscriptionStatus(self.status).value if self.status is not None else None
+        return {
+            'id': str(self.id),
+            'user_id': self.user_id,
+            'plan': self.plan,
+            'start_date': _iso(self.start_date),
+            'end_date': _iso(self.end_date),
+            'status': status,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+        }
@@ -0,0 +1,16 @@
+from pydantic import AnyHttpUrl, BaseModel, Field
+from typing import Optional
+
+from app.utils.enums import SubscriptionEventType
+
+
+class WebhookTargetCreateRequest(BaseModel):
+    """Schema for registering a webhook target (POST /api/webhooks)."""
+    name: str = Field(..., min_length=1, max_length=100, description="Unique name of the target")
+    url: AnyHttpUrl = Field(..., description="Endpoint that receives POSTed event batches")
+    secret: Optional[str] = Field(None, max_length=255, description="Key for the X-Webhook-Signature HMAC")
+    event_types: list[SubscriptionEventType] = Field(default_factory=list, description="Event types to deliver; empty for all")
+    enabled: bool = True
+    batch_size: Optional[int] = Field(None, ge=1, le=1000, description="Events per POST (default WEBHOOK_BATCH_SIZE)")
+    max_in_flight: Optional[int] = Field(None, ge=1, le=32, description="Concurrent POSTs (default WEBHOOK_MAX_IN_FLIGHT_PER_TARGET)")
+    from_start: bool = Field(False, description="Deliver every event still in the outbox instead of only new ones")
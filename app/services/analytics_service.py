@@ -0,0 +1,252 @@
+"""
+Incrementally maintained subscription analytics.
+
+The `subscription_rollups` collection holds two kinds of documents:
+
+- one per (day, plan): {_id: 'YYYY-MM-DD:<plan_id>', day, plan_id, started,
+  upgraded_in, upgraded_out, cancelled, expired, active_delta, mrr_delta_micros}
+- one per plan with the current totals: {_id: 'total:<plan_id>', plan_id,
+  active, mrr_micros}
+
+The write paths of SubscriptionService, AsyncSubscriptionService, the bulk
+import and the expiration job $inc them right after their own write, in one
+unordered bulk_write. Day ids sort by date and before the 'total:' ids, so
+a date range is a range scan of the _id index. Active subscribers and MRR
+at the end of an earlier day are the current totals minus the deltas of
+the days after it, so a report reads O(plans x days) documents and never
+touches `subscriptions`.
+
+Rollup writes are best effort: a failure is logged and does not fail the
+subscription change. `flask rebuild-analytics` recomputes the collection
+from the subscriptions.
+"""
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from flask import current_app
+from pymongo import UpdateOne
+
+from app.models.subscription import Subscription
+from app.services.plan_service import PlanService
+
+ROLLUP_COLLECTION = 'subscription_rollups'
+TOTAL_PREFIX = 'total:'
+
+# Event counters kept per (day, plan)
+COUNTERS = ('started', 'upgraded_in', 'upgraded_out', 'cancelled', 'expired')
+
+# MRR normalizes a plan's price to a 30-day month: price * 30 / duration_days.
+# Amounts are stored as integer millionths so $inc never accumulates float error.
+MRR_MONTH_DAYS = 30
+_MICROS = 1_000_000
+
+# Rollup fields that identify a document rather than being summed
+_KEY_FIELDS = ('_id', 'day', 'plan_id')
+
+
+def _day(moment: datetime) -> datetime:
+    """Midnight UTC of `moment`'s day, naive like the datetimes Mongo returns."""
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def _get(source, key):
+    return source.get(key) if isinstance(source, dict) else getattr(source, key, None)
+
+
+def mrr_micros(price, duration_days) -> int:
+    if price is None or not duration_days:
+        return 0
+    return int(Decimal(str(price)) * MRR_MONTH_DAYS * _MICROS / int(duration_days))
+
+
+def subscription_terms(doc: dict, plan=None) -> tuple:
+    """
+    (plan_id, mrr_micros) of a raw subscription document. Terms come from the
+    embedded plan snapshot; `plan` (a Plan or raw plan dict) is only used for
+    legacy documents without one.
+    """
+    snapshot = doc.get('plan_snapshot')
+    source = snapshot or plan
+    plan_id = (snapshot or {}).get('plan_id') or doc.get('plan')
+    if source is None:
+        return plan_id, 0
+    return plan_id, mrr_micros(_get(source, 'price'), _get(source, 'duration_days'))
+
+
+def aggregate_events(events, daily: dict | None = None, totals: dict | None = None) -> tuple[dict, dict]:
+    """
+    Sums `events`, each (moment, plan_id, counter, active_delta, mrr_delta_micros),
+    into rollup documents: {rollup _id: {'_id', 'day', 'plan_id', <amounts>}} per
+    (day, plan) and per plan total. `counter` may be None for a change that
+    only moves the totals. Pass the returned dicts back in to keep accumulating.
+    """
+    daily = {} if daily is None else daily
+    totals = {} if totals is None else totals
+    for moment, plan_id, counter, active_delta, mrr_delta in events:
+        if plan_id is None:
+            continue
+        day = _day(moment)
+        key = f"{day:%Y-%m-%d}:{plan_id}"
+        entry = daily.setdefault(key, {'_id': key, 'day': day, 'plan_id': plan_id,
+                                       'active_delta': 0, 'mrr_delta_micros': 0})
+        if counter:
+            entry[counter] = entry.get(counter, 0) + 1
+        entry['active_delta'] += active_delta
+        entry['mrr_delta_micros'] += mrr_delta
+        key = f"{TOTAL_PREFIX}{plan_id}"
+        total = totals.setdefault(key, {'_id': key, 'plan_id': plan_id, 'active': 0, 'mrr_micros': 0})
+        total['active'] += active_delta
+        total['mrr_micros'] += mrr_delta
+    return daily, totals
+
+
+def rollup_operations(events) -> list[UpdateOne]:
+    """One $inc upsert per rollup document touched by `events` (see aggregate_events)."""
+    daily, totals = aggregate_events(events)
+    operations = []
+    for entry in list(daily.values()) + list(totals.values()):
+        operations.append(UpdateOne(
+            {'_id': entry['_id']},
+            {'$setOnInsert': {key: value for key, value in entry.items() if key in _KEY_FIELDS[1:]},
+             '$inc': {key: value for key, value in entry.items() if key not in _KEY_FIELDS}},
+            upsert=True,
+        ))
+    return operations
+
+
+# --- Events. Each returns the event tuples for rollup_operations. ---
+
+def started_events(doc: dict, at: datetime, plan=None) -> list[tuple]:
+    plan_id, mrr = subscription_terms(doc, plan)
+    return [(at, plan_id, 'started', 1, mrr)]
+
+
+def upgrade_events(before: dict, after: dict, at: datetime, before_plan=None) -> list[tuple]:
+    old_plan_id, old_mrr = subscription_terms(before, before_plan)
+    new_plan_id, new_mrr = subscription_terms(after)
+    return [(at, old_plan_id, 'upgraded_out', -1, -old_mrr), (at, new_plan_id, 'upgraded_in', 1, new_mrr)]
+
+
+def cancelled_events(doc: dict, at: datetime, plan=None) -> list[tuple]:
+    plan_id, mrr = subscription_terms(doc, plan)
+    return [(at, plan_id, 'cancelled', -1, -mrr)]
+
+
+def expired_events(doc: dict, plan=None) -> list[tuple]:
+    """Counted on the day of end_date, when the subscription stopped being active."""
+    plan_id, mrr = subscription_terms(doc, plan)
+    return [(doc['end_date'], plan_id, 'expired', -1, -mrr)]
+
+
+class AnalyticsService:
+
+    # Subscription fields the event builders read
+    TERMS_PROJECTION = {'plan': 1, 'plan_snapshot.plan_id': 1, 'plan_snapshot.price': 1,
+                        'plan_snapshot.duration_days': 1, 'end_date': 1}
+
+    @staticmethod
+    def enabled() -> bool:
+        return current_app.config.get('ANALYTICS_ROLLUPS_ENABLED', True)
+
+    @staticmethod
+    def _collection():
+        return Subscription._get_db()[ROLLUP_COLLECTION]
+
+    @staticmethod
+    def _legacy_plans(docs: list[dict]) -> dict:
+        plan_ids = [doc.get('plan') for doc in docs if not doc.get('plan_snapshot')]
+        return PlanService.get_plans_by_ids(plan_ids) if plan_ids else {}
+
+    @staticmethod
+    def record(events: list[tuple]) -> None:
+        """Applies events to the rollups; never raises (see module docstring)."""
+        if not events or not AnalyticsService.enabled():
+            return
+        # Events without a plan produce no operations, and an empty bulk_write raises
+        operations = rollup_operations(events)
+        if not operations:
+            return
+        try:
+            AnalyticsService._collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            current_app.logger.warning(f"Could not update subscription rollups ({len(events)} events): {e}")
+
+    @staticmethod
+    def record_started(docs: list[dict], at: datetime) -> None:
+        plans = AnalyticsService._legacy_plans(docs)
+        AnalyticsService.record([event for doc in docs
+                                 for event in started_events(doc, at, plans.get(str(doc.get('plan'))))])
+
+    @staticmethod
+    def record_upgrade(before: dict, after: dict, at: datetime) -> None:
+        plans = AnalyticsService._legacy_plans([before])
+        AnalyticsService.record(upgrade_events(before, after, at, plans.get(str(before.get('plan')))))
+
+    @staticmethod
+    def record_cancelled(doc: dict, at: datetime) -> None:
+        plans = AnalyticsService._legacy_plans([doc])
+        AnalyticsService.record(cancelled_events(doc, at, plans.get(str(doc.get('plan')))))
+
+    @staticmethod
+    def record_expired(docs: list[dict]) -> None:
+        plans = AnalyticsService._legacy_plans(docs)
+        AnalyticsService.record([event for doc in docs
+                                 for event in expired_events(doc, plans.get(str(doc.get('plan'))))])
+
+    @staticmethod
+    def daily_report(start: date, end: date) -> dict:
+        """
+        Per day in [start, end] (UTC) and per plan: active subscribers and MRR
+        at the end of the day, plus the day's started, upgraded_in/out,
+        cancelled and expired counts; `churned` is cancelled + expired.
+        """
+        collection = AnalyticsService._collection()
+        totals = {doc['plan_id']: doc for doc in
+                  collection.find({'_id': {'$gte': TOTAL_PREFIX, '$lt': TOTAL_PREFIX[:-1] + ';'}})}
+        # Every day from `start` on, up to today: later days are needed to walk
+        # the current totals back to `end`.
+        daily = {}
+        for doc in collection.find({'_id': {'$gte': f"{start:%Y-%m-%d}", '$lt': TOTAL_PREFIX}}):
+            daily.setdefault(doc['plan_id'], {})[doc['day'].date()] = doc
+
+        plan_ids = list(dict.fromkeys(list(totals) + list(daily)))
+        plans = PlanService.get_plans_by_ids(plan_ids) if plan_ids else {}
+        last_day = max([end] + [day for by_day in daily.values() for day in by_day])
+
+        days = {}
+        for plan_id in plan_ids:
+            by_day = daily.get(plan_id, {})
+            total = totals.get(plan_id, {})
+            active = total.get('active', 0)
+            mrr = total.get('mrr_micros', 0)
+            plan = plans.get(str(plan_id))
+            day = last_day
+            while day >= start:
+                doc = by_day.get(day, {})
+                if day <= end:
+                    counts = {counter: doc.get(counter, 0) for counter in COUNTERS}
+                    days.setdefault(day, []).append(dict(
+                        plan_id=str(plan_id),
+                        plan_name=plan.name if plan else None,
+                        active=active,
+                        mrr=round(mrr / _MICROS, 2),
+                        churned=counts['cancelled'] + counts['expired'],
+                        **counts,
+                    ))
+                # Values at the end of the previous day
+                active -= doc.get('active_delta', 0)
+                mrr -= doc.get('mrr_delta_micros', 0)
+                day -= timedelta(days=1)
+
+        report = []
+        day = start
+        while day <= end:
+            by_plan = sorted(days.get(day, []), key=lambda row: (row['plan_name'] or '', row['plan_id']))
+            summary = {key: sum(row[key] for row in by_plan)
+                       for key in ('active', 'churned') + COUNTERS}
+            summary['mrr'] = round(sum(row['mrr'] for row in by_plan), 2)
+            report.append(dict(day=day.isoformat(), **summary, plans=by_plan))
+            day += timedelta(days=1)
+        return {'from': start.isoformat(), 'to': end.isoformat(), 'days': report}
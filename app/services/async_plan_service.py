@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.core import mongo_options
+from app.models.plan import Plan
+from app.schemas.read_models import PlanReadModel
+from app.services.plan_cache import VERSION_COLLECTION, PLAN_CATALOG_VERSION_ID
+from app.utils.http_caching import Validators, catalog_validators, plan_validators
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncCatalogSnapshot:
+    """Raw plan documents and their pre-serialized PlanResponse payloads."""
+    __slots__ = ('ordered_ids', 'raw_by_id', 'payloads', 'validators', 'plan_validators', 'loaded_at', 'version')
+
+    def __init__(self, docs: list[dict], version: int | None, changed_at: datetime | None = None):
+        self.ordered_ids = tuple(str(doc['_id']) for doc in docs)
+        self.raw_by_id = {str(doc['_id']): doc for doc in docs}
+        self.payloads = {plan_id: PlanReadModel.from_raw(doc).to_dict() for plan_id, doc in self.raw_by_id.items()}
+        # Same validators as the Flask app's PlanCache for the same catalog
+        self.validators = catalog_validators(((doc['_id'], doc.get('updated_at')) for doc in docs), version, changed_at)
+        self.plan_validators = {plan_id: plan_validators(plan_id, doc.get('updated_at'))
+                                for plan_id, doc in self.raw_by_id.items()}
+        self.loaded_at = time.monotonic()
+        self.version = version
+
+
+class AsyncPlanService:
+    """
+    Plan catalog for the ASGI serving mode.
+
+    Same behaviour as PlanCache (one query for the whole catalog, kept for
+    PLAN_CACHE_TTL_SECONDS, reloaded when the cross-worker version counter
+    changes), but reads through the async driver and keeps raw documents
+    instead of hydrated Plans. Catalog loads follow the same read preference
+    and causally consistent session rules.
+    """
+
+    def __init__(self, database, config):
+        self._database = database
+        self._config = config
+        self._snapshot: _AsyncCatalogSnapshot | None = None
+        self._load_lock = asyncio.Lock()
+        self._last_version_check = 0.0
+
+    def _plans(self, **options):
+        return self._database.collection(Plan._meta['collection'], **options)
+
+    def _catalog_read_preference(self):
+        return mongo_options.read_preference(self._config, 'catalog')
+
+    def enabled(self) -> bool:
+        return bool(self._config.get('PLAN_CACHE_ENABLED', True))
+
+    async def _read_version(self, session=None) -> tuple[int | None, datetime | None]:
+        try:
+            doc = await self._database.collection(VERSION_COLLECTION).find_one(
+                {'_id': PLAN_CATALOG_VERSION_ID}, {'version': 1, 'changed_at': 1}, session=session)
+        except Exception as e:
+            logger.warning(f"Plan cache version check failed: {e}")
+            return None, None
+        return (doc.get('version', 0), doc.get('changed_at')) if doc else (0, None)
+
+    async def _is_stale(self, snapshot: _AsyncCatalogSnapshot) -> bool:
+        now = time.monotonic()
+        if now - snapshot.loaded_at >= float(self._config.get('PLAN_CACHE_TTL_SECONDS', 300)):
+            return True
+
+        check_interval = float(self._config.get('PLAN_CACHE_VERSION_CHECK_SECONDS', 5))
+        if check_interval > 0 and now - self._last_version_check >= check_interval:
+            self._last_version_check = now
+            version, _ = await self._read_version()
+            if version is not None and version != snapshot.version:
+                return True
+        return False
+
+    async def _current(self) -> _AsyncCatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not await self._is_stale(snapshot):
+            return snapshot
+        async with self._load_lock:
+            # Another task may have reloaded while we waited for the lock.
+            snapshot = self._snapshot
+            if snapshot is not None and not await self._is_stale(snapshot):
+                return snapshot
+            # Read the version before the plans so a concurrent bump is never lost.
+            preference = self._catalog_read_preference()
+            if mongo_options.reads_secondaries(preference):
+                async with self._database.client.start_session(causal_consistency=True) as session:
+                    version, changed_at = await self._read_version(session)
+                    docs = await (self._plans(read_preference=preference)
+                                  .find({}, session=session).sort('name', 1).to_list(None))
+            else:
+                version, changed_at = await self._read_version()
+                docs = await self._plans().find({}).sort('name', 1).to_list(None)
+            snapshot = _AsyncCatalogSnapshot(docs, version, changed_at)
+            self._snapshot = snapshot
+            self._last_version_check = time.monotonic()
+            return snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    async def get_raw_plan(self, plan_id) -> dict | None:
+        """Raw plan document for the given id, or None if it does not exist."""
+        if not ObjectId.is_valid(plan_id):
+            return None
+        if self.enabled():
+            doc = (await self._current()).raw_by_id.get(str(plan_id))
+            if doc is not None:
+                return doc
+        # Disabled cache, or a plan created by another worker since our last load.
+        doc = await self._plans().find_one({'_id': ObjectId(str(plan_id))})
+        if doc is not None and self.enabled():
+            self.invalidate()
+        return doc
+
+    async def get_plan(self, plan_id) -> Plan | None:
+        """The plan as a (detached) Plan document, for building snapshots."""
+        doc = await self.get_raw_plan(plan_id)
+        return Plan._from_son(doc) if doc is not None else None
+
+    async def get_all_plan_payloads(self) -> list[dict]:
+        """Serialized PlanResponse payloads for all plans, ordered by name."""
+        if not self.enabled():
+            docs = await (self._plans(read_preference=self._catalog_read_preference())
+                          .find({}, PlanReadModel.PROJECTION).sort('name', 1).to_list(None))
+            return [PlanReadModel.from_raw(doc).to_dict() for doc in docs]
+        snapshot = await self._current()
+        return [snapshot.payloads[plan_id] for plan_id in snapshot.ordered_ids]
+
+    async def get_plan_payload(self, plan_id) -> dict | None:
+        """Serialized PlanResponse payload for one plan, or None if it does not exist."""
+        if self.enabled():
+            snapshot = await self._current()
+            payload = snapshot.payloads.get(str(plan_id))
+            if payload is not None:
+                return payload
+        doc = await self.get_raw_plan(plan_id)
+        return PlanReadModel.from_raw(doc).to_dict() if doc is not None else None
+
+    async def get_all_plan_payloads_with_validators(self) -> tuple[list[dict], Validators]:
+        """get_all_plan_payloads() and the HTTP validators of the same catalog."""
+        if not self.enabled():
+            version, changed_at = await self._read_version()
+            docs = await self._plans().find({}, PlanReadModel.PROJECTION).sort('name', 1).to_list(None)
+            return ([PlanReadModel.from_raw(doc).to_dict() for doc in docs],
+                    catalog_validators(((doc['_id'], doc.get('updated_at')) for doc in docs), version, changed_at))
+        snapshot = await self._current()
+        return [snapshot.payloads[plan_id] for plan_id in snapshot.ordered_ids], snapshot.validators
+
+    async def get_plan_payload_with_validators(self, plan_id) -> tuple[dict | None, Validators | None]:
+        """get_plan_payload() and the plan's HTTP validators; (None, None) if it does not exist."""
+        if self.enabled():
+            snapshot = await self._current()
+            payload = snapshot.payloads.get(str(plan_id))
+            if payload is not None:
+                return payload, snapshot.plan_validators[str(plan_id)]
+        doc = await self.get_raw_plan(plan_id)
+        if doc is None:
+            return None, None
+        return PlanReadModel.from_raw(doc).to_dict(), plan_validators(doc['_id'], doc.get('updated_at'))
+
+    async def get_plan_payloads(self, plan_ids) -> dict[str, dict]:
+        """Maps str(plan_id) -> payload for every id that exists; ids not in the catalog take one $in query."""
+        wanted = list(dict.fromkeys(str(plan_id) for plan_id in plan_ids if ObjectId.is_valid(plan_id)))
+        payloads = {}
+        if self.enabled():
+            snapshot = await self._current()
+            payloads = {plan_id: snapshot.payloads[plan_id] for plan_id in wanted if plan_id in snapshot.payloads}
+        missing = [ObjectId(plan_id) for plan_id in wanted if plan_id not in payloads]
+        if missing:
+            docs = await self._plans().find({'_id': {'$in': missing}}, PlanReadModel.PROJECTION).to_list(None)
+            payloads.update((str(doc['_id']), PlanReadModel.from_raw(doc).to_dict()) for doc in docs)
+            if docs and self.enabled():
+                self.invalidate()
+        return payloads
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from mongoengine.errors import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.mongo_options import read_preference, status_write_concern
+from app.models.plan import PlanSnapshot
+from app.models.subscription import Subscription
+from app.schemas.read_models import PlanReadModel, SubscriptionReadModel
+from app.schemas.subscription_schemas import SubscriptionCreateInternal, SubscriptionUpdateRequest
+from app.services import analytics_service, outbox_service, subscription_history
+from app.services.async_plan_service import AsyncPlanService
+from app.services.outbox_service import event_record
+from app.services.subscription_cache import subscription_cache
+from app.services.subscription_service import SubscriptionService, _retry_transient
+from app.utils.enums import SubscriptionEventType, SubscriptionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSubscriptionService:
+    """
+    SubscriptionService for the ASGI serving mode.
+
+    Same business rules and error messages (ValueErrors are mapped to 4xx by
+    the API layer), but every database call goes through the async driver
+    and results are returned as SubscriptionResponse JSON payloads built
+    from raw documents. Tenacity retries await instead of sleeping a thread.
+    Reads are always pure (see SUBSCRIPTION_PURE_READS) and go through the
+    subscription cache like the Flask app's; changes drop the user's cached
+    entry.
+    """
+
+    def __init__(self, database, plan_service: AsyncPlanService, config: dict | None = None):
+        self._database = database
+        self._plans = plan_service
+        self._config = config or {}
+
+    def _subscriptions(self, **options):
+        return self._database.collection(Subscription._meta['collection'], **options)
+
+    def _status_writes(self):
+        return self._subscriptions(write_concern=status_write_concern(self._config))
+
+    async def _record_rollups(self, build_events, doc: dict, *args) -> None:
+        """
+        Async counterpart of AnalyticsService.record: `build_events(doc, *args, plan)`
+        from app.services.analytics_service, applied best effort.
+        """
+        if not self._config.get('ANALYTICS_ROLLUPS_ENABLED', True):
+            return
+        try:
+            plan = None if doc.get('plan_snapshot') else await self._plans.get_raw_plan(doc.get('plan'))
+            operations = analytics_service.rollup_operations(build_events(doc, *args, plan))
+            await self._database.collection(analytics_service.ROLLUP_COLLECTION).bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"Could not update subscription rollups for subscription {doc.get('_id')}: {e}")
+
+    async def _run(self, change):
+        """
+        Async counterpart of OutboxService.run: awaits `change(session)`, which
+        returns (result, events), in one transaction with appending the events
+        when OUTBOX_ENABLED is set, and without a session otherwise.
+        """
+        if not self._config.get('OUTBOX_ENABLED', False):
+            return (await change(None))[0]
+
+        async def in_transaction(session):
+            result, events = await change(session)
+            await self._append_events(events, session)
+            return result
+
+        async with self._database.client.start_session() as session:
+            return await session.with_transaction(in_transaction, write_concern=status_write_concern(self._config))
+
+    async def _append_events(self, events: list[dict], session) -> None:
+        if not events:
+            return
+        counter = await self._database.collection(outbox_service.SEQUENCE_COLLECTION).find_one_and_update(
+            {'_id': outbox_service.OUTBOX_COLLECTION},
+            outbox_service.sequence_update(len(events)),
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        await self._database.collection(outbox_service.OUTBOX_COLLECTION).insert_many(
+            outbox_service.number_events(events, counter['seq']), session=session)
+
+    async def _invalidate_cached(self, user_id: str) -> None:
+        if subscription_cache.enabled:
+            # The cache backends block; keep them off the event loop.
+            await asyncio.to_thread(subscription_cache.invalidate, user_id)
+
+    async def _to_payload(self, doc: dict, status: str | None = None) -> dict:
+        snapshot = doc.get('plan_snapshot')
+        if snapshot:
+            plan_payload = PlanReadModel.from_snapshot(snapshot).to_dict()
+        else:
+            plan_payload = await self._plans.get_plan_payload(doc.get('plan'))
+            if plan_payload is None:
+                raise ValueError(f"Plan {doc.get('plan')} referenced by subscription not found.")
+        return SubscriptionReadModel.from_raw(doc, plan_payload, status=status).to_dict()
+
+    @_retry_transient
+    async def create_subscription(self, subscription_data: SubscriptionCreateInternal) -> dict:
+        """Single insert; the partial unique index rejects a second ACTIVE subscription."""
+        user_id = subscription_data.user_id
+        plan_id = subscription_data.plan_id
+
+        plan = await self._plans.get_plan(plan_id)
+        if plan is None:
+            err_msg = f"Plan with ID {plan_id} not found or invalid."
+            logger.error(f"Create subscription error for user {user_id}: {err_msg}")
+            raise ValueError(err_msg)
+
+        now = datetime.now(timezone.utc)
+        new_sub = Subscription(
+            user_id=user_id,
+            start_date=now,
+            status=SubscriptionStatus.ACTIVE,
+            created_at=now,
+            updated_at=now,
+        )
+        new_sub.set_plan(plan)
+        new_sub._calculate_end_date()
+        try:
+            new_sub.validate()
+        except ValidationError as e:
+            raise ValueError(f"Database error (NotUnique/Validation) creating subscription: {str(e)}")
+
+        doc = new_sub.to_mongo().to_dict()
+
+        async def insert(session):
+            await self._status_writes().insert_one(doc, session=session)  # Sets doc['_id']
+            return doc, [event_record(SubscriptionEventType.CREATED, doc, now)]
+
+        try:
+            await self._run(insert)
+        except DuplicateKeyError:
+            err_msg = "User already has an active subscription."
+            logger.error(f"Create subscription error for user {user_id}: {err_msg}")
+            raise ValueError(err_msg)
+        await self._record_rollups(analytics_service.started_events, doc, now)
+        await self._invalidate_cached(user_id)
+        return await self._to_payload(doc)
+
+    async def get_subscription_payload_for_user(self, user_id: str) -> dict | None:
+        """Async equivalent of SubscriptionService.get_subscription_payload_for_user."""
+        if not subscription_cache.enabled:
+            return await self._load_subscription_payload(user_id)
+        # The cache blocks (backend I/O, waiting on another reader's load), so
+        # it runs in a thread; a miss runs the async load back on this loop.
+        loop = asyncio.get_running_loop()
+
+        def load():
+            return asyncio.run_coroutine_threadsafe(self._load_subscription_payload(user_id), loop).result()
+
+        return await asyncio.to_thread(subscription_cache.get_or_load, user_id, load)
+
+    async def _load_subscription_payload(self, user_id: str) -> dict | None:
+        collection = self._subscriptions()
+        latest = await collection.find_one({'user_id': user_id}, SubscriptionReadModel.PROJECTION,
+                                           sort=[('end_date', -1)])
+        active = latest
+        if SubscriptionService._needs_active_lookup(latest):
+            active = await collection.find_one({'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value},
+                                               SubscriptionReadModel.PROJECTION)
+        doc, overdue = SubscriptionService._pick_current(latest, active, datetime.now(timezone.utc))
+        if doc is None:
+            return None
+        return await self._to_payload(doc, status=SubscriptionStatus.EXPIRED.value if overdue else None)
+
+    async def get_subscription_history(self, user_id: str, limit: int, cursor: str | None = None,
+                                       fields: tuple[str, ...] | None = None) -> dict:
+        """Async equivalent of SubscriptionService.get_subscription_history."""
+        after = subscription_history.decode_cursor(cursor) if cursor else None
+        docs = await (self._subscriptions(read_preference=read_preference(self._config, 'history'))
+                      .find(subscription_history.history_query(user_id, after),
+                            subscription_history.history_projection(fields))
+                      .sort(subscription_history.HISTORY_SORT)
+                      .limit(limit + 1)
+                      .to_list(None))
+
+        legacy_ids = subscription_history.legacy_plan_ids(docs[:limit], fields)
+        plans = await self._plans.get_plan_payloads(legacy_ids) if legacy_ids else {}
+
+        def plan_payload_for(doc):
+            if doc.get('plan_snapshot'):
+                return PlanReadModel.from_snapshot(doc['plan_snapshot']).to_dict()
+            plan_payload = plans.get(str(doc.get('plan')))
+            if plan_payload is None:
+                raise ValueError(f"Plan {doc.get('plan')} referenced by subscription {doc['_id']} not found.")
+            return plan_payload
+
+        return subscription_history.build_page(docs, limit, fields, plan_payload_for)
+
+    @_retry_transient
+    async def update_user_subscription(self, user_id: str, update_data: SubscriptionUpdateRequest) -> dict:
+        """
+        Moves the active subscription to a new plan with one find_one_and_update.
+        It returns the previous document (the rollups need the old plan's
+        terms) and the new values are applied to it in memory.
+        """
+        new_plan_id = update_data.plan_id
+        new_plan = await self._plans.get_plan(new_plan_id)
+        if new_plan is None:
+            raise ValueError(f"New plan with ID {new_plan_id} not found or invalid.")
+
+        now = datetime.now(timezone.utc)
+        new_values = {
+            'plan': new_plan.id,
+            'plan_snapshot': PlanSnapshot.from_plan(new_plan).to_mongo().to_dict(),
+            'start_date': now,
+            'end_date': now + timedelta(days=new_plan.duration_days),
+            'updated_at': now,
+        }
+
+        async def upgrade(session):
+            before = await self._status_writes().find_one_and_update(
+                {'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value, 'plan': {'$ne': new_plan.id}},
+                {'$set': new_values},
+                projection=SubscriptionReadModel.PROJECTION,
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return None, []
+            after = dict(before, **new_values)
+            return before, [event_record(SubscriptionEventType.UPGRADED, after, now, previous=before)]
+
+        previous_doc = await self._run(upgrade)
+        if previous_doc is None:
+            active = await self._subscriptions().find_one(
+                {'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value}, {'_id': 1})
+            if active:
+                raise ValueError("User is already subscribed to this plan.")
+            raise ValueError("No active subscription found to update.")
+        updated_doc = dict(previous_doc, **new_values)
+        await self._record_rollups(analytics_service.upgrade_events, previous_doc, updated_doc, now)
+        await self._invalidate_cached(user_id)
+        return await self._to_payload(updated_doc)
+
+    @_retry_transient
+    async def cancel_user_subscription(self, user_id: str) -> dict:
+        """Cancels a user's active subscription, allowing it to expire naturally."""
+        now = datetime.now(timezone.utc)
+
+        async def cancel(session):
+            doc = await self._status_writes().find_one_and_update(
+                {'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value},
+                {'$set': {
+                    'status': SubscriptionStatus.CANCELLED.value,
+                    'updated_at': now,
+                }},
+                projection=SubscriptionReadModel.PROJECTION,
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if doc is None:
+                return None, []
+            return doc, [event_record(SubscriptionEventType.CANCELLED, doc, now)]
+
+        cancelled_doc = await self._run(cancel)
+        if cancelled_doc is None:
+            raise ValueError("No active subscription found to cancel.")
+        await self._record_rollups(analytics_service.cancelled_events, cancelled_doc, cancelled_doc['updated_at'])
+        await self._invalidate_cached(user_id)
+        return await self._to_payload(cancelled_doc)
@@ -0,0 +1,231 @@
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+from bson import ObjectId
+from flask import current_app
+from pydantic import ValidationError as PydanticValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from mongoengine.errors import ValidationError
+
+from app.models.subscription import Subscription
+from app.schemas.subscription_schemas import SubscriptionCreateInternal
+from app.services.analytics_service import AnalyticsService
+from app.services.expiration_scheduler import expiration_scheduler
+from app.services.outbox_service import OutboxService, event_record
+from app.services.plan_service import PlanService
+from app.services.subscription_cache import subscription_cache
+from app.utils.enums import SubscriptionEventType, SubscriptionStatus
+
+DUPLICATE_KEY_ERROR = 11000
+# Transaction attempts when a concurrent insert conflicts with a chunk (outbox enabled)
+_INSERT_ATTEMPTS = 3
+
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator:
+    """
+    Yields one parsed object per non-blank NDJSON line. Lines that are not
+    valid JSON are yielded as a ValueError so they still get a row result.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+class BulkImportService:
+    """
+    Provisions subscriptions for many (user_id, plan_id) pairs at once.
+
+    Rows are processed in chunks: each chunk is validated, its plans resolved
+    in one batched lookup, and inserted with one unordered insert_many. The
+    "one ACTIVE subscription per user" rule is still enforced by the partial
+    unique index, so a duplicate key becomes a per-row "conflict" result.
+    """
+
+    @staticmethod
+    def import_subscriptions(rows: Iterable, chunk_size: int | None = None) -> Iterator[dict]:
+        """
+        Yields one result dict per input row, in input order:
+        {"row", "user_id", "plan_id", "status", "subscription_id" | "error"}
+        where status is created, conflict, invalid, plan_not_found or error.
+        """
+        if chunk_size is None:
+            chunk_size = current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 1000)
+        chunk_size = max(1, chunk_size)
+
+        chunk = []
+        for row_number, row in enumerate(rows):
+            chunk.append((row_number, row))
+            if len(chunk) >= chunk_size:
+                yield from BulkImportService._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from BulkImportService._import_chunk(chunk)
+
+    @staticmethod
+    def summarize(results: Iterable[dict]) -> Iterator[dict]:
+        """Passes results through and finally yields {"summary": {status: count, "total": n}}."""
+        counts = {}
+        total = 0
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            total += 1
+            yield result
+        yield {'summary': dict(counts, total=total)}
+
+    @staticmethod
+    def _known_conflicts(documents: list[dict], session) -> dict:
+        """
+        {index: write error} for the documents whose user already has an
+        ACTIVE subscription or appears earlier in `documents`, shaped like
+        the duplicate key errors the unique index would raise.
+        """
+        user_ids = list({document['user_id'] for document in documents})
+        seen = {doc['user_id'] for doc in Subscription._get_collection().find(
+            {'user_id': {'$in': user_ids}, 'status': SubscriptionStatus.ACTIVE.value},
+            {'user_id': 1, '_id': 0},
+            session=session,
+        )}
+        failed = {}
+        for index, document in enumerate(documents):
+            if document['user_id'] in seen:
+                failed[index] = {'code': DUPLICATE_KEY_ERROR, 'errmsg': 'User already has an active subscription.'}
+            seen.add(document['user_id'])
+        return failed
+
+    @staticmethod
+    def _insert(documents: list[dict], now: datetime) -> dict:
+        """
+        Inserts `documents` with their outbox events and returns {index: write
+        error} for the rows that were not inserted.
+
+        Without the outbox this is one unordered insert_many, and duplicate
+        keys come back as per-row write errors. In a transaction any write
+        error aborts every insert, so conflicting users are looked up first
+        inside the transaction and left out; a conflicting subscription
+        created concurrently aborts the attempt and the chunk is retried.
+        """
+        collection = Subscription._get_collection()
+
+        def insert(session):
+            failed = BulkImportService._known_conflicts(documents, session) if session is not None else {}
+            pending = [index for index in range(len(documents)) if index not in failed]
+            try:
+                if pending:
+                    collection.insert_many([documents[index] for index in pending], ordered=False, session=session)
+            except BulkWriteError as e:
+                if session is not None:
+                    raise
+                for write_error in e.details.get('writeErrors', []):
+                    failed[pending[write_error['index']]] = write_error
+            events = [event_record(SubscriptionEventType.CREATED, documents[index], now)
+                      for index in pending if index not in failed]
+            return failed, events
+
+        for attempt in range(1, _INSERT_ATTEMPTS + 1):
+            try:
+                return OutboxService.run(insert)
+            except (BulkWriteError, DuplicateKeyError):
+                if attempt == _INSERT_ATTEMPTS:
+                    raise
+                current_app.logger.info("Bulk import chunk conflicted with a concurrent insert; retrying.")
+
+    @staticmethod
+    def _not_inserted(documents: list[dict], error: Exception) -> dict:
+        """
+        {index: write error} after `error` (a lost connection, a timeout)
+        interrupted the insert of `documents`: it may have written some or
+        all of them, so the rows whose pre-assigned _id is not in the
+        collection are the failed ones. If this lookup fails too, its error
+        propagates, as the outcome of the chunk is unknown.
+        """
+        ids = [document['_id'] for document in documents]
+        inserted = {doc['_id'] for doc in Subscription._get_collection().find({'_id': {'$in': ids}}, {'_id': 1})}
+        return {index: {'code': None, 'errmsg': str(error)}
+                for index, document in enumerate(documents) if document['_id'] not in inserted}
+
+    @staticmethod
+    def _import_chunk(chunk: list[tuple[int, object]]) -> Iterator[dict]:
+        results: dict[int, dict] = {}
+        valid = []  # (row_number, SubscriptionCreateInternal)
+
+        for row_number, row in chunk:
+            result = {'row': row_number, 'user_id': None, 'plan_id': None}
+            results[row_number] = result
+            if isinstance(row, dict):
+                result['user_id'] = row.get('user_id')
+                result['plan_id'] = row.get('plan_id')
+            if isinstance(row, Exception):
+                result.update(status='invalid', error=str(row))
+                continue
+            if not isinstance(row, dict):
+                result.update(status='invalid', error="Row must be an object with 'user_id' and 'plan_id'.")
+                continue
+            try:
+                valid.append((row_number, SubscriptionCreateInternal(**row)))
+            except PydanticValidationError as e:
+                details = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                result.update(status='invalid', error=details)
+            except (TypeError, ValueError) as e:
+                result.update(status='invalid', error=str(e))
+
+        plans = PlanService.get_plans_by_ids([data.plan_id for _, data in valid])
+
+        now = datetime.now(timezone.utc)
+        documents = []
+        document_rows = []
+        for row_number, data in valid:
+            plan = plans.get(str(data.plan_id))
+            if plan is None:
+                results[row_number].update(status='plan_not_found', error=f"Plan with ID {data.plan_id} not found.")
+                continue
+            sub = Subscription(
+                id=ObjectId(),  # Known before inserting, to find out what an interrupted insert wrote
+                user_id=data.user_id,
+                start_date=now,
+                status=SubscriptionStatus.ACTIVE,
+                created_at=now,
+                updated_at=now,
+            )
+            sub.set_plan(plan)
+            sub._calculate_end_date()
+            try:
+                sub.validate()
+            except ValidationError as e:
+                results[row_number].update(status='invalid', error=str(e))
+                continue
+            documents.append(sub.to_mongo().to_dict())
+            document_rows.append(row_number)
+
+        if documents:
+            try:
+                failed = BulkImportService._insert(documents, now)
+            except Exception as e:
+                current_app.logger.error(f"Bulk import insert_many failed for {len(documents)} rows: {e}")
+                failed = BulkImportService._not_inserted(documents, e)
+
+            created = [document for index, document in enumerate(documents) if index not in failed]
+            if created:
+                expiration_scheduler.notify_deadline(min(document['end_date'] for document in created))
+                AnalyticsService.record_started(created, now)
+                subscription_cache.invalidate(*{document['user_id'] for document in created})
+
+            for index, row_number in enumerate(document_rows):
+                write_error = failed.get(index)
+                if write_error is None:
+                    results[row_number].update(status='created', subscription_id=str(documents[index]['_id']))
+                elif write_error.get('code') == DUPLICATE_KEY_ERROR:
+                    results[row_number].update(status='conflict', error="User already has an active subscription.")
+                else:
+                    results[row_number].update(status='error', error=write_error.get('errmsg', 'Insert failed.'))
+
+        for row_number, _ in chunk:
+            result = results[row_number]
+            if result.get('plan_id') is not None:
+                result['plan_id'] = str(result['plan_id'])
+            yield result
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app.services.expiration_service import ExpirationService, ExpirationRunResult
+from app.services.lease_service import expiration_lease
+
+JOB_ID = 'expire_subscriptions_job'
+LEASE_JOB_ID = 'renew_expiration_lease_job'
+
+
+def _aware(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class ExpirationScheduler:
+    """
+    Deadline-driven wake-ups for the expiration job.
+
+    The APScheduler job keeps an interval trigger of EXPIRATION_MAX_SLEEP_SECONDS,
+    which acts as the ceiling. After every run its next_run_time is pulled
+    forward to the moment the next ACTIVE subscription becomes due (one
+    indexed limit(1) read). A run whose batches failed is retried after
+    EXPIRATION_MIN_SLEEP_SECONDS, doubling with every further failed run up
+    to the ceiling.
+
+    Creating or upgrading a subscription with an earlier end_date pulls the
+    next run forward again: directly in the process holding the expiration
+    lease (or in every process, without leader election). Other processes
+    record the deadline on the lease document as `next_due_at`; the leader
+    reads it when it renews the lease, on its own timer (LEASE_JOB_ID, every
+    third of EXPIRATION_LEASE_SECONDS), so such a deadline is picked up
+    within that interval.
+    """
+
+    DEFAULT_MIN_SLEEP_SECONDS = 1.0
+    DEFAULT_MAX_SLEEP_SECONDS = 300.0
+
+    def __init__(self):
+        self._failed_runs = 0  # Consecutive runs with batch errors
+
+    @staticmethod
+    def _scheduled_job():
+        from app import scheduler  # Imported lazily: app imports the services
+        if not scheduler.running:
+            return None, None
+        return scheduler, scheduler.get_job(JOB_ID)
+
+    @staticmethod
+    def _is_leader() -> bool:
+        return not current_app.config.get('EXPIRATION_LEADER_ELECTION', True) or expiration_lease.token is not None
+
+    def plan_next_run(self, run_result: ExpirationRunResult | None, now: datetime | None = None) -> datetime:
+        """When the job should run next, given the outcome of the run that just finished."""
+        config = current_app.config
+        now = now or datetime.now(timezone.utc)
+        earliest = now + timedelta(seconds=float(config.get('EXPIRATION_MIN_SLEEP_SECONDS', self.DEFAULT_MIN_SLEEP_SECONDS)))
+        latest = now + timedelta(seconds=float(config.get('EXPIRATION_MAX_SLEEP_SECONDS', self.DEFAULT_MAX_SLEEP_SECONDS)))
+        election = config.get('EXPIRATION_LEADER_ELECTION', True)
+        failed = run_result is not None and bool(run_result.errors)
+        self._failed_runs = self._failed_runs + 1 if failed else 0
+
+        if election and expiration_lease.token is None:
+            # Follower: nothing to do until the leader's lease could expire.
+            lease = expiration_lease.current()
+            target = _aware(lease['expires_at']) + timedelta(milliseconds=500) if lease and lease.get('expires_at') else earliest
+        elif failed:
+            # Back off while the database is failing instead of retrying every EXPIRATION_MIN_SLEEP_SECONDS.
+            target = now + (earliest - now) * 2 ** min(self._failed_runs - 1, 32)
+        elif run_result is not None and not run_result.complete:
+            target = earliest  # Backlog left over (max batches reached)
+        else:
+            if election and run_result is not None:
+                self._clear_shared_deadlines(run_result.cutoff)
+            next_due = ExpirationService.next_due_at()
+            # The job expires end_date < cutoff, so wake just after the deadline.
+            target = next_due + timedelta(milliseconds=1) if next_due else latest
+        return min(max(target, earliest), latest)
+
+    def reschedule(self, run_at: datetime) -> bool:
+        scheduler, job = self._scheduled_job()
+        if job is None:
+            return False
+        scheduler.modify_job(JOB_ID, next_run_time=run_at)
+        return True
+
+    def _wake_at(self, run_at: datetime) -> bool:
+        """Moves the local job's next run to `run_at` if that is earlier; False if this process has no job."""
+        scheduler, job = self._scheduled_job()
+        if job is None or job.next_run_time is None:
+            return False
+        if run_at < job.next_run_time:
+            scheduler.modify_job(JOB_ID, next_run_time=run_at)
+        return True
+
+    @staticmethod
+    def _share_deadline(run_at: datetime) -> None:
+        # Kept on the lease document, which the leader reads when renewing it.
+        expiration_lease._collection().update_one(
+            {'_id': expiration_lease.name}, {'$min': {'next_due_at': run_at}})
+
+    @staticmethod
+    def _clear_shared_deadlines(cutoff: datetime) -> None:
+        """Drops a shared deadline the run up to `cutoff` has covered."""
+        expiration_lease._collection().update_one(
+            {'_id': expiration_lease.name, 'next_due_at': {'$lte': cutoff}}, {'$unset': {'next_due_at': ''}})
+
+    def notify_deadline(self, end_date: datetime | None) -> None:
+        """Wakes the job earlier if `end_date` comes before its next scheduled run."""
+        if end_date is None:
+            return
+        try:
+            now = datetime.now(timezone.utc)
+            run_at = max(_aware(end_date) + timedelta(milliseconds=1), now)
+            if self._is_leader():
+                self._wake_at(run_at)
+                return
+            # The leader re-reads the next deadline at least every
+            # EXPIRATION_MAX_SLEEP_SECONDS; only share the ones due before that.
+            max_sleep = float(current_app.config.get('EXPIRATION_MAX_SLEEP_SECONDS', self.DEFAULT_MAX_SLEEP_SECONDS))
+            if run_at < now + timedelta(seconds=max_sleep):
+                self._share_deadline(run_at)
+        except Exception as e:
+            current_app.logger.warning(f"Could not reschedule expiration job for deadline {end_date}: {e}")
+
+    def keep_lease(self) -> None:
+        """
+        LEASE_JOB_ID: renews the expiration lease between runs if this process
+        holds it, and wakes the job for a deadline shared by another process.
+        """
+        fencing_token = expiration_lease.token
+        if fencing_token is None:
+            return
+        lease_seconds = float(current_app.config.get('EXPIRATION_LEASE_SECONDS', 45))
+        if not expiration_lease.renew(fencing_token, lease_seconds):
+            current_app.logger.warning("Expiration lease was taken over between runs.")
+            return
+        lease = expiration_lease.current()
+        if lease and lease.get('next_due_at'):
+            self._wake_at(max(_aware(lease['next_due_at']), datetime.now(timezone.utc)))
+
+
+expiration_scheduler = ExpirationScheduler()
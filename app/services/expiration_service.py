@@ -0,0 +1,172 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+from flask import current_app
+
+from app.core.mongo_options import status_write_concern
+from app.models.subscription import Subscription
+from app.services.analytics_service import AnalyticsService
+from app.services.outbox_service import EVENT_PROJECTION, OutboxService, event_record
+from app.services.subscription_cache import subscription_cache
+from app.utils.enums import SubscriptionEventType, SubscriptionStatus
+
+
+@dataclass
+class ExpirationRunResult:
+    """Summary of a single bulk expiration run."""
+    cutoff: datetime
+    matched: int = 0     # Overdue ACTIVE subscriptions selected for expiry
+    expired: int = 0     # Subscriptions actually flipped to EXPIRED
+    batches: int = 0
+    duration_seconds: float = 0.0
+    complete: bool = True  # False if the run stopped early (max_batches reached, lease lost or a batch failed)
+    lease_lost: bool = False  # Stopped because another process took over the expiration lease
+    errors: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "cutoff": self.cutoff.isoformat(),
+            "matched": self.matched,
+            "expired": self.expired,
+            "batches": self.batches,
+            "duration_seconds": round(self.duration_seconds, 6),
+            "complete": self.complete,
+            "lease_lost": self.lease_lost,
+            "errors": list(self.errors),
+        }
+
+
+class ExpirationService:
+    """
+    Server-side bulk expiration engine.
+
+    Instead of hydrating every overdue Subscription and calling save() on it,
+    overdue ACTIVE subscriptions are selected in chunks of `_id`s (walking the
+    end_date index) and flipped with one update_many per chunk. Memory per
+    batch is bounded by `batch_size` ObjectIds. Each batch's update and its
+    outbox events share one transaction (see app/services/outbox_service.py).
+    """
+
+    DEFAULT_BATCH_SIZE = 1000
+    # What the analytics rollups and the outbox events read of an expired subscription
+    BATCH_PROJECTION = dict(AnalyticsService.TERMS_PROJECTION, **EVENT_PROJECTION)
+
+    @staticmethod
+    def _due_filter(cutoff: datetime) -> dict:
+        return {
+            "status": SubscriptionStatus.ACTIVE.value,
+            "end_date": {"$lt": cutoff},
+        }
+
+    @staticmethod
+    def next_due_at() -> datetime | None:
+        """
+        The earliest end_date of any ACTIVE subscription (already due or not),
+        or None if there is none. One limit(1) read of the (status, end_date) index.
+        """
+        doc = Subscription._get_collection().find_one(
+            {"status": SubscriptionStatus.ACTIVE.value},
+            {"end_date": 1, "_id": 0},
+            sort=[("end_date", 1)],
+        )
+        if not doc or doc.get("end_date") is None:
+            return None
+        end_date = doc["end_date"]
+        return end_date if end_date.tzinfo else end_date.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def expire_due_subscriptions(batch_size: int | None = None,
+                                 max_batches: int | None = None,
+                                 now: datetime | None = None,
+                                 still_leader: Callable[[], bool] | None = None) -> ExpirationRunResult:
+        """
+        Expires every ACTIVE subscription whose end_date is before `now`.
+
+        `still_leader`, if given, is called before every batch after the
+        first (e.g. to renew the expiration lease); the run stops as soon as
+        it returns False.
+
+        The cutoff is fixed at the start of the run so the loop always
+        terminates, even while new subscriptions become due. Each batch is
+        re-selected from the front of the index: documents expired by the
+        previous batch no longer match the filter, so no skip/offset is needed.
+        """
+        config = current_app.config
+        if batch_size is None:
+            batch_size = int(config.get("EXPIRATION_BATCH_SIZE", ExpirationService.DEFAULT_BATCH_SIZE))
+        if max_batches is None:
+            max_batches = int(config.get("EXPIRATION_MAX_BATCHES_PER_RUN", 0))
+        batch_size = max(1, batch_size)
+
+        cutoff = now or datetime.now(timezone.utc)
+        result = ExpirationRunResult(cutoff=cutoff)
+        started = time.perf_counter()
+
+        collection = Subscription._get_collection()
+        status_writes = collection.with_options(write_concern=status_write_concern(config))
+        due_filter = ExpirationService._due_filter(cutoff)
+
+        while True:
+            if max_batches and result.batches >= max_batches:
+                result.complete = False
+                break
+            if still_leader is not None and result.batches and not still_leader():
+                result.complete = False
+                result.lease_lost = True
+                break
+
+            batch = list(collection.find(due_filter, ExpirationService.BATCH_PROJECTION)
+                                   .sort("end_date", 1)
+                                   .limit(batch_size))
+            batch_ids = [doc["_id"] for doc in batch]
+            if not batch_ids:
+                break
+
+            # Re-apply the due filter so a subscription cancelled or upgraded
+            # between the select and the update is left untouched.
+            update_filter = dict(due_filter, _id={"$in": batch_ids})
+            expired_at = datetime.now(timezone.utc)
+
+            def expire_batch(session, batch=batch):
+                update_result = status_writes.update_many(
+                    update_filter,
+                    {"$set": {
+                        "status": SubscriptionStatus.EXPIRED.value,
+                        "updated_at": expired_at,
+                    }},
+                    session=session,
+                )
+                if update_result.modified_count != len(batch):
+                    # Some changed in between: keep the ones this update expired.
+                    batch = list(collection.find(
+                        {"_id": {"$in": batch_ids}, "status": SubscriptionStatus.EXPIRED.value,
+                         "updated_at": expired_at},
+                        ExpirationService.BATCH_PROJECTION,
+                        session=session,
+                    )) if update_result.modified_count else []
+                expired = [dict(doc, status=SubscriptionStatus.EXPIRED.value) for doc in batch]
+                return expired, [event_record(SubscriptionEventType.EXPIRED, doc, expired_at) for doc in expired]
+
+            try:
+                expired = OutboxService.run(expire_batch)
+            except Exception as e:
+                current_app.logger.error(f"Error expiring batch of {len(batch_ids)} subscriptions: {e}")
+                result.errors.append(str(e))
+                result.complete = False
+                break
+
+            result.batches += 1
+            result.matched += len(batch_ids)
+            result.expired += len(expired)
+            if expired and AnalyticsService.enabled():
+                AnalyticsService.record_expired(expired)
+            if expired:
+                subscription_cache.invalidate(*{doc["user_id"] for doc in expired})
+
+            if len(batch_ids) < batch_size:
+                break
+
+        result.duration_seconds = time.perf_counter() - started
+        return result
@@ -0,0 +1,124 @@
+import atexit
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.models.subscription import Subscription
+
+LEASE_COLLECTION = 'job_leases'
+
+
+class LeaseService:
+    """
+    Mongo-backed, time-limited lease for running a job in one process at a time.
+
+    The lease is one document per job in `job_leases`:
+    {_id: name, holder, fencing_token, expires_at, acquired_at, renewed_at}.
+    A process holds the lease until `expires_at`. Once it has expired, any
+    process may take it over. Every takeover increments `fencing_token`, so a
+    stale holder whose lease was taken over can no longer renew it and stops.
+
+    Expiry uses this host's clock, so lease_seconds must be comfortably
+    larger than the clock skew between replicas.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._holder_id: str | None = None
+        self._holder_pid: int | None = None
+        self._token: int | None = None
+        atexit.register(self._release_on_exit)
+
+    @staticmethod
+    def _collection():
+        return Subscription._get_db()[LEASE_COLLECTION]
+
+    @property
+    def holder_id(self) -> str:
+        """Unique per process, so forked workers never share a holder id."""
+        if self._holder_pid != os.getpid():
+            self._holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._holder_pid = os.getpid()
+            self._token = None
+        return self._holder_id
+
+    def acquire(self, lease_seconds: float) -> int | None:
+        """
+        Returns the fencing token if this process now holds the lease (newly
+        acquired or extended), None if another process holds it.
+        """
+        holder = self.holder_id
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=lease_seconds)
+        collection = self._collection()
+
+        # Still ours: extend it, keeping the fencing token.
+        doc = collection.find_one_and_update(
+            {'_id': self.name, 'holder': holder, 'expires_at': {'$gt': now}},
+            {'$set': {'expires_at': expires_at, 'renewed_at': now}},
+            projection={'fencing_token': 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            # Take over an expired (or missing) lease. If someone else holds a
+            # live lease, the filter misses and the upsert hits the _id.
+            try:
+                doc = collection.find_one_and_update(
+                    {'_id': self.name, '$or': [{'expires_at': {'$lte': now}}, {'holder': holder}]},
+                    {'$set': {'holder': holder, 'expires_at': expires_at, 'acquired_at': now, 'renewed_at': now},
+                     '$inc': {'fencing_token': 1}},
+                    projection={'fencing_token': 1},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                self._token = None
+                return None
+        self._token = doc['fencing_token']
+        return self._token
+
+    def renew(self, fencing_token: int, lease_seconds: float) -> bool:
+        """Extends the lease if this process still holds it under `fencing_token`."""
+        now = datetime.now(timezone.utc)
+        result = self._collection().update_one(
+            {'_id': self.name, 'holder': self.holder_id, 'fencing_token': fencing_token},
+            {'$set': {'expires_at': now + timedelta(seconds=lease_seconds), 'renewed_at': now}},
+        )
+        if result.matched_count == 1:
+            return True
+        self._token = None
+        return False
+
+    def release(self, fencing_token: int) -> None:
+        """Expires the lease now, so another process can take over without waiting."""
+        self._collection().update_one(
+            {'_id': self.name, 'holder': self.holder_id, 'fencing_token': fencing_token},
+            {'$set': {'expires_at': datetime.now(timezone.utc)}},
+        )
+        self._token = None
+
+    @property
+    def token(self) -> int | None:
+        """Fencing token of the lease this process last acquired, or None if it does not hold it."""
+        if self._holder_pid != os.getpid():
+            return None
+        return self._token
+
+    def _release_on_exit(self) -> None:
+        if self._token is None or self._holder_pid != os.getpid():
+            return
+        try:
+            self.release(self._token)
+        except Exception:
+            pass  # Best effort: the lease still expires on its own
+
+    def current(self) -> dict | None:
+        """The lease document, for diagnostics."""
+        return self._collection().find_one({'_id': self.name})
+
+
+expiration_lease = LeaseService('expire_subscriptions')
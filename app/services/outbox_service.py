@@ -0,0 +1,217 @@
+"""
+Transactional outbox of subscription lifecycle events.
+
+Creating, upgrading, cancelling and expiring subscriptions (SubscriptionService,
+AsyncSubscriptionService, the expiration job and the bulk import) writes the
+change and one compact event per affected subscription to
+`subscription_events` in the same MongoDB transaction, so an event exists if
+and only if its change committed. Downstream systems read the outbox instead
+of polling `subscriptions`.
+
+Events are numbered from a counter document in `outbox_sequences` that the
+transaction increments. A concurrent writer conflicts on that document and
+the driver retries it once the first transaction has finished, so sequence
+numbers are gapless and become visible in order: a consumer that has read
+up to N never later finds an event below N. The counter serializes the
+writes that produce events; that is the cost of a total order.
+
+Consumers keep their position in `outbox_checkpoints`, one document per
+consumer name. Delivery is at-least-once: commit the checkpoint after the
+batch has been processed. A TTL index drops events OUTBOX_RETENTION_DAYS
+after they occurred.
+
+Transactions need a replica set or a sharded cluster (a single-node replica
+set will do), so the outbox is off unless OUTBOX_ENABLED is set. Off, each
+change runs the same code without a session and no events are written.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Iterator, TypeVar
+
+from flask import current_app
+from pymongo import ReturnDocument
+
+from app.core.mongo_options import status_write_concern
+from app.models.outbox import SubscriptionEvent
+from app.utils.enums import SubscriptionEventType
+
+OUTBOX_COLLECTION = SubscriptionEvent._meta['collection']
+SEQUENCE_COLLECTION = 'outbox_sequences'
+CHECKPOINT_COLLECTION = 'outbox_checkpoints'
+
+# Subscription fields event_record reads
+EVENT_PROJECTION = {'user_id': 1, 'plan': 1, 'plan_snapshot.plan_id': 1, 'status': 1, 'end_date': 1}
+
+T = TypeVar('T')
+
+
+def _plan_id(doc: dict):
+    return (doc.get('plan_snapshot') or {}).get('plan_id') or doc.get('plan')
+
+
+def event_record(event_type: SubscriptionEventType, doc: dict, at: datetime, previous: dict | None = None) -> dict:
+    """
+    The outbox record for raw subscription `doc` as it is after the change.
+    `previous` is the document before an upgrade.
+    """
+    record = {
+        'type': SubscriptionEventType(event_type).value,
+        'subscription_id': doc['_id'],
+        'user_id': doc.get('user_id'),
+        'plan_id': _plan_id(doc),
+        'status': doc.get('status'),
+        'end_date': doc.get('end_date'),
+        'occurred_at': at,
+    }
+    if previous is not None:
+        record['previous_plan_id'] = _plan_id(previous)
+    return record
+
+
+def sequence_update(count: int) -> dict:
+    """Reserves `count` sequence numbers on the outbox counter document."""
+    return {'$inc': {'seq': count}}
+
+
+def number_events(events: list[dict], last_seq: int) -> list[dict]:
+    """Gives `events` the sequence numbers ending at `last_seq`, in order."""
+    first = last_seq - len(events) + 1
+    return [dict(event, _id=first + offset) for offset, event in enumerate(events)]
+
+
+def event_payload(doc: dict) -> dict:
+    """An outbox document as returned to consumers: its sequence number as 'seq'."""
+    payload = {key: value for key, value in doc.items() if key != '_id'}
+    payload['seq'] = doc['_id']
+    return payload
+
+
+def checkpoint_payload(consumer: str, doc: dict | None) -> dict:
+    return {'consumer': consumer, 'seq': doc.get('seq', 0) if doc else 0,
+            'updated_at': doc.get('updated_at') if doc else None}
+
+
+class OutboxService:
+
+    @staticmethod
+    def enabled() -> bool:
+        return current_app.config.get('OUTBOX_ENABLED', False)
+
+    @staticmethod
+    def _db():
+        return SubscriptionEvent._get_db()
+
+    @staticmethod
+    def run(change: Callable[[object], tuple[T, list[dict]]]) -> T:
+        """
+        Runs `change(session)`, which makes a subscription change passing
+        `session` to every write and returns (result, events), and returns
+        `result`.
+
+        With the outbox enabled the change and the appending of its events
+        share one transaction. The driver retries all of it on transient
+        errors (e.g. a write conflict on the counter), so `change` must have
+        no side effects beyond its writes. Disabled, `change(None)` runs
+        without a transaction and the events are dropped. The transaction
+        commits with the status write concern (MONGO_STATUS_WRITE_CONCERN).
+        """
+        if not OutboxService.enabled():
+            return change(None)[0]
+
+        def in_transaction(session):
+            result, events = change(session)
+            OutboxService.append(events, session)
+            return result
+
+        with OutboxService._db().client.start_session() as session:
+            return session.with_transaction(in_transaction, write_concern=status_write_concern(current_app.config))
+
+    @staticmethod
+    def append(events: list[dict], session) -> None:
+        """Numbers and inserts `events` within `session`'s transaction."""
+        if not events:
+            return
+        database = OutboxService._db()
+        counter = database[SEQUENCE_COLLECTION].find_one_and_update(
+            {'_id': OUTBOX_COLLECTION},
+            sequence_update(len(events)),
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        database[OUTBOX_COLLECTION].insert_many(number_events(events, counter['seq']), session=session)
+
+    @staticmethod
+    def head() -> int:
+        """The sequence number of the latest event written (0 if none)."""
+        counter = OutboxService._db()[SEQUENCE_COLLECTION].find_one({'_id': OUTBOX_COLLECTION})
+        return counter.get('seq', 0) if counter else 0
+
+    @staticmethod
+    def read(after: int = 0, limit: int = 100) -> list[dict]:
+        """Up to `limit` events with a sequence number above `after`, in order."""
+        cursor = (OutboxService._db()[OUTBOX_COLLECTION]
+                  .find({'_id': {'$gt': after}})
+                  .sort('_id', 1)
+                  .limit(limit))
+        return [event_payload(doc) for doc in cursor]
+
+    @staticmethod
+    def get_checkpoint(consumer: str) -> dict:
+        """{'consumer', 'seq', 'updated_at'}; seq is 0 for a consumer that never committed."""
+        return checkpoint_payload(consumer, OutboxService._db()[CHECKPOINT_COLLECTION].find_one({'_id': consumer}))
+
+    @staticmethod
+    def commit_checkpoint(consumer: str, seq: int) -> dict:
+        """Moves a consumer's checkpoint forward to `seq`; it never moves back."""
+        doc = OutboxService._db()[CHECKPOINT_COLLECTION].find_one_and_update(
+            {'_id': consumer},
+            {'$max': {'seq': seq}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return checkpoint_payload(consumer, doc)
+
+
+class OutboxReader:
+    """
+    Tails the outbox for one named consumer, resuming from its checkpoint:
+
+        reader = OutboxReader('billing')
+        for batch in reader.batches(stop=stop_event):
+            handle(batch)
+            reader.commit(batch)
+
+    `poll` moves the in-memory position past the batch it returns; `commit`
+    persists it. Events handled but not committed before a crash are
+    delivered again on restart.
+    """
+
+    def __init__(self, consumer: str, batch_size: int = 100, poll_interval: float = 1.0):
+        self.consumer = consumer
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.position: int | None = None
+
+    def poll(self) -> list[dict]:
+        """The next batch of at most batch_size events (empty when caught up)."""
+        if self.position is None:
+            self.position = OutboxService.get_checkpoint(self.consumer)['seq']
+        batch = OutboxService.read(self.position, self.batch_size)
+        if batch:
+            self.position = batch[-1]['seq']
+        return batch
+
+    def commit(self, batch: list[dict]) -> None:
+        if batch:
+            OutboxService.commit_checkpoint(self.consumer, batch[-1]['seq'])
+
+    def batches(self, stop: threading.Event | None = None) -> Iterator[list[dict]]:
+        """Yields non-empty batches in order, waiting poll_interval whenever the outbox is drained."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            batch = self.poll()
+            if batch:
+                yield batch
+            else:
+                stop.wait(self.poll_interval)
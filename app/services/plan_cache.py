@@ -0,0 +1,303 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import current_app, has_app_context
+from mongoengine import signals
+
+from app.core import metrics, mongo_options
+from app.models.plan import Plan
+from app.schemas.read_models import PlanReadModel
+from app.utils.http_caching import Validators, catalog_validators, plan_validators
+
+VERSION_COLLECTION = 'cache_versions'
+PLAN_CATALOG_VERSION_ID = 'plans'
+
+
+class _CatalogSnapshot:
+    """Immutable view of the plan catalog as loaded at one point in time."""
+    __slots__ = ('ordered', 'by_id', 'payloads', 'validators', 'plan_validators', 'loaded_at', 'version')
+
+    def __init__(self, ordered: list[Plan], version: int | None, changed_at: datetime | None = None):
+        self.ordered = tuple(ordered)
+        self.by_id = {str(plan.id): plan for plan in ordered}
+        # Pre-serialized PlanResponse payloads, shared by every response.
+        self.payloads = {plan_id: PlanReadModel.from_document(plan).to_dict() for plan_id, plan in self.by_id.items()}
+        # HTTP validators, see app/utils/http_caching.py
+        self.validators = catalog_validators(((plan.id, plan.updated_at) for plan in ordered), version, changed_at)
+        self.plan_validators = {plan_id: plan_validators(plan_id, plan.updated_at) for plan_id, plan in self.by_id.items()}
+        self.loaded_at = time.monotonic()
+        self.version = version
+
+
+class PlanCache:
+    """
+    Process-wide cache of the plan catalog.
+
+    The whole catalog is loaded with a single query and kept for
+    PLAN_CACHE_TTL_SECONDS. Saving or deleting a Plan through MongoEngine
+    invalidates the local copy and bumps a version counter document in Mongo;
+    other workers poll that counter every PLAN_CACHE_VERSION_CHECK_SECONDS
+    and reload when it changes.
+
+    Catalog loads use MONGO_CATALOG_READ_PREFERENCE. When that allows a
+    secondary, the version and the plans are read in one causally consistent
+    session, so the plans are never older than the version they are stored
+    under. Lookups of plans missing from the catalog always go to the
+    primary.
+
+    Cached Plan documents are shared between requests and must be treated
+    as read-only.
+    """
+
+    DEFAULT_TTL_SECONDS = 300
+    DEFAULT_VERSION_CHECK_SECONDS = 5
+
+    def __init__(self):
+        self._snapshot: _CatalogSnapshot | None = None
+        self._load_lock = threading.Lock()
+        self._last_version_check = 0.0
+        # Counters are best-effort (unsynchronised increments).
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    # --- Configuration helpers ---
+
+    @staticmethod
+    def _config(key: str, default):
+        if has_app_context():
+            return current_app.config.get(key, default)
+        return default
+
+    def enabled(self) -> bool:
+        return bool(self._config('PLAN_CACHE_ENABLED', True))
+
+    @staticmethod
+    def _version_collection():
+        return Plan._get_db()[VERSION_COLLECTION]
+
+    @staticmethod
+    def _catalog_read_preference():
+        return mongo_options.read_preference(current_app.config if has_app_context() else {}, 'catalog')
+
+    # --- Cross-worker version counter ---
+
+    def _read_version(self, session=None) -> tuple[int | None, datetime | None]:
+        """(version, changed_at) of the catalog; version is None if the read failed."""
+        try:
+            doc = self._version_collection().find_one({'_id': PLAN_CATALOG_VERSION_ID}, {'version': 1, 'changed_at': 1},
+                                                      session=session)
+        except Exception as e:
+            if has_app_context():
+                current_app.logger.warning(f"Plan cache version check failed: {e}")
+            return None, None
+        return (doc.get('version', 0), doc.get('changed_at')) if doc else (0, None)
+
+    def bump_version(self) -> None:
+        try:
+            self._version_collection().update_one(
+                {'_id': PLAN_CATALOG_VERSION_ID},
+                {'$inc': {'version': 1}, '$set': {'changed_at': datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except Exception as e:
+            if has_app_context():
+                current_app.logger.warning(f"Could not bump plan catalog version: {e}")
+
+    # --- Loading ---
+
+    def _is_stale(self, snapshot: _CatalogSnapshot) -> bool:
+        now = time.monotonic()
+        ttl = float(self._config('PLAN_CACHE_TTL_SECONDS', self.DEFAULT_TTL_SECONDS))
+        if now - snapshot.loaded_at >= ttl:
+            return True
+
+        check_interval = float(self._config('PLAN_CACHE_VERSION_CHECK_SECONDS', self.DEFAULT_VERSION_CHECK_SECONDS))
+        if check_interval > 0 and now - self._last_version_check >= check_interval:
+            self._last_version_check = now
+            version, _ = self._read_version()
+            if version is not None and version != snapshot.version:
+                return True
+        return False
+
+    def _load(self) -> _CatalogSnapshot:
+        with self._load_lock:
+            # Another thread may have reloaded while we waited for the lock.
+            snapshot = self._snapshot
+            if snapshot is not None and not self._is_stale(snapshot):
+                return snapshot
+
+            # Read the version before the plans so a concurrent bump is never lost.
+            preference = self._catalog_read_preference()
+            with mongo_options.causal_session(Plan._get_db().client, preference) as session:
+                version, changed_at = self._read_version(session)
+                docs = (Plan._get_collection().with_options(read_preference=preference)
+                        .find({}, session=session)
+                        .sort('name', 1))
+                plans = [Plan._from_son(doc) for doc in docs]
+            snapshot = _CatalogSnapshot(plans, version, changed_at)
+            self._snapshot = snapshot
+            self._last_version_check = time.monotonic()
+            self.loads += 1
+            metrics.PLAN_CACHE_LOADS.inc()
+            return snapshot
+
+    def _current(self) -> tuple[_CatalogSnapshot, bool]:
+        """Returns (snapshot, was_fresh)."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_stale(snapshot):
+            return snapshot, True
+        return self._load(), False
+
+    def _count(self, fresh: bool, lookups: int = 1) -> None:
+        """Counts `lookups` served from a fresh snapshot (hits) or needing a load or query (misses)."""
+        if not lookups:
+            return
+        if fresh:
+            self.hits += lookups
+        else:
+            self.misses += lookups
+        metrics.PLAN_CACHE_LOOKUPS.inc(lookups, result='hit' if fresh else 'miss')
+
+    # --- Public API ---
+
+    def get_all(self) -> list[Plan]:
+        """Returns all plans ordered by name."""
+        if not self.enabled():
+            return list(Plan.objects.read_preference(self._catalog_read_preference()).order_by('name'))
+
+        snapshot, fresh = self._current()
+        self._count(fresh)
+        return list(snapshot.ordered)
+
+    def get(self, plan_id) -> Plan | None:
+        """Returns the plan with the given id, or None if it does not exist."""
+        if not ObjectId.is_valid(plan_id):
+            return None
+        if not self.enabled():
+            return Plan.objects(id=plan_id).first()
+
+        snapshot, fresh = self._current()
+        plan = snapshot.by_id.get(str(plan_id))
+        if plan is not None:
+            self._count(fresh)
+            return plan
+
+        # Not in the catalog we hold: it may have been created by another
+        # worker since our last load. Fall back to the database once.
+        self._count(False)
+        plan = Plan.objects(id=plan_id).first()
+        if plan is not None:
+            self.invalidate(bump_version=False)
+        return plan
+
+    def get_many(self, plan_ids) -> dict[str, Plan]:
+        """
+        Resolves several plan ids at once, keyed by str(id). Ids not in the
+        cached catalog are fetched with a single $in query; ids that do not
+        exist are omitted.
+        """
+        wanted = {str(pid) for pid in plan_ids if pid is not None and ObjectId.is_valid(pid)}
+        if not wanted:
+            return {}
+        if not self.enabled():
+            return {str(plan.id): plan for plan in Plan.objects(id__in=list(wanted))}
+
+        snapshot, fresh = self._current()
+        resolved = {}
+        missing = []
+        for plan_id in wanted:
+            plan = snapshot.by_id.get(plan_id)
+            if plan is None:
+                missing.append(plan_id)
+            else:
+                resolved[plan_id] = plan
+        self._count(fresh, len(resolved))
+
+        if missing:
+            self._count(False, len(missing))
+            found = list(Plan.objects(id__in=missing))
+            for plan in found:
+                resolved[str(plan.id)] = plan
+            if found:
+                self.invalidate(bump_version=False)
+        return resolved
+
+    def get_all_payloads(self) -> list[dict]:
+        """Serialized PlanResponse payloads for all plans, ordered by name."""
+        if not self.enabled():
+            return [PlanReadModel.from_document(plan).to_dict() for plan in self.get_all()]
+
+        snapshot, fresh = self._current()
+        self._count(fresh)
+        return [snapshot.payloads[str(plan.id)] for plan in snapshot.ordered]
+
+    def get_all_payloads_with_validators(self) -> tuple[list[dict], Validators]:
+        """get_all_payloads() and the HTTP validators of the same catalog snapshot."""
+        if not self.enabled():
+            # Without the cache, validators come from the plans just read.
+            plans = self.get_all()
+            version, changed_at = self._read_version()
+            return ([PlanReadModel.from_document(plan).to_dict() for plan in plans],
+                    catalog_validators(((plan.id, plan.updated_at) for plan in plans), version, changed_at))
+
+        snapshot, fresh = self._current()
+        self._count(fresh)
+        return [snapshot.payloads[str(plan.id)] for plan in snapshot.ordered], snapshot.validators
+
+    def get_payload_with_validators(self, plan_id) -> tuple[dict | None, Validators | None]:
+        """get_payload() and the plan's HTTP validators; (None, None) if it does not exist."""
+        plan = self.get(plan_id)
+        if plan is None:
+            return None, None
+        snapshot = self._snapshot
+        if snapshot is not None and str(plan.id) in snapshot.payloads:
+            return snapshot.payloads[str(plan.id)], snapshot.plan_validators[str(plan.id)]
+        return PlanReadModel.from_document(plan).to_dict(), plan_validators(plan.id, plan.updated_at)
+
+    def get_payload(self, plan_id) -> dict | None:
+        """Serialized PlanResponse payload for one plan, or None if it does not exist."""
+        plan = self.get(plan_id)
+        if plan is None:
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None:
+            payload = snapshot.payloads.get(str(plan.id))
+            if payload is not None:
+                return payload
+        return PlanReadModel.from_document(plan).to_dict()
+
+    def invalidate(self, bump_version: bool = True) -> None:
+        """Drops the local catalog and, optionally, signals other workers."""
+        self._snapshot = None
+        self.invalidations += 1
+        if bump_version:
+            self.bump_version()
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'loads': self.loads,
+            'invalidations': self.invalidations,
+            'size': len(snapshot.ordered) if snapshot else 0,
+            'version': snapshot.version if snapshot else None,
+            'age_seconds': round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None,
+        }
+
+
+plan_cache = PlanCache()
+
+
+def _on_plan_changed(sender, document, **kwargs):
+    plan_cache.invalidate()
+
+
+signals.post_save.connect(_on_plan_changed, sender=Plan)
+signals.post_delete.connect(_on_plan_changed, sender=Plan)
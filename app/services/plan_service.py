@@ -1,12 +1,14 @@
 from app.models.plan import Plan
 from app.schemas.plan_schemas import PlanCreate, PlanUpdate # Not used yet but defined
+from app.services.plan_cache import plan_cache
+from app.utils.http_caching import Validators
 from mongoengine.errors import NotUniqueError, ValidationError, DoesNotExist
 
 class PlanService:
     @staticmethod
     def get_all_plans() -> list[Plan]:
         try:
-            return list(Plan.objects.all().order_by('name'))
+            return plan_cache.get_all()
         except Exception as e:
             print(f"Error fetching all plans: {e}")
             return []
@@ -14,11 +16,57 @@ class PlanService:
     @staticmethod
     def get_plan_by_id(plan_id: str) -> Plan | None:
         try:
-            return Plan.objects.get(id=plan_id)
+            return plan_cache.get(plan_id)
         except (DoesNotExist, ValidationError):
             return None
         except Exception as e:
             print(f"Error fetching plan by ID {plan_id}: {e}")
             return None
+
+    @staticmethod
+    def get_plans_by_ids(plan_ids) -> dict[str, Plan]:
+        """Batch resolver: maps str(plan_id) -> Plan for every id that exists, in at most one query."""
+        try:
+            return plan_cache.get_many(plan_ids)
+        except Exception as e:
+            print(f"Error fetching plans by IDs: {e}")
+            return {}
+
+    @staticmethod
+    def get_all_plan_payloads() -> list[dict]:
+        """Same as get_all_plans, already serialized as PlanResponse JSON payloads."""
+        try:
+            return plan_cache.get_all_payloads()
+        except Exception as e:
+            print(f"Error fetching all plans: {e}")
+            return []
+
+    @staticmethod
+    def get_plan_payload(plan_id: str) -> dict | None:
+        """Same as get_plan_by_id, already serialized as a PlanResponse JSON payload."""
+        try:
+            return plan_cache.get_payload(plan_id)
+        except (DoesNotExist, ValidationError):
+            return None
+        except Exception as e:
+            print(f"Error fetching plan by ID {plan_id}: {e}")
+            return None
+
+    @staticmethod
+    def get_all_plan_payloads_with_validators() -> tuple[list[dict], Validators]:
+        """All plan payloads and their catalog's ETag/Last-Modified validators."""
+        return plan_cache.get_all_payloads_with_validators()
+
+    @staticmethod
+    def get_plan_payload_with_validators(plan_id: str) -> tuple[dict | None, Validators | None]:
+        """One plan payload and its ETag/Last-Modified validators; (None, None) if not found."""
+        try:
+            return plan_cache.get_payload_with_validators(plan_id)
+        except (DoesNotExist, ValidationError):
+            return None, None
+
+    @staticmethod
+    def get_cache_stats() -> dict:
+        return plan_cache.stats()
     
     # ... (create_plan, update_plan, delete_plan methods from before, if you included them)
\ No newline at end of file
@@ -0,0 +1,356 @@
+"""
+Read-through cache of GET /subscriptions/<user_id> responses.
+
+Each entry is one user's serialized SubscriptionResponse payload (or the
+fact that the user has none), keyed by user_id. An entry lives for
+SUBSCRIPTION_CACHE_TTL_SECONDS, and never past the subscription's end_date,
+when the pure read starts reporting an ACTIVE subscription as EXPIRED.
+
+Backends (SUBSCRIPTION_CACHE_BACKEND):
+- 'local': a bounded in-process LRU. Every worker process has its own, so a
+  change made through another worker shows up when the entry expires.
+- 'redis': any Redis-protocol server, shared by every worker. Needs the
+  optional `redis` package; `RedisBackend` takes any client with the
+  redis-py interface, e.g. a fakeredis client in tests.
+
+Writers keep it current: create, upgrade and cancel re-read the user's
+payload after their change commits and overwrite the entry (write-through);
+bulk imports and the expiration job drop the entries of the users they
+touched. Reads only ever fill an empty entry (SET NX), so a read that
+started before a change cannot overwrite the newer payload written by it.
+
+Stampedes on a popular key are prevented twice: within a process, threads
+that miss the same key wait for the first one's load; with Redis, the
+loader holds a short lock key (SUBSCRIPTION_CACHE_LOCK_SECONDS) and other
+processes poll for its result instead of querying MongoDB themselves.
+
+The cache is best effort: a backend error is logged and the request is
+answered from MongoDB.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable
+
+from app.core import metrics
+from app.core.json_encoding import orjson
+
+try:
+    import redis
+except ImportError:  # Optional: only the 'redis' backend needs it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'subscription:v1:'
+LOCK_SUFFIX = ':lock'
+_LOCK_POLL_SECONDS = 0.025
+
+
+def encode_payload(payload: dict | None) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def decode_payload(value: bytes) -> dict | None:
+    return orjson.loads(value) if orjson is not None else json.loads(value)
+
+
+def _parse_end_date(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def entry_ttl(payload: dict | None, max_ttl: float, now: datetime) -> float:
+    """max_ttl, cut short at the subscription's end_date while that is in the future."""
+    end_date = _parse_end_date(payload.get('end_date')) if payload else None
+    if end_date is not None and end_date > now:
+        return min(max_ttl, (end_date - now).total_seconds())
+    return max_ttl
+
+
+class LocalBackend:
+    """Bounded in-process LRU with per-entry expiry."""
+    shared = False
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _live(self, key: str, now: float) -> bytes | None:
+        # Caller holds the lock.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def _store(self, key: str, value: bytes, ttl: float, now: float) -> None:
+        # Caller holds the lock.
+        self._entries[key] = (value, now + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._live(key, time.monotonic())
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Stores `value` only if `key` holds no live entry; True if it did."""
+        with self._lock:
+            now = time.monotonic()
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, value, ttl, now)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def release(self, key: str, token: bytes) -> None:
+        with self._lock:
+            if self._live(key, time.monotonic()) == token:
+                del self._entries[key]
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entries in a Redis-protocol server, shared by every process using it."""
+    shared = True
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, timeout_seconds: float = 0.5) -> 'RedisBackend':
+        if redis is None:
+            raise RuntimeError("SUBSCRIPTION_CACHE_BACKEND=redis needs the 'redis' package (pip install redis).")
+        return cls(redis.Redis.from_url(url, socket_timeout=timeout_seconds, socket_connect_timeout=timeout_seconds))
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+    def release(self, key: str, token: bytes) -> None:
+        # Best effort: the lock may have expired and been taken over in between.
+        if self.client.get(key) == token:
+            self.client.delete(key)
+
+    def size(self) -> int | None:
+        return None
+
+
+class SubscriptionCache:
+    """See the module docstring. Disabled until configure() picks a backend."""
+
+    DEFAULT_TTL_SECONDS = 60.0
+    DEFAULT_LOCK_SECONDS = 2.0
+
+    def __init__(self):
+        self.backend = None
+        self.ttl_seconds = self.DEFAULT_TTL_SECONDS
+        self.lock_seconds = self.DEFAULT_LOCK_SECONDS
+        self._flights: dict[str, threading.Event] = {}
+        self._flights_lock = threading.Lock()
+        # Counters are best-effort (unsynchronised increments).
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def configure(self, config, backend=None) -> None:
+        """
+        Builds the backend named by SUBSCRIPTION_CACHE_BACKEND, or uses
+        `backend` if given. An unknown name or an empty one disables the cache.
+        """
+        self.ttl_seconds = float(config.get('SUBSCRIPTION_CACHE_TTL_SECONDS', self.DEFAULT_TTL_SECONDS))
+        self.lock_seconds = float(config.get('SUBSCRIPTION_CACHE_LOCK_SECONDS', self.DEFAULT_LOCK_SECONDS))
+        if backend is None:
+            name = (config.get('SUBSCRIPTION_CACHE_BACKEND') or '').lower()
+            if name == 'local':
+                backend = LocalBackend(int(config.get('SUBSCRIPTION_CACHE_MAX_SIZE', 100000)))
+            elif name == 'redis':
+                backend = RedisBackend.from_url(config.get('SUBSCRIPTION_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+            elif name not in ('', 'none'):
+                logger.warning(f"Unknown SUBSCRIPTION_CACHE_BACKEND '{name}'; subscription cache disabled.")
+        self.backend = backend
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"{KEY_PREFIX}{user_id}"
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        metrics.SUBSCRIPTION_CACHE_LOOKUPS.inc(result='error')
+        logger.warning(f"Subscription cache {action} failed: {error}")
+
+    def _cached(self, key: str) -> tuple[bool, dict | None]:
+        """(found, payload); a backend error counts as not found."""
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self._failed('read', e)
+            return False, None
+        if value is None:
+            return False, None
+        return True, decode_payload(value)
+
+    def _fill(self, key: str, payload: dict | None, overwrite: bool = False) -> None:
+        ttl = entry_ttl(payload, self.ttl_seconds, datetime.now(timezone.utc))
+        if ttl <= 0:
+            return
+        try:
+            if overwrite:
+                self.backend.set(key, encode_payload(payload), ttl)
+            else:
+                self.backend.add(key, encode_payload(payload), ttl)
+        except Exception as e:
+            self._failed('write', e)
+
+    def get_or_load(self, user_id: str, loader: Callable[[], dict | None]) -> dict | None:
+        """The user's payload from the cache, or from `loader()` on a miss (which then fills the cache)."""
+        if self.backend is None:
+            return loader()
+        key = self.key(user_id)
+        found, payload = self._cached(key)
+        if found:
+            self.hits += 1
+            metrics.SUBSCRIPTION_CACHE_LOOKUPS.inc(result='hit')
+            return payload
+
+        # Single flight within this process: the first thread to miss loads,
+        # the others wait for it and read what it stored.
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+        if not leader:
+            flight.wait(self.lock_seconds)
+            found, payload = self._cached(key)
+            if found:
+                self.coalesced += 1
+                metrics.SUBSCRIPTION_CACHE_LOOKUPS.inc(result='coalesced')
+                return payload
+            self.misses += 1
+            metrics.SUBSCRIPTION_CACHE_LOOKUPS.inc(result='miss')
+            return loader()
+
+        try:
+            self.misses += 1
+            metrics.SUBSCRIPTION_CACHE_LOOKUPS.inc(result='miss')
+            return self._load(key, loader)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.set()
+
+    def _load(self, key: str, loader: Callable[[], dict | None]) -> dict | None:
+        lock_key = key + LOCK_SUFFIX
+        token = None
+        if self.backend.shared:
+            # Across processes: only the holder of the lock key loads; the
+            # others poll for its result until the lock would have expired.
+            token = uuid.uuid4().hex.encode('ascii')
+            try:
+                locked = self.backend.add(lock_key, token, self.lock_seconds)
+            except Exception as e:
+                self._failed('lock', e)
+                locked = False
+                token = None
+            if token is not None and not locked:
+                token = None
+                deadline = time.monotonic() + self.lock_seconds
+                while time.monotonic() < deadline:
+                    time.sleep(_LOCK_POLL_SECONDS)
+                    found, payload = self._cached(key)
+                    if found:
+                        return payload
+        try:
+            payload = loader()
+            self._fill(key, payload)
+            return payload
+        finally:
+            if token is not None:
+                try:
+                    self.backend.release(lock_key, token)
+                except Exception as e:
+                    self._failed('unlock', e)
+
+    def refresh(self, user_id: str, loader: Callable[[], dict | None]) -> None:
+        """
+        Write-through after a change to the user's subscriptions: overwrites
+        the entry with `loader()`. Drops the entry instead if loading fails.
+        """
+        if self.backend is None:
+            return
+        try:
+            payload = loader()
+        except Exception as e:
+            logger.warning(f"Could not refresh the cached subscription of user {user_id}: {e}")
+            self.invalidate(user_id)
+            return
+        self._fill(self.key(user_id), payload, overwrite=True)
+
+    def invalidate(self, *user_ids: str) -> None:
+        if self.backend is None or not user_ids:
+            return
+        try:
+            self.backend.delete(*(self.key(user_id) for user_id in user_ids))
+        except Exception as e:
+            self._failed('invalidation', e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "size": self.backend.size() if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+subscription_cache = SubscriptionCache()
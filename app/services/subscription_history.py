@@ -0,0 +1,144 @@
+"""
+Keyset pagination over a user's subscription history.
+
+Pages are ordered newest end_date first, with _id breaking ties, and every
+page continues strictly after the last (end_date, _id) of the previous one.
+With the (user_id, -end_date, -_id) index each page reads at most limit + 1
+index entries and documents, however deep into the history it is. The
+cursor handed to clients is that position, base64url-encoded; it is opaque
+to them and not signed, since it can only move within the caller's own
+history.
+
+Shared by SubscriptionService and AsyncSubscriptionService, which only
+differ in how they run the query and resolve plans.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.schemas.read_models import SubscriptionReadModel
+from app.utils.enums import SubscriptionStatus
+
+HISTORY_SORT = [('end_date', -1), ('_id', -1)]
+
+# Response fields that can be selected with ?fields=, in SubscriptionResponse order
+HISTORY_FIELDS = ('id', 'user_id', 'plan', 'start_date', 'end_date', 'status', 'created_at', 'updated_at')
+
+# Stored fields each response field is built from ('id' is always returned by Mongo)
+_FIELD_SOURCES = {
+    'id': (),
+    'user_id': ('user_id',),
+    'plan': ('plan', 'plan_snapshot'),
+    'start_date': ('start_date',),
+    'end_date': ('end_date',),
+    'status': ('status', 'end_date'),  # end_date decides an overdue ACTIVE status
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    # Mongo stores milliseconds in UTC; the driver returns naive datetimes.
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def encode_cursor(end_date: datetime, subscription_id) -> str:
+    millis = (_naive_utc(end_date) - _EPOCH) // timedelta(milliseconds=1)
+    raw = json.dumps([millis, str(subscription_id)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    """(end_date, _id) of the last item of the previous page. ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        millis, subscription_id = json.loads(raw)
+        return _EPOCH + timedelta(milliseconds=int(millis)), ObjectId(subscription_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId, OverflowError):
+        raise ValueError("Invalid cursor.")
+
+
+def parse_limit(value: str | None, default: int, maximum: int) -> int:
+    """Page size from ?limit=, capped at `maximum`. ValueError if not a positive integer."""
+    if value in (None, ''):
+        return min(default, maximum)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be a positive integer.")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer.")
+    return min(limit, maximum)
+
+
+def parse_fields(value: str | None) -> tuple[str, ...] | None:
+    """Fields selected with ?fields=a,b (None = all). ValueError on unknown names."""
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in _FIELD_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(HISTORY_FIELDS)}.")
+    return fields or None
+
+
+def history_query(user_id: str, after: tuple[datetime, ObjectId] | None = None) -> dict:
+    if after is None:
+        return {'user_id': user_id}
+    end_date, subscription_id = after
+    # Each branch is one bounded range on the index, merged in sort order.
+    return {'user_id': user_id, '$or': [
+        {'end_date': {'$lt': end_date}},
+        {'end_date': end_date, '_id': {'$lt': subscription_id}},
+    ]}
+
+
+def history_projection(fields: tuple[str, ...] | None) -> dict:
+    if fields is None:
+        return SubscriptionReadModel.PROJECTION
+    # end_date is always needed for the next cursor
+    projection = {'end_date': 1}
+    for name in fields:
+        projection.update(dict.fromkeys(_FIELD_SOURCES[name], 1))
+    return projection
+
+
+def legacy_plan_ids(docs: list[dict], fields: tuple[str, ...] | None) -> list:
+    """Plan ids that must be looked up: documents without a plan snapshot, when 'plan' is selected."""
+    if fields is not None and 'plan' not in fields:
+        return []
+    return list(dict.fromkeys(doc.get('plan') for doc in docs if not doc.get('plan_snapshot')))
+
+
+def build_page(docs: list[dict], limit: int, fields: tuple[str, ...] | None, plan_payload_for,
+               now: datetime | None = None) -> dict:
+    """
+    `docs` is the result of the query with limit + 1; the extra document only
+    signals that another page exists. `plan_payload_for(doc)` returns the plan
+    payload of one document. An overdue ACTIVE subscription is reported as
+    EXPIRED, as in the pure-read GET.
+    """
+    now = now or datetime.now(timezone.utc)
+    page = docs[:limit]
+    include_plan = fields is None or 'plan' in fields
+    items = []
+    for doc in page:
+        status = doc.get('status')
+        end_date = doc.get('end_date')
+        overdue = (status == SubscriptionStatus.ACTIVE.value and end_date is not None
+                   and end_date.replace(tzinfo=end_date.tzinfo or timezone.utc) < now)
+        plan_payload = plan_payload_for(doc) if include_plan else None
+        payload = SubscriptionReadModel.from_raw(
+            doc, plan_payload, status=SubscriptionStatus.EXPIRED.value if overdue else None).to_dict()
+        items.append(payload if fields is None else {name: payload[name] for name in fields})
+
+    next_cursor = None
+    if len(docs) > limit and page:
+        next_cursor = encode_cursor(page[-1]['end_date'], page[-1]['_id'])
+    return {'items': items, 'limit': limit, 'next_cursor': next_cursor}
@@ -1,128 +1,333 @@
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
 from flask import current_app  # 👈 Added for logging
-from mongoengine.errors import DoesNotExist, NotUniqueError, ValidationError
-from tenacity import retry, stop_after_attempt, wait_fixed
+from mongoengine.errors import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_fixed
 
+from app.core import metrics
+from app.core.mongo_options import read_preference, status_write_concern
+from app.models.plan import PlanSnapshot
 from app.models.subscription import Subscription
-from app.models.plan import Plan
-from app.utils.enums import SubscriptionStatus
+from app.services.analytics_service import AnalyticsService
+from app.services.plan_service import PlanService
+from app.services.expiration_service import ExpirationService, ExpirationRunResult
+from app.services.expiration_scheduler import expiration_scheduler
+from app.services.lease_service import expiration_lease
+from app.services.outbox_service import OutboxService, event_record
+from app.services.subscription_cache import subscription_cache
+from app.services import subscription_history
+from app.utils.enums import SubscriptionEventType, SubscriptionStatus
 from app.schemas.subscription_schemas import SubscriptionCreateInternal, SubscriptionUpdateRequest
+from app.schemas.read_models import PlanReadModel, SubscriptionReadModel
+
+
+# Retry transient database failures only; ValueErrors are business-rule
+# rejections that the API maps to 4xx responses.
+_retry_transient = retry(
+    retry=retry_if_not_exception_type(ValueError),
+    stop=stop_after_attempt(3),
+    wait=wait_fixed(1),
+    reraise=True,
+)
 
 
 class SubscriptionService:
 
+    @staticmethod
+    def _status_writes():
+        """The subscriptions collection with the status write concern (MONGO_STATUS_WRITE_CONCERN)."""
+        return Subscription._get_collection().with_options(write_concern=status_write_concern(current_app.config))
+
     @staticmethod
     def _get_active_subscription_for_user(user_id: str) -> Subscription | None:
         """Fetches the active subscription for a user, if any."""
         return Subscription.objects(user_id=user_id, status=SubscriptionStatus.ACTIVE).first()
 
     @staticmethod
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    @_retry_transient
     def create_subscription(subscription_data: SubscriptionCreateInternal) -> Subscription:
-        """Creates a new subscription for a user with validation and logging."""
+        """
+        Creates a new subscription for a user with validation and logging.
+
+        "One ACTIVE subscription per user" is enforced by the partial unique
+        index on user_id, so creation is a single insert: a duplicate key
+        means the user already has an active subscription, even when two
+        requests race. The insert and its outbox event share a transaction
+        (see app/services/outbox_service.py).
+        """
         user_id = subscription_data.user_id
         plan_id = subscription_data.plan_id
 
         current_app.logger.info(f"Attempting to create subscription for user {user_id} with plan_id {plan_id} (type: {type(plan_id)})")
 
-        existing_active_sub = SubscriptionService._get_active_subscription_for_user(user_id)
-        if existing_active_sub:
-            err_msg = "User already has an active subscription."
-            current_app.logger.error(f"Create subscription error for user {user_id}: {err_msg}")
-            raise ValueError(err_msg)
-
         try:
-            plan = Plan.objects.get(id=plan_id)
-            current_app.logger.info(f"Found plan: {plan.name} for plan_id {plan_id}")
-        except (DoesNotExist, ValidationError) as e:
-            err_msg = f"Plan with ID {plan_id} not found or invalid. MongoEngine error: {str(e)}"
-            current_app.logger.error(f"Create subscription error for user {user_id}: {err_msg}")
-            raise ValueError(err_msg)
+            plan = PlanService.get_plan_by_id(plan_id)
         except Exception as e:
             err_msg = f"Unexpected error fetching plan {plan_id}: {str(e)}"
             current_app.logger.error(f"Create subscription error for user {user_id}: {err_msg}")
             raise ValueError(err_msg)
+        if plan is None:
+            err_msg = f"Plan with ID {plan_id} not found or invalid."
+            current_app.logger.error(f"Create subscription error for user {user_id}: {err_msg}")
+            raise ValueError(err_msg)
+        current_app.logger.info(f"Found plan: {plan.name} for plan_id {plan_id}")
 
+        now = datetime.now(timezone.utc)
         new_sub = Subscription(
             user_id=user_id,
-            plan=plan,
-            start_date=datetime.now(timezone.utc),
-            status=SubscriptionStatus.ACTIVE
+            start_date=now,
+            status=SubscriptionStatus.ACTIVE,
+            created_at=now,
+            updated_at=now,
         )
+        new_sub.set_plan(plan)
         new_sub._calculate_end_date()
-        current_app.logger.info(f"New subscription object created (before save): user_id={new_sub.user_id}, plan_id={new_sub.plan.id}, end_date={new_sub.end_date}")
+        current_app.logger.info(f"New subscription object created (before save): user_id={new_sub.user_id}, plan_id={new_sub.plan_id}, end_date={new_sub.end_date}")
+
+        def insert(session):
+            doc = new_sub.to_mongo().to_dict()
+            SubscriptionService._status_writes().insert_one(doc, session=session)  # Sets doc['_id']
+            return doc, [event_record(SubscriptionEventType.CREATED, doc, now)]
 
         try:
-            new_sub.save()
+            new_sub.validate()
+            doc = OutboxService.run(insert)
+            new_sub.id = doc['_id']
             current_app.logger.info(f"Subscription saved successfully: id={new_sub.id}")
+            expiration_scheduler.notify_deadline(new_sub.end_date)
+            AnalyticsService.record_started([doc], now)
+            SubscriptionService._refresh_cached_payload(user_id)
             return new_sub
-        except (NotUniqueError, ValidationError) as e:
+        except DuplicateKeyError:
+            err_msg = "User already has an active subscription."
+            current_app.logger.error(f"Create subscription error for user {user_id}: {err_msg}")
+            raise ValueError(err_msg)
+        except ValidationError as e:
             err_msg = f"Database error (NotUnique/Validation) creating subscription: {str(e)}"
             current_app.logger.error(f"Create subscription error for user {user_id} during save: {err_msg}")
             raise ValueError(err_msg)
         except Exception as e:
+            # Not a business-rule rejection: let it propagate so it is retried
+            # and, if it persists, surfaces as a 500.
             err_msg = f"Unexpected error creating subscription during save: {str(e)}"
             current_app.logger.error(f"Create subscription error for user {user_id} during save: {err_msg}")
-            raise ValueError(err_msg)
+            raise
 
     @staticmethod
     def get_subscription_details_for_user(user_id: str) -> Subscription | None:
-        """Returns the active or most recent subscription after checking expiration."""
+        """
+        Returns the active or most recent subscription for a user, expiring
+        an overdue ACTIVE one first. Used when SUBSCRIPTION_PURE_READS is off;
+        the pure read is get_subscription_payload_for_user.
+        """
         SubscriptionService.check_and_expire_user_subscription(user_id)
         active_sub = SubscriptionService._get_active_subscription_for_user(user_id)
         return active_sub or Subscription.objects(user_id=user_id).order_by('-end_date').first()
 
     @staticmethod
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    def _is_past(moment: datetime, now: datetime) -> bool:
+        """Compares datetimes that may be naive (UTC, as read from Mongo) or aware."""
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment < now
+
+    @staticmethod
+    def _needs_active_lookup(latest: dict | None) -> bool:
+        """
+        Whether the user's ACTIVE subscription must be read separately from
+        `latest`, their subscription with the newest end_date. Not when
+        `latest` is ACTIVE itself: the partial unique index allows one ACTIVE
+        subscription per user.
+        """
+        return latest is not None and latest.get('status') != SubscriptionStatus.ACTIVE
+
+    @staticmethod
+    def _pick_current(latest: dict | None, active: dict | None, now: datetime) -> tuple[dict | None, bool]:
+        """
+        Read-only equivalent of "expire if due, then active or latest", from
+        the newest-end_date document and the ACTIVE one (either may be None).
+        The second return value is True when the returned document is ACTIVE
+        but overdue, i.e. its effective status is EXPIRED.
+        """
+        if active is not None and not SubscriptionService._is_past(active['end_date'], now):
+            return active, False
+        if latest is None:
+            return None, False
+        return latest, latest.get('status') == SubscriptionStatus.ACTIVE
+
+    @staticmethod
+    def get_subscription_payload_for_user(user_id: str) -> dict | None:
+        """
+        Pure read for GET /subscriptions/<user_id> (SUBSCRIPTION_PURE_READS).
+
+        Never writes: an ACTIVE subscription past its end_date is reported as
+        EXPIRED and left for the expiration job to persist. Reads projected
+        raw documents and returns the SubscriptionResponse JSON payload
+        directly, with the plan payload taken from the plan cache.
+        Served from the subscription cache when one is configured (see
+        app/services/subscription_cache.py).
+        """
+        return subscription_cache.get_or_load(
+            user_id, lambda: SubscriptionService._load_subscription_payload(user_id))
+
+    @staticmethod
+    def _load_subscription_payload(user_id: str) -> dict | None:
+        # At most two indexed single-document reads, whatever the history length.
+        collection = Subscription._get_collection()
+        latest = collection.find_one({'user_id': user_id}, SubscriptionReadModel.PROJECTION,
+                                     sort=[('end_date', -1)])
+        active = latest
+        if SubscriptionService._needs_active_lookup(latest):
+            active = collection.find_one({'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value},
+                                         SubscriptionReadModel.PROJECTION)
+        doc, overdue = SubscriptionService._pick_current(latest, active, datetime.now(timezone.utc))
+        if doc is None:
+            return None
+
+        plan_payload = SubscriptionService._plan_payload(doc.get('plan_snapshot'), doc.get('plan'))
+        status = SubscriptionStatus.EXPIRED.value if overdue else None
+        return SubscriptionReadModel.from_raw(doc, plan_payload, status=status).to_dict()
+
+    @staticmethod
+    def _refresh_cached_payload(user_id: str) -> None:
+        """Write-through of the user's cached payload once a change has committed."""
+        subscription_cache.refresh(user_id, lambda: SubscriptionService._load_subscription_payload(user_id))
+
+    @staticmethod
+    def get_subscription_history(user_id: str, limit: int, cursor: str | None = None,
+                                 fields: tuple[str, ...] | None = None) -> dict:
+        """
+        One page of a user's subscriptions, newest end_date first:
+        {'items': [...], 'limit': n, 'next_cursor': str | None}.
+
+        Keyset-paginated (see app/services/subscription_history.py), so every
+        page costs O(limit) whatever its depth. `fields` restricts the payload
+        keys and the Mongo projection. Plans of documents without a snapshot
+        are resolved in one batch per page. Pages are read with the history
+        read preference (MONGO_HISTORY_READ_PREFERENCE), so they may lag
+        recent changes by up to MONGO_MAX_STALENESS_SECONDS.
+        """
+        after = subscription_history.decode_cursor(cursor) if cursor else None
+        history = Subscription._get_collection().with_options(
+            read_preference=read_preference(current_app.config, 'history'))
+        docs = list(history
+                    .find(subscription_history.history_query(user_id, after),
+                          subscription_history.history_projection(fields))
+                    .sort(subscription_history.HISTORY_SORT)
+                    .limit(limit + 1))
+
+        legacy_ids = subscription_history.legacy_plan_ids(docs[:limit], fields)
+        plans = PlanService.get_plans_by_ids(legacy_ids) if legacy_ids else {}
+
+        def plan_payload_for(doc):
+            if doc.get('plan_snapshot'):
+                return PlanReadModel.from_snapshot(doc['plan_snapshot']).to_dict()
+            plan = plans.get(str(doc.get('plan')))
+            if plan is None:
+                raise ValueError(f"Plan {doc.get('plan')} referenced by subscription {doc['_id']} not found.")
+            return PlanReadModel.from_document(plan).to_dict()
+
+        return subscription_history.build_page(docs, limit, fields, plan_payload_for)
+
+    @staticmethod
+    def _plan_payload(snapshot, plan_id) -> dict:
+        """Plan payload from the embedded snapshot, falling back to the plan cache for legacy documents."""
+        if snapshot:
+            return PlanReadModel.from_snapshot(snapshot).to_dict()
+        plan_payload = PlanService.get_plan_payload(plan_id)
+        if plan_payload is None:
+            raise ValueError(f"Plan {plan_id} referenced by subscription not found.")
+        return plan_payload
+
+    @staticmethod
+    def to_payload(subscription: Subscription) -> dict:
+        """Serializes a Subscription to its SubscriptionResponse JSON payload without dereferencing its plan."""
+        plan_payload = SubscriptionService._plan_payload(subscription.plan_snapshot, subscription.plan_id)
+        return SubscriptionReadModel.from_document(subscription, plan_payload).to_dict()
+
+    @staticmethod
+    @_retry_transient
     def update_user_subscription(user_id: str, update_data: SubscriptionUpdateRequest) -> Subscription:
-        """Updates an active subscription to a new plan."""
-        active_sub = SubscriptionService._get_active_subscription_for_user(user_id)
-        if not active_sub:
-            raise ValueError("No active subscription found to update.")
+        """
+        Updates an active subscription to a new plan with a single
+        find_one_and_update. The extra lookup to pick an error message only
+        happens when the update matched nothing.
 
+        The update returns the document as it was before, which the analytics
+        rollups and the outbox event need for the old plan; the new values are
+        then applied in memory.
+        """
         new_plan_id = update_data.plan_id
-        if active_sub.plan.id == new_plan_id:
-            raise ValueError("User is already subscribed to this plan.")
-
-        try:
-            new_plan = Plan.objects.get(id=new_plan_id)
-        except (DoesNotExist, ValidationError):
+        new_plan = PlanService.get_plan_by_id(new_plan_id)
+        if new_plan is None:
             raise ValueError(f"New plan with ID {new_plan_id} not found or invalid.")
 
-        active_sub.plan = new_plan
-        active_sub.start_date = datetime.now(timezone.utc)
-        active_sub.status = SubscriptionStatus.ACTIVE
-        active_sub._calculate_end_date()
+        now = datetime.now(timezone.utc)
+        new_values = {
+            'plan': new_plan.id,
+            'plan_snapshot': PlanSnapshot.from_plan(new_plan).to_mongo().to_dict(),
+            'start_date': now,
+            'end_date': now + timedelta(days=new_plan.duration_days),
+            'updated_at': now,
+        }
+
+        def upgrade(session):
+            before = SubscriptionService._status_writes().find_one_and_update(
+                {'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value, 'plan': {'$ne': new_plan.id}},
+                {'$set': new_values},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return None, []
+            after = dict(before, **new_values)
+            return (before, after), [event_record(SubscriptionEventType.UPGRADED, after, now, previous=before)]
 
         try:
-            active_sub.save()
-            return active_sub
-        except (NotUniqueError, ValidationError) as e:
+            changed = OutboxService.run(upgrade)
+        except DuplicateKeyError as e:
             raise ValueError(f"Database error updating subscription: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Unexpected error updating subscription: {str(e)}")
+
+        if changed is None:
+            if SubscriptionService._get_active_subscription_for_user(user_id):
+                raise ValueError("User is already subscribed to this plan.")
+            raise ValueError("No active subscription found to update.")
+        before, after = changed
+        updated_sub = Subscription._from_son(after)
+        expiration_scheduler.notify_deadline(updated_sub.end_date)
+        AnalyticsService.record_upgrade(before, after, now)
+        SubscriptionService._refresh_cached_payload(user_id)
+        return updated_sub
 
     @staticmethod
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    @_retry_transient
     def cancel_user_subscription(user_id: str) -> Subscription:
-        """Cancels a user's active subscription, allowing it to expire naturally."""
-        active_sub = SubscriptionService._get_active_subscription_for_user(user_id)
-        if not active_sub:
-            raise ValueError("No active subscription found to cancel.")
-
-        if active_sub.status == SubscriptionStatus.CANCELLED:
-            raise ValueError("Subscription is already cancelled.")
-
-        if active_sub.status == SubscriptionStatus.EXPIRED:
-            raise ValueError("Cannot cancel an already expired subscription.")
+        """
+        Cancels a user's active subscription, allowing it to expire naturally.
+        Only ACTIVE subscriptions match, so cancelling twice (or cancelling an
+        expired subscription) reports that no active subscription was found.
+        """
+        now = datetime.now(timezone.utc)
 
-        active_sub.status = SubscriptionStatus.CANCELLED
+        def cancel(session):
+            doc = SubscriptionService._status_writes().find_one_and_update(
+                {'user_id': user_id, 'status': SubscriptionStatus.ACTIVE.value},
+                {'$set': {'status': SubscriptionStatus.CANCELLED.value, 'updated_at': now}},
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if doc is None:
+                return None, []
+            return doc, [event_record(SubscriptionEventType.CANCELLED, doc, now)]
 
-        try:
-            active_sub.save()
-            return active_sub
-        except Exception as e:
-            raise ValueError(f"Unexpected error cancelling subscription: {str(e)}")
+        doc = OutboxService.run(cancel)
+        if doc is None:
+            raise ValueError("No active subscription found to cancel.")
+        AnalyticsService.record_cancelled(doc, now)
+        SubscriptionService._refresh_cached_payload(user_id)
+        return Subscription._from_son(doc)
 
     @staticmethod
     def check_and_expire_user_subscription(user_id: str) -> bool:
@@ -134,30 +339,105 @@ class SubscriptionService:
         ).first()
 
         if subscription_to_expire:
-            subscription_to_expire.status = SubscriptionStatus.EXPIRED
             try:
-                subscription_to_expire.save()
-                current_app.logger.info(f"Subscription {subscription_to_expire.id} for user {user_id} expired.")
-                return True
+                if SubscriptionService._expire_subscription(subscription_to_expire):
+                    current_app.logger.info(f"Subscription {subscription_to_expire.id} for user {user_id} expired.")
+                    return True
             except Exception as e:
                 current_app.logger.error(f"Error saving expired status for sub {subscription_to_expire.id}: {e}")
         return False
 
     @staticmethod
-    def expire_all_due_subscriptions():
-        """Scheduled task: Marks all overdue subscriptions as EXPIRED."""
+    def _expire_subscription(subscription: Subscription) -> bool:
+        """
+        Flips one subscription to EXPIRED, with its outbox event, if it is
+        still ACTIVE. Returns False if it changed in the meantime.
+        """
+        now = datetime.now(timezone.utc)
+
+        def expire(session):
+            doc = SubscriptionService._status_writes().find_one_and_update(
+                {'_id': subscription.id, 'status': SubscriptionStatus.ACTIVE.value},
+                {'$set': {'status': SubscriptionStatus.EXPIRED.value, 'updated_at': now}},
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if doc is None:
+                return None, []
+            return doc, [event_record(SubscriptionEventType.EXPIRED, doc, now)]
+
+        doc = OutboxService.run(expire)
+        if doc is None:
+            return False
+        subscription.status = SubscriptionStatus.EXPIRED
+        subscription.updated_at = now
+        AnalyticsService.record_expired([doc])
+        subscription_cache.invalidate(doc['user_id'])
+        return True
+
+    @staticmethod
+    def _record_expiration_run(strategy: str, duration_seconds: float, expired: int, outcome: str) -> None:
+        metrics.EXPIRATION_RUN_DURATION.observe(duration_seconds, strategy=strategy)
+        metrics.EXPIRATION_RUNS.inc(strategy=strategy, outcome=outcome)
+        if expired:
+            metrics.EXPIRATION_EXPIRED.inc(expired, strategy=strategy)
+
+    @staticmethod
+    def expire_all_due_subscriptions() -> ExpirationRunResult | None:
+        """
+        Scheduled task: Marks all overdue subscriptions as EXPIRED.
+
+        With EXPIRATION_LEADER_ELECTION (the default) only the process holding
+        the expiration lease runs a cycle; every other process returns None.
+        """
+        config = current_app.config
+        still_leader = None
+        if config.get("EXPIRATION_LEADER_ELECTION", True):
+            lease_seconds = float(config.get("EXPIRATION_LEASE_SECONDS", 45))
+            fencing_token = expiration_lease.acquire(lease_seconds)
+            if fencing_token is None:
+                current_app.logger.debug("Expiration lease is held by another process; skipping this cycle.")
+                return None
+
+            def renew_lease() -> bool:
+                return expiration_lease.renew(fencing_token, lease_seconds)
+            still_leader = renew_lease
+
+        started = time.perf_counter()
+        if config.get("EXPIRATION_STRATEGY", "bulk") == "bulk":
+            try:
+                result = ExpirationService.expire_due_subscriptions(still_leader=still_leader)
+            except Exception:
+                SubscriptionService._record_expiration_run("bulk", time.perf_counter() - started, 0, "error")
+                raise
+            if result.lease_lost:
+                current_app.logger.warning("Expiration lease lost mid-run; leaving the remaining batches to the new holder.")
+            outcome = "error" if result.errors else ("complete" if result.complete else "partial")
+            SubscriptionService._record_expiration_run("bulk", result.duration_seconds, result.expired, outcome)
+            if result.expired > 0 or not result.complete:
+                current_app.logger.info(
+                    f"Expired {result.expired} of {result.matched} due subscriptions in "
+                    f"{result.batches} batches ({result.duration_seconds:.3f}s, complete={result.complete})."
+                )
+            return result
+
+        # Legacy per-document path, kept for EXPIRATION_STRATEGY=per_document.
         subscriptions_to_expire = Subscription.objects(
             status=SubscriptionStatus.ACTIVE,
             end_date__lt=datetime.now(timezone.utc)
         )
         expired_count = 0
+        failed = False
         for sub in subscriptions_to_expire:
-            sub.status = SubscriptionStatus.EXPIRED
             try:
-                sub.save()
-                expired_count += 1
+                if SubscriptionService._expire_subscription(sub):
+                    expired_count += 1
             except Exception as e:
+                failed = True
                 current_app.logger.error(f"Error expiring subscription {sub.id}: {e}")
+        SubscriptionService._record_expiration_run(
+            "per_document", time.perf_counter() - started, expired_count, "error" if failed else "complete")
 
         if expired_count > 0:
             current_app.logger.info(f"Expired {expired_count} subscriptions.")
+        return None
\ No newline at end of file
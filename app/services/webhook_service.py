@@ -0,0 +1,389 @@
+"""
+Webhook delivery of subscription lifecycle events.
+
+Events come from the transactional outbox (app/services/outbox_service.py),
+so delivery needs OUTBOX_ENABLED. Every registered WebhookTarget is an
+outbox consumer with its own checkpoint. The delivery job
+(app/tasks/webhook_delivery.py) runs on the APScheduler, never on a request
+thread, every WEBHOOK_POLL_SECONDS in the one process holding the
+'deliver_webhooks' lease:
+
+- For every enabled target that is not backing off, it reads up to
+  max_in_flight x batch_size events after the target's checkpoint, keeps the
+  event types the target subscribed to and POSTs them batch_size at a time,
+  one JSON body per batch. At most max_in_flight POSTs per target are in
+  flight; all targets share a pool of WEBHOOK_MAX_WORKERS threads.
+- The checkpoint moves past the batches delivered in order. At the first
+  failed batch the target backs off exponentially with full jitter
+  (WEBHOOK_BACKOFF_BASE_SECONDS, doubling up to WEBHOOK_BACKOFF_MAX_SECONDS),
+  and that batch and the ones after it are sent again on the next attempt.
+- After WEBHOOK_MAX_ATTEMPTS consecutive failures the batch is moved to
+  `webhook_dead_letters` and delivery carries on after it.
+
+The cycle renews the lease while it waits for the POSTs. If the lease is
+lost, it stops without moving any more checkpoints and leaves those batches
+to the new holder.
+
+Delivery is at-least-once, and ordering is only guaranteed through `seq`.
+Events within a batch are in `seq` order. With max_in_flight > 1, a
+target's batches are POSTed at the same time and can arrive out of order.
+After a failure, later batches that did succeed are sent again behind the
+failed one. Receivers should de-duplicate and order on the events' `seq`.
+Only a target with max_in_flight = 1 gets its batches one after another.
+Any 2xx response acknowledges a batch.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app
+from mongoengine.errors import NotUniqueError
+
+from app.core import metrics
+from app.core.json_encoding import encode_default, orjson, orjson_dumps
+from app.models.webhook import WebhookDeadLetter, WebhookTarget
+from app.schemas.webhook_schemas import WebhookTargetCreateRequest
+from app.services.lease_service import LeaseService
+from app.services.outbox_service import OutboxService
+
+JOB_ID = 'deliver_webhooks'
+USER_AGENT = 'subscription-service-webhooks/1'
+
+
+def _aware(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class DeliveryOutcome:
+    ok: bool
+    status_code: int | None = None  # None if no response was received
+    error: str | None = None
+    duration_seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class DeliverySettings:
+    batch_size: int = 100
+    max_in_flight: int = 2
+    max_workers: int = 8
+    timeout_seconds: float = 10.0
+    backoff_base_seconds: float = 1.0
+    backoff_max_seconds: float = 300.0
+    max_attempts: int = 8
+    lease_seconds: float = 30.0
+
+    @classmethod
+    def from_config(cls, config) -> 'DeliverySettings':
+        return cls(
+            batch_size=max(1, int(config.get('WEBHOOK_BATCH_SIZE', cls.batch_size))),
+            max_in_flight=max(1, int(config.get('WEBHOOK_MAX_IN_FLIGHT_PER_TARGET', cls.max_in_flight))),
+            max_workers=max(1, int(config.get('WEBHOOK_MAX_WORKERS', cls.max_workers))),
+            timeout_seconds=float(config.get('WEBHOOK_TIMEOUT_SECONDS', cls.timeout_seconds)),
+            backoff_base_seconds=float(config.get('WEBHOOK_BACKOFF_BASE_SECONDS', cls.backoff_base_seconds)),
+            backoff_max_seconds=float(config.get('WEBHOOK_BACKOFF_MAX_SECONDS', cls.backoff_max_seconds)),
+            max_attempts=max(1, int(config.get('WEBHOOK_MAX_ATTEMPTS', cls.max_attempts))),
+            lease_seconds=float(config.get('WEBHOOK_LEASE_SECONDS', cls.lease_seconds)),
+        )
+
+
+def backoff_delay(failures: int, base: float, cap: float, rng=random) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2^(failures - 1))]."""
+    return rng.uniform(0, min(cap, base * 2 ** max(0, failures - 1)))
+
+
+def chunk(events: list, size: int) -> list[list]:
+    return [events[start:start + size] for start in range(0, len(events), size)]
+
+
+def encode_body(target_name: str, events: list[dict]) -> bytes:
+    payload = {'target': target_name, 'events': events}
+    if orjson is not None:
+        return orjson_dumps(payload, sort_keys=False)
+    return json.dumps(payload, default=encode_default, separators=(',', ':')).encode('utf-8')
+
+
+def sign_body(secret: str, body: bytes) -> str:
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def batch_headers(target_name: str, secret: str | None, body: bytes, events: list[dict]) -> dict:
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': USER_AGENT,
+        'X-Webhook-Target': target_name,
+        'X-Webhook-First-Seq': str(events[0]['seq']),
+        'X-Webhook-Last-Seq': str(events[-1]['seq']),
+    }
+    if secret:
+        headers['X-Webhook-Signature'] = sign_body(secret, body)
+    return headers
+
+
+def post_batch(url: str, body: bytes, headers: dict, timeout: float) -> DeliveryOutcome:
+    """POSTs one batch. Any 2xx status is a success; never raises."""
+    started = time.perf_counter()
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.close()
+        return DeliveryOutcome(False, e.code, f"HTTP {e.code}", time.perf_counter() - started)
+    except Exception as e:
+        return DeliveryOutcome(False, None, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+    ok = 200 <= status < 300
+    return DeliveryOutcome(ok, status, None if ok else f"HTTP {status}", time.perf_counter() - started)
+
+
+def send_batch(target: WebhookTarget, events: list[dict], timeout: float) -> DeliveryOutcome:
+    body = encode_body(target.name, events)
+    return post_batch(target.url, body, batch_headers(target.name, target.secret, body, events), timeout)
+
+
+class WebhookService:
+    """Registration of webhook targets and access to their dead letters."""
+
+    @staticmethod
+    def to_payload(target: WebhookTarget) -> dict:
+        """A target as returned by the API; the secret itself is never returned."""
+        return {
+            'id': str(target.id),
+            'name': target.name,
+            'url': target.url,
+            'has_secret': bool(target.secret),
+            'event_types': list(target.event_types),
+            'enabled': target.enabled,
+            'batch_size': target.batch_size,
+            'max_in_flight': target.max_in_flight,
+            'failures': target.failures,
+            'retry_at': target.retry_at,
+            'last_error': target.last_error,
+            'last_delivered_at': target.last_delivered_at,
+            'created_at': target.created_at,
+        }
+
+    @staticmethod
+    def register_target(data: WebhookTargetCreateRequest) -> WebhookTarget:
+        """
+        Saves a new target. It receives the events written from now on, or
+        every event still in the outbox with `from_start`.
+        """
+        target = WebhookTarget(
+            name=data.name,
+            url=str(data.url),
+            secret=data.secret or None,
+            event_types=[event_type.value for event_type in data.event_types],
+            enabled=data.enabled,
+            batch_size=data.batch_size,
+            max_in_flight=data.max_in_flight,
+        )
+        head = 0 if data.from_start else OutboxService.head()
+        try:
+            target.save(force_insert=True)
+        except NotUniqueError:
+            raise ValueError(f"A webhook target named '{data.name}' already exists.")
+        if head:
+            OutboxService.commit_checkpoint(target.consumer, head)
+        return target
+
+    @staticmethod
+    def get_target(target_id: str) -> WebhookTarget:
+        try:
+            target = WebhookTarget.objects(id=ObjectId(target_id)).first()
+        except InvalidId:
+            target = None
+        if target is None:
+            raise ValueError(f"Webhook target {target_id} not found.")
+        return target
+
+    @staticmethod
+    def list_targets() -> list[WebhookTarget]:
+        return list(WebhookTarget.objects.order_by('name'))
+
+    @staticmethod
+    def delete_target(target_id: str) -> None:
+        """Removes the target; its dead letters are kept."""
+        WebhookService.get_target(target_id).delete()
+
+    @staticmethod
+    def list_dead_letters(target_id: str, limit: int = 50) -> list[dict]:
+        target = WebhookService.get_target(target_id)
+        docs = (WebhookDeadLetter._get_collection()
+                .find({'target_id': target.id})
+                .sort('created_at', -1)
+                .limit(limit))
+        return [dict({key: value for key, value in doc.items() if key != '_id'}, id=str(doc['_id'])) for doc in docs]
+
+    @staticmethod
+    def dead_letter(target: WebhookTarget, events: list[dict], attempts: int, outcome: DeliveryOutcome) -> None:
+        WebhookDeadLetter._get_collection().insert_one({
+            'target_id': target.id,
+            'target_name': target.name,
+            'url': target.url,
+            'first_seq': events[0]['seq'],
+            'last_seq': events[-1]['seq'],
+            'events': events,
+            'attempts': attempts,
+            'status_code': outcome.status_code,
+            'error': outcome.error,
+            'created_at': datetime.now(timezone.utc),
+        })
+
+
+class WebhookDeliveryWorker:
+    """One delivery cycle per call of run_cycle(); see the module docstring."""
+
+    def __init__(self):
+        self.lease = LeaseService(JOB_ID)
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_key = None
+        self._lock = threading.Lock()
+
+    def _pool(self, max_workers: int) -> ThreadPoolExecutor:
+        """The HTTP thread pool of this process, created on first use."""
+        key = (os.getpid(), max_workers)
+        with self._lock:
+            if self._executor_key != key:
+                if self._executor is not None and self._executor_key[0] == os.getpid():
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webhook')
+                self._executor_key = key
+            return self._executor
+
+    def run_cycle(self, now: datetime | None = None) -> dict | None:
+        """
+        Sends every target's next batches concurrently, then settles each
+        target in turn, renewing the lease while waiting. Returns counts
+        ('lease_lost' is True if it stopped early because another process
+        took the lease over), or None if another process holds the lease.
+        """
+        settings = DeliverySettings.from_config(current_app.config)
+        token = self.lease.acquire(settings.lease_seconds)
+        if token is None:
+            return None
+
+        now = now or datetime.now(timezone.utc)
+        stats = {'targets': 0, 'batches': 0, 'delivered': 0, 'failed': 0, 'dead_lettered': 0, 'lease_lost': False}
+        pool = self._pool(settings.max_workers)
+        in_flight = []
+        for target in WebhookTarget.objects(enabled=True):
+            if target.retry_at and _aware(target.retry_at) > now:
+                continue
+            batch_size = target.batch_size or settings.batch_size
+            checkpoint = OutboxService.get_checkpoint(target.consumer)['seq']
+            events = OutboxService.read(checkpoint, batch_size * (target.max_in_flight or settings.max_in_flight))
+            if not events:
+                continue
+            wanted = [event for event in events if not target.event_types or event['type'] in target.event_types]
+            batches = chunk(wanted, batch_size)
+            futures = [pool.submit(send_batch, target, batch, settings.timeout_seconds) for batch in batches]
+            in_flight.append((target, checkpoint, events[-1]['seq'], batches, futures))
+            stats['targets'] += 1
+
+        # Waiting for every target's POSTs can take longer than the lease, so
+        # renew it every third of its length and stop settling once it is lost.
+        renew_every = settings.lease_seconds / 3
+        renewed = time.monotonic()
+
+        def lease_held() -> bool:
+            nonlocal renewed
+            if time.monotonic() - renewed < renew_every:
+                return True
+            if not self.lease.renew(token, settings.lease_seconds):
+                return False
+            renewed = time.monotonic()
+            return True
+
+        for target, checkpoint, last_read, batches, futures in in_flight:
+            while wait(futures, timeout=renew_every).not_done:
+                if not lease_held():
+                    break
+            if not lease_held():
+                current_app.logger.warning(
+                    "Webhook delivery lease lost mid-cycle; leaving the unsettled batches to the new holder.")
+                stats['lease_lost'] = True
+                break
+            outcomes = [future.result() for future in futures]
+            self._settle(target, checkpoint, last_read, batches, outcomes, settings, stats)
+        return stats
+
+    @staticmethod
+    def _settle(target: WebhookTarget, checkpoint: int, last_read: int, batches: list[list[dict]],
+                outcomes: list[DeliveryOutcome], settings: DeliverySettings, stats: dict) -> None:
+        """
+        Walks the batches in order: delivered ones move the checkpoint, the
+        first failure stops it there (or is dead-lettered once it has used up
+        its attempts), and the target's backoff state is saved.
+        """
+        labels = {'target': target.name}
+        failures = target.failures or 0
+        through = last_read  # Everything read is done unless a batch failed
+        failed = None
+        delivered_any = False
+        for batch, outcome in zip(batches, outcomes):
+            stats['batches'] += 1
+            metrics.WEBHOOK_REQUEST_DURATION.observe(outcome.duration_seconds, **labels)
+            if outcome.ok:
+                failures = 0
+                delivered_any = True
+                stats['delivered'] += len(batch)
+                metrics.WEBHOOK_BATCHES.inc(outcome='delivered', **labels)
+                metrics.WEBHOOK_EVENTS.inc(len(batch), outcome='delivered', **labels)
+                delivered_at = datetime.now(timezone.utc)
+                for event in batch:
+                    lag = (delivered_at - _aware(event['occurred_at'])).total_seconds()
+                    metrics.WEBHOOK_DELIVERY_LAG.observe(max(0.0, lag), **labels)
+                continue
+
+            failures += 1
+            if failures >= settings.max_attempts:
+                WebhookService.dead_letter(target, batch, failures, outcome)
+                current_app.logger.warning(
+                    f"Webhook target '{target.name}': events {batch[0]['seq']}-{batch[-1]['seq']} dead-lettered "
+                    f"after {failures} attempts ({outcome.error}).")
+                stats['dead_lettered'] += len(batch)
+                metrics.WEBHOOK_BATCHES.inc(outcome='dead_lettered', **labels)
+                metrics.WEBHOOK_EVENTS.inc(len(batch), outcome='dead_lettered', **labels)
+                failures = 0
+                continue
+
+            # Batches after this one are sent again with it, after the backoff.
+            failed = outcome
+            through = batch[0]['seq'] - 1
+            stats['failed'] += len(batch)
+            metrics.WEBHOOK_BATCHES.inc(outcome='failed', **labels)
+            metrics.WEBHOOK_EVENTS.inc(len(batch), outcome='failed', **labels)
+            break
+
+        if through > checkpoint:
+            OutboxService.commit_checkpoint(target.consumer, through)
+
+        now = datetime.now(timezone.utc)
+        state = dict(set__failures=failures)
+        if failed is not None:
+            delay = backoff_delay(failures, settings.backoff_base_seconds, settings.backoff_max_seconds)
+            state.update(set__retry_at=now + timedelta(seconds=delay), set__last_error=failed.error)
+            current_app.logger.info(
+                f"Webhook target '{target.name}' failed ({failed.error}); attempt {failures} of "
+                f"{settings.max_attempts}, retrying in {delay:.1f}s.")
+        else:
+            state.update(unset__retry_at=True, unset__last_error=True)
+        if delivered_any:
+            state['set__last_delivered_at'] = now
+        WebhookTarget.objects(id=target.id).update_one(**state)
+
+
+webhook_worker = WebhookDeliveryWorker()
@@ -0,0 +1,29 @@
+import threading
+
+from app.core.config import Config
+
+# Fallback app for when a job runs without scheduler.init_app(); built once per process.
+_task_app = None
+_task_app_lock = threading.Lock()
+
+
+def get_task_app():
+    """
+    The long-lived app scheduled jobs run against: the one the scheduler was
+    initialized with, so every run reuses its config, logger and MongoDB
+    connection pool. Only when there is none (a job invoked directly) is an
+    app created, once, with the scheduler disabled so it does not start a second one.
+    """
+    global _task_app
+    from app import scheduler  # Imported lazily: app imports the tasks
+    if scheduler.app is not None:
+        return scheduler.app
+    with _task_app_lock:
+        if _task_app is None:
+            from app import create_app
+
+            class TaskConfig(Config):
+                SCHEDULER_API_ENABLED = False
+
+            _task_app = create_app(TaskConfig)
+    return _task_app
@@ -1,61 +1,55 @@
-from flask import current_app
-from app import scheduler, create_app # Import create_app
+from datetime import datetime, timezone
+
+from app import scheduler
+from app.core.config import Config
 from app.services.subscription_service import SubscriptionService
-from datetime import datetime
+from app.services.expiration_scheduler import expiration_scheduler, JOB_ID, LEASE_JOB_ID
+from app.tasks import get_task_app
+
+
+def _schedule_next_run(app, run_result):
+    """Pulls the next run forward to the next subscription deadline; the interval stays the ceiling."""
+    try:
+        next_run = expiration_scheduler.plan_next_run(run_result)
+        if expiration_scheduler.reschedule(next_run):
+            app.logger.info(f"Next expiration run scheduled for {next_run.isoformat()}")
+    except Exception as e:
+        app.logger.warning(f"Could not plan the next expiration run, falling back to the interval: {e}")
 
-@scheduler.task('interval', id='expire_subscriptions_job', seconds=30) # Test interval
-# @scheduler.task('interval', id='expire_subscriptions_job', hours=1) # Production interval
+
+# Runs once at startup, then at the next deadline (see app/services/expiration_scheduler.py),
+# at most EXPIRATION_MAX_SLEEP_SECONDS apart.
+@scheduler.task('interval', id=JOB_ID, seconds=Config.EXPIRATION_MAX_SLEEP_SECONDS,
+                next_run_time=datetime.now(timezone.utc))
 def expire_subscriptions_task():
     """
     Scheduled task to check for and expire subscriptions that are past their end_date.
     """
-    # Attempt to use current_app, but if it's not available (e.g., in a separate thread
-    # not managed by Flask's context stack), create a new app context.
-    app = current_app._get_current_object() if current_app else None
-
-    if not app:
-        # If current_app is not available, create a new app instance for this task's context.
-        # This ensures that the task can access app.config, extensions like db, etc.
-        app = create_app() # Use your app factory
-        if not app:
-            # This should not happen if create_app is robust
-            print(f"CRITICAL [{datetime.utcnow()}]: Task '{expire_subscriptions_task.__name__}' "
-                  f"could not create an app instance. Cannot proceed.")
-            return
-        
-        # Push an application context manually.
-        # This is necessary because we are outside the normal Flask request lifecycle.
-        with app.app_context():
+    app = get_task_app()
+    # Pushing a context on the existing app is cheap; nothing is re-initialized per run.
+    with app.app_context():
+        app.logger.info(f"Running scheduled task: '{expire_subscriptions_task.__name__}'")
+        try:
+            run_result = SubscriptionService().expire_all_due_subscriptions()
             app.logger.info(
-                f"Running scheduled task: '{expire_subscriptions_task.__name__}' (with manually created app context)"
+                f"Scheduled task '{expire_subscriptions_task.__name__}' completed successfully."
+                + (f" Result: {run_result.as_dict()}" if run_result else "")
             )
-            try:
-                sub_service = SubscriptionService() 
-                sub_service.expire_all_due_subscriptions()
-                app.logger.info(
-                    f"Scheduled task '{expire_subscriptions_task.__name__}' completed successfully (manual context)."
-                )
-            except Exception as e:
-                app.logger.error(
-                    f"Error during scheduled task '{expire_subscriptions_task.__name__}' (manual context): {e}", 
-                    exc_info=True
-                )
-    else:
-        # If current_app was available, proceed as before (Flask-APScheduler might handle context)
-        # The 'with current_app.app_context()' might be redundant if current_app implies context,
-        # but it's harmless and explicit.
-        with app.app_context(): # Or just current_app.app_context() if app is already current_app
-            app.logger.info(
-                f"Running scheduled task: '{expire_subscriptions_task.__name__}' (with existing app context)"
-            )
-            try:
-                sub_service = SubscriptionService() 
-                sub_service.expire_all_due_subscriptions()
-                app.logger.info(
-                    f"Scheduled task '{expire_subscriptions_task.__name__}' completed successfully (existing context)."
-                )
-            except Exception as e:
-                app.logger.error(
-                    f"Error during scheduled task '{expire_subscriptions_task.__name__}' (existing context): {e}", 
-                    exc_info=True
-                )
\ No newline at end of file
+        except Exception as e:
+            app.logger.error(f"Error during scheduled task '{expire_subscriptions_task.__name__}': {e}", exc_info=True)
+            run_result = None
+        _schedule_next_run(app, run_result)
+
+
+# Keeps the expiration lease between runs, which may be EXPIRATION_MAX_SLEEP_SECONDS apart.
+@scheduler.task('interval', id=LEASE_JOB_ID, seconds=Config.EXPIRATION_LEASE_SECONDS / 3)
+def renew_expiration_lease_task():
+    """
+    Scheduled task renewing the expiration lease while this process holds it.
+    """
+    app = get_task_app()
+    with app.app_context():
+        try:
+            expiration_scheduler.keep_lease()
+        except Exception as e:
+            app.logger.warning(f"Could not renew the expiration lease: {e}")
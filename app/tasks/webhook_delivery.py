@@ -0,0 +1,23 @@
+from app import scheduler
+from app.core.config import Config
+from app.services.webhook_service import JOB_ID, webhook_worker
+from app.tasks import get_task_app
+
+
+# Off the request path: POSTs happen on the worker's own thread pool, and a
+# slow cycle delays the next one instead of overlapping it.
+@scheduler.task('interval', id=JOB_ID, seconds=Config.WEBHOOK_POLL_SECONDS,
+                max_instances=1, coalesce=True)
+def deliver_webhooks_task():
+    """
+    Scheduled task that pushes new outbox events to the registered webhook targets.
+    """
+    app = get_task_app()
+    with app.app_context():
+        try:
+            stats = webhook_worker.run_cycle()
+        except Exception as e:
+            app.logger.error(f"Error during scheduled task '{deliver_webhooks_task.__name__}': {e}", exc_info=True)
+            return
+        if stats and stats['batches']:
+            app.logger.info(f"Webhook delivery cycle: {stats}")
@@ -12,4 +12,12 @@ class SubscriptionStatus(str, enum.Enum): # Inheriting from str makes it directl
             for member in cls:
                 if member.value == value.upper():
                     return member
-        return None # Or raise error
\ No newline at end of file
+        return None # Or raise error
+
+
+class SubscriptionEventType(str, enum.Enum):
+    """Lifecycle events written to the outbox (app/services/outbox_service.py)."""
+    CREATED = "subscription.created"
+    UPGRADED = "subscription.upgraded"
+    CANCELLED = "subscription.cancelled"
+    EXPIRED = "subscription.expired"
\ No newline at end of file
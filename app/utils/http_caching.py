@@ -0,0 +1,100 @@
+"""
+HTTP validators (ETag / Last-Modified) and conditional GET helpers, shared by
+the Flask and ASGI apps.
+
+Validators are computed once per loaded plan catalog from the catalog
+version counter and each plan's id and updated_at, never by serializing a
+response, so every worker holding the same catalog sends the same ETag.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, NamedTuple
+
+from app.core.compression import ENCODING_SUFFIXES
+
+
+class Validators(NamedTuple):
+    etag: str                        # Quoted strong entity tag
+    last_modified: datetime | None   # Naive UTC, as read from Mongo
+
+
+def _naive_utc(moment: datetime | None) -> datetime | None:
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _millis(moment: datetime | None) -> int:
+    moment = _naive_utc(moment)
+    return int(moment.replace(tzinfo=timezone.utc).timestamp() * 1000) if moment else 0
+
+
+def plan_validators(plan_id, updated_at: datetime | None) -> Validators:
+    """A plan changes only through Plan.save(), which always moves updated_at."""
+    return Validators(f'"{plan_id}-{_millis(updated_at)}"', _naive_utc(updated_at))
+
+
+def catalog_validators(plans: Iterable[tuple], version: int | None, changed_at: datetime | None) -> Validators:
+    """
+    `plans` yields (plan_id, updated_at) in catalog order. The digest covers
+    additions, deletions and edits; `changed_at` (the time of the last
+    version bump) moves Last-Modified forward when a plan is deleted.
+    """
+    digest = hashlib.sha1(f"v{version}".encode())
+    last_modified = _naive_utc(changed_at)
+    for plan_id, updated_at in plans:
+        digest.update(f";{plan_id}:{_millis(updated_at)}".encode())
+        updated_at = _naive_utc(updated_at)
+        if updated_at is not None and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return Validators(f'"plans-{digest.hexdigest()[:20]}"', last_modified)
+
+
+def _strip_encoding(tag: str) -> str:
+    # Compressed responses carry '<tag>-gzip' / '<tag>-br' (see app/core/compression.py)
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110, 13.1.2).
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if _strip_encoding(tag) == etag:
+            return True
+    return False
+
+
+def is_not_modified(validators: Validators, if_none_match: str | None, if_modified_since: str | None) -> bool:
+    """
+    True if a GET with these request headers can be answered 304. If-None-Match
+    takes precedence; If-Modified-Since is only used without it.
+    """
+    if if_none_match:
+        return _etag_matches(if_none_match, validators.etag)
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        # HTTP dates have one-second resolution.
+        return validators.last_modified.replace(microsecond=0) <= _naive_utc(since).replace(tzinfo=None)
+    return False
+
+
+def caching_headers(validators: Validators, cache_control: str | None) -> dict:
+    headers = {'ETag': validators.etag}
+    if validators.last_modified is not None:
+        headers['Last-Modified'] = format_datetime(validators.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    return headers
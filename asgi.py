@@ -0,0 +1,12 @@
+from app.asgi import create_asgi_app
+from app.core.config import Config
+
+app = create_asgi_app(Config)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    host = getattr(Config, "HOST", "127.0.0.1")
+    port = int(getattr(Config, "PORT", 8000))
+
+    uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,98 @@
+"""
+Microbenchmark: bytes and CPU per response for the JSON encoding backends
+and the response compression in app/core/json_encoding.py and
+app/core/compression.py.
+
+Encodes realistic plan-list and subscription payloads (built with the read
+models, as the endpoints do) with Flask's stdlib path and with orjson, then
+compresses the result with every available encoding. Runs in memory, no
+MongoDB or Flask app required.
+
+    python benchmarks/bench_json_compression.py [--iterations 2000] [--plans 50] [--features 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core import compression  # noqa: E402
+from app.core.json_encoding import StdlibJSONEncoder, orjson, orjson_dumps  # noqa: E402
+from app.schemas.read_models import PlanReadModel, SubscriptionReadModel  # noqa: E402
+
+
+def make_payloads(plan_count: int, feature_count: int):
+    now = datetime.utcnow().replace(microsecond=123000)
+    plans = [
+        PlanReadModel.from_raw({
+            '_id': ObjectId(),
+            'name': f'Plan {i:03d}',
+            'price': 4.99 + i,
+            'features': [f'Feature {j}: includes up to {j * 10} seats and priority support' for j in range(feature_count)],
+            'duration_days': 30 if i % 2 else 365,
+            'created_at': now,
+            'updated_at': now,
+        }).to_dict()
+        for i in range(plan_count)
+    ]
+    subscription = SubscriptionReadModel.from_raw({
+        '_id': ObjectId(),
+        'user_id': 'user-123',
+        'start_date': now,
+        'end_date': now + timedelta(days=30),
+        'status': 'ACTIVE',
+        'created_at': now,
+        'updated_at': now,
+    }, plans[0]).to_dict()
+    return [('plan list', plans), ('subscription', subscription)]
+
+
+def stdlib_dumps(payload) -> bytes:
+    # What jsonify did before: Flask's encoder, sorted keys, compact separators.
+    return json.dumps(payload, cls=StdlibJSONEncoder, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def timeit(fn, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1e6  # microseconds per call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--plans', type=int, default=50)
+    parser.add_argument('--features', type=int, default=20)
+    args = parser.parse_args()
+
+    encoders = [('stdlib', stdlib_dumps)]
+    if orjson is not None:
+        encoders.append(('orjson', orjson_dumps))
+    else:
+        print("orjson is not installed; only the stdlib encoder is measured.\n")
+
+    print(f"{'response':<14}{'encoder':<9}{'encoding':<10}{'bytes':>9}{'encode (us)':>13}{'compress (us)':>15}{'total (us)':>12}")
+    for name, payload in make_payloads(args.plans, args.features):
+        reference = stdlib_dumps(payload)
+        for encoder_name, dumps in encoders:
+            body = dumps(payload)
+            # The fast path must produce the same JSON document.
+            assert json.loads(body) == json.loads(reference), f'{encoder_name} output differs for {name}'
+            encode_us = timeit(lambda: dumps(payload), args.iterations)
+            print(f"{name:<14}{encoder_name:<9}{'identity':<10}{len(body):>9}{encode_us:>13.2f}{0:>15.2f}{encode_us:>12.2f}")
+            for encoding in compression.available_encodings():
+                compressed = compression.compress(body, encoding)
+                compress_us = timeit(lambda: compression.compress(body, encoding), args.iterations)
+                print(f"{name:<14}{encoder_name:<9}{encoding:<10}{len(compressed):>9}{encode_us:>13.2f}"
+                      f"{compress_us:>15.2f}{encode_us + compress_us:>12.2f}")
+    print(f"\nResponses under COMPRESSION_MIN_SIZE ({compression.DEFAULT_MIN_SIZE} bytes by default) are sent uncompressed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: cost of a rate-limit check (app/core/rate_limit.py) per store,
+and how well it holds back a client stuck in a retry loop.
+
+For each store, measures the time of RateLimiter.check() with the given
+number of users spread over the subscription routes (every check admitted),
+then lets one user call POST /subscriptions in a tight loop for --seconds
+and compares the admitted requests with what the bucket allows
+(burst + rate * seconds). The 'redis' store runs against fakeredis (needs
+its Lua support: pip install -r benchmarks/requirements.txt) unless
+--redis-url is given. No MongoDB or Flask app required.
+
+    python benchmarks/bench_rate_limit.py [--checks 200000] [--users 10000] [--seconds 2] [--rate 1] [--burst 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.rate_limit import LocalBucketStore, RateLimiter, RedisBucketStore  # noqa: E402
+
+ROUTES = (
+    'create_subscription_endpoint',
+    'get_user_subscription_endpoint',
+    'update_user_subscription_endpoint',
+    'cancel_user_subscription_endpoint',
+)
+
+
+def make_stores(redis_url: str | None) -> dict:
+    stores = {'local': LocalBucketStore}
+    if redis_url:
+        stores['redis'] = lambda: RedisBucketStore.from_url(redis_url, timeout_seconds=1.0)
+    else:
+        try:
+            import fakeredis
+            import lupa  # noqa: F401  (fakeredis runs Lua scripts with it)
+            stores['redis (fakeredis)'] = lambda: RedisBucketStore(fakeredis.FakeRedis())
+        except ImportError:
+            print("fakeredis or lupa is not installed; skipping the redis store.")
+    return stores
+
+
+def make_limiter(store, rate: float, burst: float, global_rate: float) -> RateLimiter:
+    limiter = RateLimiter()
+    limiter.configure({
+        'RATE_LIMIT_USER_RATE': rate,
+        'RATE_LIMIT_USER_BURST': burst,
+        'RATE_LIMIT_GLOBAL_RATE': global_rate,
+        'RATE_LIMIT_GLOBAL_BURST': global_rate,
+    }, store=store)
+    return limiter
+
+
+def check_overhead(make_store, checks: int, users: int, global_rate: float) -> float:
+    """Mean microseconds per admitted check; buckets are large enough never to run out."""
+    limiter = make_limiter(make_store(), 1e6, 1e6, global_rate)
+    keys = [(f'user-{n % users}', ROUTES[n % len(ROUTES)]) for n in range(checks)]
+    started = time.perf_counter()
+    for user_id, route in keys:
+        if limiter.check(user_id, route):
+            raise RuntimeError('check was rejected; the benchmark buckets are too small')
+    return (time.perf_counter() - started) / checks * 1e6
+
+
+def looping_client(make_store, seconds: float, rate: float, burst: float) -> tuple[int, int]:
+    """(admitted, rejected) calls of one user hammering one route for `seconds`."""
+    limiter = make_limiter(make_store(), rate, burst, 0)
+    user_id = f'looping-{time.time_ns()}'
+    admitted = rejected = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if limiter.check(user_id, ROUTES[0]):
+            rejected += 1
+        else:
+            admitted += 1
+    return admitted, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seconds', type=float, default=2.0, help='Length of the looping-client run')
+    parser.add_argument('--rate', type=float, default=1.0, help='Looping client: tokens per second')
+    parser.add_argument('--burst', type=float, default=5.0, help='Looping client: bucket size')
+    parser.add_argument('--redis-url', help='Real Redis server (a throwaway database) instead of fakeredis')
+    args = parser.parse_args()
+
+    allowed = int(args.burst + args.rate * args.seconds)
+    print(f"{args.checks} checks over {args.users} users x {len(ROUTES)} routes; looping client for "
+          f"{args.seconds:g}s at {args.rate:g}/s, burst {args.burst:g} (bucket allows ~{allowed})")
+    print(f"{'store':<18} {'us/check':>9} {'+global':>9} {'admitted':>9} {'rejected':>10}")
+    for name, make_store in make_stores(args.redis_url).items():
+        checks = args.checks if name == 'local' else min(args.checks, 20000)
+        per_user = check_overhead(make_store, checks, args.users, 0)
+        with_global = check_overhead(make_store, checks, args.users, 1e6)
+        admitted, rejected = looping_client(make_store, args.seconds, args.rate, args.burst)
+        print(f"{name:<18} {per_user:>9.2f} {with_global:>9.2f} {admitted:>9} {rejected:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Microbenchmark: per-response CPU of the Document + Pydantic serialization path
+versus the raw read models in app/schemas/read_models.py.
+
+Runs entirely in memory (no MongoDB needed): raw BSON-shaped dicts are fed to
+both paths, so the numbers cover hydration and serialization only.
+
+    python benchmarks/bench_read_models.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.plan import Plan  # noqa: E402
+from app.models.subscription import Subscription  # noqa: E402
+from app.schemas.plan_schemas import PlanResponse  # noqa: E402
+from app.schemas.read_models import PlanReadModel, SubscriptionReadModel  # noqa: E402
+from app.schemas.subscription_schemas import SubscriptionResponse  # noqa: E402
+
+
+def make_raw_docs():
+    now = datetime.utcnow().replace(microsecond=123000)
+    plan_raw = {
+        '_id': ObjectId(),
+        'name': 'Pro',
+        'price': 19.99,
+        'features': [f'feature-{i}' for i in range(8)],
+        'duration_days': 30,
+        'created_at': now,
+        'updated_at': now,
+    }
+    sub_raw = {
+        '_id': ObjectId(),
+        'user_id': 'user-123',
+        'plan': plan_raw['_id'],
+        'start_date': now,
+        'end_date': now + timedelta(days=30),
+        'status': 'ACTIVE',
+        'created_at': now,
+        'updated_at': now,
+    }
+    return plan_raw, sub_raw
+
+
+def document_path(plan_raw, sub_raw):
+    # What the endpoints did before: hydrate both documents (the plan stands in
+    # for the ReferenceField dereference), then validate and dump with Pydantic.
+    plan = Plan._from_son(plan_raw)
+    sub = Subscription._from_son(sub_raw)
+    sub.plan = plan
+    return SubscriptionResponse.model_validate(sub).model_dump(mode='json')
+
+
+def read_model_path(plan_raw, sub_raw, plan_payload_cache):
+    plan_payload = plan_payload_cache.get(sub_raw['plan'])
+    if plan_payload is None:
+        plan_payload = PlanReadModel.from_raw(plan_raw).to_dict()
+        plan_payload_cache[sub_raw['plan']] = plan_payload
+    return SubscriptionReadModel.from_raw(sub_raw, plan_payload).to_dict()
+
+
+def plan_document_path(plan_raw):
+    return PlanResponse.model_validate(Plan._from_son(plan_raw)).model_dump(mode='json')
+
+
+def plan_read_model_path(plan_raw):
+    return PlanReadModel.from_raw(plan_raw).to_dict()
+
+
+def timeit(fn, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1e6  # microseconds per call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    plan_raw, sub_raw = make_raw_docs()
+    plan_payloads = {}
+
+    # The fast path must produce exactly what the schemas produce.
+    assert document_path(plan_raw, sub_raw) == read_model_path(plan_raw, sub_raw, {}), 'subscription payload mismatch'
+    assert plan_document_path(plan_raw) == plan_read_model_path(plan_raw), 'plan payload mismatch'
+
+    cases = [
+        ('subscription', lambda: document_path(plan_raw, sub_raw),
+         lambda: read_model_path(plan_raw, sub_raw, plan_payloads)),
+        ('plan', lambda: plan_document_path(plan_raw),
+         lambda: plan_read_model_path(plan_raw)),
+    ]
+    print(f"{'response':<14}{'document+pydantic (us)':>24}{'read model (us)':>18}{'saved (us)':>12}{'speedup':>10}")
+    for name, slow, fast in cases:
+        slow_us = timeit(slow, args.iterations)
+        fast_us = timeit(fast, args.iterations)
+        print(f"{name:<14}{slow_us:>24.2f}{fast_us:>18.2f}{slow_us - fast_us:>12.2f}{slow_us / fast_us:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
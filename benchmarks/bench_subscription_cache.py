@@ -0,0 +1,110 @@
+"""
+Benchmark: GET /subscriptions/<user_id> lookups through the subscription
+cache in app/services/subscription_cache.py, for each backend.
+
+Many threads poll a small set of users while a simulated MongoDB read (a
+sleep of --load-ms) stands in for the loader, and a share of users change
+and are refreshed during the run. Reports lookups per second, how many
+loads reached the "database", and how many concurrent misses were coalesced
+onto another thread's load. The 'redis' backend runs against fakeredis
+(pip install -r benchmarks/requirements.txt) unless --redis-url is given.
+No MongoDB or Flask app required.
+
+    python benchmarks/bench_subscription_cache.py [--threads 32] [--users 50] [--seconds 3] [--load-ms 5]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.subscription_cache import LocalBackend, RedisBackend, SubscriptionCache  # noqa: E402
+
+
+def make_backends(redis_url: str | None) -> dict:
+    backends = {'none': None, 'local': LocalBackend()}
+    if redis_url:
+        backends['redis'] = RedisBackend.from_url(redis_url)
+    else:
+        try:
+            import fakeredis
+            backends['redis (fakeredis)'] = RedisBackend(fakeredis.FakeRedis())
+        except ImportError:
+            print("fakeredis is not installed; skipping the redis backend.")
+    return backends
+
+
+def run(backend, threads: int, users: int, seconds: float, load_seconds: float, change_rate: float) -> dict:
+    cache = SubscriptionCache()
+    cache.configure({'SUBSCRIPTION_CACHE_TTL_SECONDS': 60}, backend=backend)
+    if backend is not None:
+        backend.delete(*(cache.key(f'user-{n}') for n in range(users)))
+    end_date = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    loads = [0]
+    lookups = [0]
+    counter_lock = threading.Lock()
+
+    def loader(user_id):
+        def load():
+            time.sleep(load_seconds)
+            with counter_lock:
+                loads[0] += 1
+            return {'user_id': user_id, 'status': 'ACTIVE', 'end_date': end_date, 'plan': {'name': 'Pro'}}
+        return load
+
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        rng = random.Random()
+        done = 0
+        while time.perf_counter() < deadline:
+            user_id = f'user-{rng.randrange(users)}'
+            if rng.random() < change_rate:
+                cache.refresh(user_id, loader(user_id))
+            else:
+                cache.get_or_load(user_id, loader(user_id))
+                done += 1
+        with counter_lock:
+            lookups[0] += done
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    stats = cache.stats()
+    return {
+        'lookups_per_second': lookups[0] / elapsed,
+        'loads': loads[0],
+        'coalesced': stats['coalesced'],
+        'hit_ratio': stats['hit_ratio'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--load-ms', type=float, default=5.0, help='Simulated MongoDB read per load')
+    parser.add_argument('--change-rate', type=float, default=0.01, help='Share of operations that change a user')
+    parser.add_argument('--redis-url', help='Real Redis server (a throwaway database) instead of fakeredis')
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.users} users, {args.load_ms:g} ms per load, "
+          f"{args.change_rate:.1%} changes, {args.seconds:g}s per backend")
+    print(f"{'backend':<18} {'lookups/s':>10} {'loads':>8} {'coalesced':>10} {'hit ratio':>10}")
+    for name, backend in make_backends(args.redis_url).items():
+        result = run(backend, args.threads, args.users, args.seconds, args.load_ms / 1000, args.change_rate)
+        print(f"{name:<18} {result['lookups_per_second']:>10.0f} {result['loads']:>8} "
+              f"{result['coalesced']:>10} {result['hit_ratio']:>10.2%}")
+
+
+if __name__ == '__main__':
+    main()
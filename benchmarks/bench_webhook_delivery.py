@@ -0,0 +1,149 @@
+"""
+Benchmark: webhook delivery throughput of batched versus per-event POSTs,
+using the encoding, signing and HTTP path of app/services/webhook_service.py.
+
+Starts a local stub receiver (ThreadingHTTPServer) that verifies every
+batch's X-Webhook-Signature, can add latency and fail a share of requests,
+then delivers the same synthetic outbox events one per POST and in batches,
+with the given number of POSTs in flight. Also prints the full-jitter
+backoff schedule. No MongoDB or Flask app required.
+
+    python benchmarks/bench_webhook_delivery.py [--events 2000] [--batch-size 100] [--in-flight 2]
+        [--latency-ms 20] [--failure-rate 0.0]
+"""
+import argparse
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.webhook_service import (  # noqa: E402
+    backoff_delay,
+    batch_headers,
+    chunk,
+    encode_body,
+    post_batch,
+    sign_body,
+)
+
+SECRET = 'bench-secret'
+TARGET = 'bench-target'
+
+
+class StubReceiver(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+    received = 0
+    bad_signatures = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        signed = hmac.compare_digest(self.headers.get('X-Webhook-Signature', ''), sign_body(SECRET, body))
+        events = json.loads(body)['events']
+        with StubReceiver.lock:
+            if signed:
+                StubReceiver.received += len(events)
+            else:
+                StubReceiver.bad_signatures += 1
+        self.send_response(204 if signed else 401)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_events(count: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        'seq': seq,
+        'type': 'subscription.created',
+        'subscription_id': ObjectId(),
+        'user_id': f'user-{seq}',
+        'plan_id': ObjectId(),
+        'status': 'ACTIVE',
+        'end_date': now,
+        'occurred_at': now,
+    } for seq in range(1, count + 1)]
+
+
+def deliver(url: str, events: list[dict], batch_size: int, in_flight: int) -> dict:
+    """Sends every batch, retrying failed ones right away (up to 20 times); returns timings."""
+    def send(batch):
+        for attempt in range(1, 21):
+            body = encode_body(TARGET, batch)
+            outcome = post_batch(url, body, batch_headers(TARGET, SECRET, body, batch), timeout=10)
+            if outcome.ok:
+                break
+        return attempt
+
+    StubReceiver.received = 0
+    batches = chunk(events, batch_size)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=in_flight) as pool:
+        attempts = sum(pool.map(send, batches))
+    elapsed = time.perf_counter() - started
+    return {
+        'batch_size': batch_size,
+        'requests': attempts,
+        'seconds': elapsed,
+        'events_per_second': len(events) / elapsed,
+        'received': StubReceiver.received,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--in-flight', type=int, default=2)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    if not 0 <= args.failure_rate < 1:
+        parser.error('--failure-rate must be at least 0 and below 1')
+
+    StubReceiver.latency = args.latency_ms / 1000
+    StubReceiver.failure_rate = args.failure_rate
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubReceiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/hook'
+
+    events = make_events(args.events)
+    print(f"{args.events} events, {args.in_flight} in flight, {args.latency_ms:g} ms receiver latency, "
+          f"{args.failure_rate:.0%} failures")
+    print(f"{'batch size':>10} {'requests':>9} {'seconds':>9} {'events/s':>10} {'received':>9}")
+    for batch_size in sorted({1, args.batch_size}):
+        result = deliver(url, events, batch_size, args.in_flight)
+        print(f"{result['batch_size']:>10} {result['requests']:>9} {result['seconds']:>9.2f} "
+              f"{result['events_per_second']:>10.0f} {result['received']:>9}")
+    server.shutdown()
+    if StubReceiver.bad_signatures:
+        print(f"WARNING: {StubReceiver.bad_signatures} requests had a bad signature")
+
+    print("\nBackoff after n consecutive failures (base 1s, cap 300s, full jitter):")
+    rng = random.Random(42)
+    for failures in range(1, 11):
+        samples = [backoff_delay(failures, 1.0, 300.0, rng) for _ in range(1000)]
+        print(f"  {failures:>2}: ceiling {min(300.0, 2.0 ** (failures - 1)):>6.0f}s, "
+              f"mean {sum(samples) / len(samples):>6.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Correctness check of the subscription cache (app/services/subscription_cache.py)
+with the 'redis' backend on fakeredis, and the 'local' backend where the
+behaviour is shared. Asserts that:
+
+- reads only fill empty entries (SET NX), so they never overwrite a
+  write-through refresh();
+- an entry's TTL is cut at the subscription's end_date;
+- invalidate() removes the entry;
+- the cross-process load lock is released after a miss;
+- concurrent misses for one user, in one process or in two sharing the
+  server, call the loader once.
+
+Prints each step and exits non-zero at the first failed assertion. No
+MongoDB required.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/check_subscription_cache.py
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.subscription_cache import LOCK_SUFFIX, LocalBackend, RedisBackend, SubscriptionCache  # noqa: E402
+
+CONFIG = {'SUBSCRIPTION_CACHE_TTL_SECONDS': 60, 'SUBSCRIPTION_CACHE_LOCK_SECONDS': 2}
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        print(f"FAIL: {message}")
+        sys.exit(1)
+    print(f"  ok: {message}")
+
+
+def payload(user_id: str, plan: str, days: float = 30) -> dict:
+    end_date = datetime.now(timezone.utc) + timedelta(days=days)
+    return {'user_id': user_id, 'status': 'ACTIVE', 'end_date': end_date.isoformat(), 'plan': {'name': plan}}
+
+
+def make_cache(backend) -> SubscriptionCache:
+    cache = SubscriptionCache()
+    cache.configure(CONFIG, backend=backend)
+    return cache
+
+
+def concurrent_misses(caches: list[SubscriptionCache], user_id: str, threads: int) -> tuple[int, list]:
+    """Starts `threads` lookups of `user_id` at once, spread over `caches`; returns (loader calls, results)."""
+    calls = []
+    results = [None] * threads
+    barrier = threading.Barrier(threads)
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return payload(user_id, 'Pro')
+
+    def lookup(n):
+        barrier.wait()
+        results[n] = caches[n % len(caches)].get_or_load(user_id, load)
+
+    workers = [threading.Thread(target=lookup, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(calls), results
+
+
+def check_backend(name: str, backend, second_backend=None) -> None:
+    print(f"{name} backend")
+    cache = make_cache(backend)
+
+    cache.refresh('u-nx', lambda: payload('u-nx', 'Team'))
+    check(not backend.add(cache.key('u-nx'), b'{"stale": true}', 60), "add() does not replace an existing entry")
+    value = cache.get_or_load('u-nx', lambda: payload('u-nx', 'stale read'))
+    check(value['plan']['name'] == 'Team', "a read after refresh() returns the refreshed payload")
+
+    def read_racing_a_change():
+        loaded = payload('u-race', 'Basic')  # Read before the change commits...
+        cache.refresh('u-race', lambda: payload('u-race', 'Pro'))  # ...which writes through first
+        return loaded
+    cache.get_or_load('u-race', read_racing_a_change)
+    check(cache.get_or_load('u-race', lambda: None)['plan']['name'] == 'Pro',
+          "a read that started before a change does not overwrite its write-through")
+
+    cache.get_or_load('u-gone', lambda: payload('u-gone', 'Pro'))
+    cache.invalidate('u-gone')
+    check(backend.get(cache.key('u-gone')) is None, "invalidate() removes the entry")
+
+    cache.get_or_load('u-none', lambda: None)
+    check(cache.get_or_load('u-none', lambda: payload('u-none', 'loaded again')) is None,
+          "'no subscription' is cached too")
+
+    loads, results = concurrent_misses([cache], 'u-hot', 20)
+    check(loads == 1 and all(result['plan']['name'] == 'Pro' for result in results),
+          f"20 concurrent misses in one process call the loader once (called {loads}x)")
+
+    if second_backend is not None:
+        other = make_cache(second_backend)
+        loads, results = concurrent_misses([cache, other], 'u-hot-shared', 20)
+        check(loads == 1 and all(result['plan']['name'] == 'Pro' for result in results),
+              f"20 concurrent misses across two processes call the loader once (called {loads}x)")
+
+
+def check_redis_only(client) -> None:
+    print("redis backend: TTL and lock")
+    cache = make_cache(RedisBackend(client))
+
+    cache.get_or_load('u-ending', lambda: payload('u-ending', 'Pro', days=5 / 86400))
+    ttl_ms = client.pttl(cache.key('u-ending'))
+    check(0 < ttl_ms <= 5000, f"the entry's TTL is cut at end_date (5s left, TTL {ttl_ms} ms)")
+    cache.refresh('u-ending', lambda: payload('u-ending', 'Pro', days=5 / 86400))
+    ttl_ms = client.pttl(cache.key('u-ending'))
+    check(0 < ttl_ms <= 5000, f"so is a write-through entry's (TTL {ttl_ms} ms)")
+    cache.get_or_load('u-long', lambda: payload('u-long', 'Pro'))
+    ttl_ms = client.pttl(cache.key('u-long'))
+    check(55000 < ttl_ms <= 60000, f"an entry ending later keeps SUBSCRIPTION_CACHE_TTL_SECONDS (TTL {ttl_ms} ms)")
+
+    cache.get_or_load('u-lock', lambda: payload('u-lock', 'Pro'))
+    check(not client.exists(cache.key('u-lock') + LOCK_SUFFIX), "the load lock is released after a miss")
+
+    def failing_load():
+        raise RuntimeError('database down')
+    try:
+        cache.get_or_load('u-lock-error', failing_load)
+    except RuntimeError:
+        pass
+    check(not client.exists(cache.key('u-lock-error') + LOCK_SUFFIX), "the load lock is released when the load fails")
+
+
+def main():
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("fakeredis is not installed: pip install -r benchmarks/requirements.txt")
+    check_backend('local', LocalBackend())
+    server = fakeredis.FakeServer()
+    check_backend('redis (fakeredis)', RedisBackend(fakeredis.FakeRedis(server=server)),
+                  second_backend=RedisBackend(fakeredis.FakeRedis(server=server)))
+    check_redis_only(fakeredis.FakeRedis(server=server))
+    print("All subscription cache checks passed.")
+
+
+if __name__ == '__main__':
+    main()
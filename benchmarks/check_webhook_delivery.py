@@ -0,0 +1,264 @@
+"""
+End-to-end check of the webhook delivery worker (app/services/webhook_service.py).
+
+Boots `create_app` against mongomock, registers targets pointing at a local
+stub receiver (ThreadingHTTPServer), appends outbox events and drives
+WebhookDeliveryWorker.run_cycle(), asserting after every cycle:
+
+- event-type filtering, signatures and the checkpoint of a healthy target;
+- failures, retry_at and backoff skipping of a failing target, and the
+  `webhook_dead_letters` record once it has used up WEBHOOK_MAX_ATTEMPTS;
+- that a cycle outlasting WEBHOOK_LEASE_SECONDS renews the lease, and one
+  whose lease is taken over stops without moving the checkpoint.
+
+Prints each step and exits non-zero at the first failed assertion.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/check_webhook_delivery.py
+"""
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.core.config import Config  # noqa: E402
+
+SECRET = 'check-secret'
+BATCH_SIZE = 2
+MAX_IN_FLIGHT = 2
+MAX_ATTEMPTS = 3
+
+
+class StubReceiver(BaseHTTPRequestHandler):
+    """
+    Records the events of every correctly signed POST by path. '/fail' always
+    answers 503, '/slow' takes `slow_seconds`, and '/steal' hands the delivery
+    lease to another holder, then takes `slow_seconds` (as if the worker had
+    stalled past its lease).
+    """
+    received: dict[str, list[int]] = {}
+    bad_signatures = 0
+    slow_seconds = 0.0
+    steal = None
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/fail':
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path == '/steal':
+            StubReceiver.steal()
+        if self.path in ('/slow', '/steal'):
+            time.sleep(self.slow_seconds)
+        signed = hmac.compare_digest(self.headers.get('X-Webhook-Signature', ''),
+                                     'sha256=' + hmac.new(SECRET.encode(), body, 'sha256').hexdigest())
+        with StubReceiver.lock:
+            if signed:
+                StubReceiver.received.setdefault(self.path, []).extend(
+                    event['seq'] for event in json.loads(body)['events'])
+            else:
+                StubReceiver.bad_signatures += 1
+        self.send_response(204 if signed else 401)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_app():
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is not installed: pip install -r benchmarks/requirements.txt")
+
+    class CheckConfig(Config):
+        MONGODB_SETTINGS = {'host': 'mongodb://localhost/webhook_check', 'mongo_client_class': mongomock.MongoClient}
+        MONGO_CATALOG_READ_PREFERENCE = 'primary'  # mongomock has no sessions
+        SCHEDULER_API_ENABLED = False
+        DEBUG = False
+        WEBHOOK_BATCH_SIZE = BATCH_SIZE
+        WEBHOOK_MAX_IN_FLIGHT_PER_TARGET = MAX_IN_FLIGHT
+        WEBHOOK_MAX_ATTEMPTS = MAX_ATTEMPTS
+        WEBHOOK_TIMEOUT_SECONDS = 5
+        WEBHOOK_LEASE_SECONDS = 30
+
+    app = create_app(CheckConfig)
+    app.logger.setLevel(logging.ERROR)
+    return app
+
+
+def append_events(types: list[str]) -> list[int]:
+    """Appends one event per type to the outbox; returns their seq numbers."""
+    from app.services.outbox_service import OutboxService
+    now = datetime.now(timezone.utc)
+    OutboxService.append([{
+        'type': event_type,
+        'subscription_id': ObjectId(),
+        'user_id': f'user-{n}',
+        'plan_id': ObjectId(),
+        'status': 'ACTIVE',
+        'end_date': now + timedelta(days=30),
+        'occurred_at': now,
+    } for n, event_type in enumerate(types)], session=None)
+    head = OutboxService.head()
+    return list(range(head - len(types) + 1, head + 1))
+
+
+def register(base_url: str, path: str, event_types=()):
+    from app.schemas.webhook_schemas import WebhookTargetCreateRequest
+    from app.services.webhook_service import WebhookService
+    return WebhookService.register_target(WebhookTargetCreateRequest(
+        name=path.strip('/'), url=base_url + path, secret=SECRET, event_types=list(event_types)))
+
+
+def checkpoint(target) -> int:
+    from app.services.outbox_service import OutboxService
+    return OutboxService.get_checkpoint(target.consumer)['seq']
+
+
+def reset() -> None:
+    from app.models.webhook import WebhookDeadLetter, WebhookTarget
+    from app.services.webhook_service import webhook_worker
+    WebhookTarget.objects.delete()
+    WebhookDeadLetter.objects.delete()
+    webhook_worker.lease._collection().delete_many({})
+    StubReceiver.received = {}
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        print(f"FAIL: {message}")
+        sys.exit(1)
+    print(f"  ok: {message}")
+
+
+def check_filtering_and_checkpoint(base_url: str) -> None:
+    from app.models.webhook import WebhookTarget
+    from app.services.webhook_service import webhook_worker
+    print("healthy target subscribed to subscription.created")
+    reset()
+    target = register(base_url, '/ok', ['subscription.created'])
+    types = ['subscription.created', 'subscription.cancelled', 'subscription.created', 'subscription.created',
+             'subscription.upgraded', 'subscription.expired', 'subscription.created']
+    seqs = append_events(types)
+    wanted = [seq for seq, event_type in zip(seqs, types) if event_type == 'subscription.created']
+
+    stats = webhook_worker.run_cycle()
+    read = seqs[:BATCH_SIZE * MAX_IN_FLIGHT]
+    check(checkpoint(target) == read[-1], f"first cycle moves the checkpoint to {read[-1]}, the last event read")
+    check(sorted(StubReceiver.received.get('/ok', [])) == [seq for seq in wanted if seq <= read[-1]],
+          "only subscription.created events are POSTed")
+    check(stats['delivered'] == len([seq for seq in wanted if seq <= read[-1]]) and not stats['lease_lost'],
+          f"cycle stats count the delivered events ({stats})")
+    while checkpoint(target) < seqs[-1]:
+        webhook_worker.run_cycle()
+    check(sorted(StubReceiver.received['/ok']) == wanted, "every wanted event is delivered exactly once")
+    check(StubReceiver.bad_signatures == 0, "every batch is signed with the target's secret")
+    target = WebhookTarget.objects.get(id=target.id)
+    check(target.failures == 0 and target.retry_at is None and target.last_delivered_at is not None,
+          "delivery state shows no failures")
+
+    filtered_out = append_events(['subscription.expired'] * 3)
+    webhook_worker.run_cycle()
+    check(checkpoint(target) == filtered_out[-1], "events the target does not want still move the checkpoint")
+
+
+def check_backoff_and_dead_letters(base_url: str) -> None:
+    from app.models.webhook import WebhookDeadLetter, WebhookTarget
+    from app.services.webhook_service import webhook_worker
+    print(f"failing target, WEBHOOK_MAX_ATTEMPTS={MAX_ATTEMPTS}")
+    reset()
+    target = register(base_url, '/fail')
+    start = checkpoint(target)
+    seqs = append_events(['subscription.created'] * (BATCH_SIZE * 2))
+
+    webhook_worker.run_cycle()
+    state = WebhookTarget.objects.get(id=target.id)
+    check(checkpoint(target) == start, "a failed first batch leaves the checkpoint where it was")
+    check(state.failures == 1 and state.last_error == 'HTTP 503', "the failure is recorded")
+    check(state.retry_at is not None, "the target backs off (retry_at is set)")
+
+    retry_at = state.retry_at.replace(tzinfo=timezone.utc)
+    stats = webhook_worker.run_cycle(now=retry_at - timedelta(microseconds=1))
+    check(stats['targets'] == 0 and WebhookTarget.objects.get(id=target.id).failures == 1,
+          "a cycle before retry_at skips the target")
+
+    for attempt in range(2, MAX_ATTEMPTS + 1):
+        retry_at = WebhookTarget.objects.get(id=target.id).retry_at.replace(tzinfo=timezone.utc)
+        webhook_worker.run_cycle(now=retry_at + timedelta(seconds=1))
+    state = WebhookTarget.objects.get(id=target.id)
+    letters = list(WebhookDeadLetter._get_collection().find({'target_id': target.id}))
+    first_batch = seqs[:BATCH_SIZE]
+    check(len(letters) == 1, "the first batch is dead-lettered after its last attempt")
+    letter = letters[0]
+    check((letter['first_seq'], letter['last_seq']) == (first_batch[0], first_batch[-1])
+          and [event['seq'] for event in letter['events']] == first_batch,
+          f"the dead letter holds events {first_batch[0]}-{first_batch[-1]}")
+    check(letter['attempts'] == MAX_ATTEMPTS and letter['status_code'] == 503 and letter['error'] == 'HTTP 503',
+          "the dead letter records the attempts and the last response")
+    check(checkpoint(target) == first_batch[-1], "the checkpoint moves past the dead-lettered batch")
+    check(state.failures == 1 and state.retry_at is not None,
+          "the next batch, which failed in the same cycle, starts its own backoff")
+
+
+def check_lease(base_url: str, app) -> None:
+    from app.services.webhook_service import webhook_worker
+    print("cycles outlasting the delivery lease")
+    reset()
+    app.config['WEBHOOK_LEASE_SECONDS'] = 0.6
+    StubReceiver.slow_seconds = 1.0
+    try:
+        target = register(base_url, '/slow')
+        seqs = append_events(['subscription.created'] * BATCH_SIZE)
+        stats = webhook_worker.run_cycle()
+        check(not stats['lease_lost'] and checkpoint(target) == seqs[-1],
+              "a cycle longer than the lease renews it and settles")
+
+        reset()
+        leases = webhook_worker.lease._collection()
+        StubReceiver.steal = lambda: leases.update_one(
+            {'_id': webhook_worker.lease.name},
+            {'$set': {'holder': 'another-process', 'expires_at': datetime.now(timezone.utc) + timedelta(minutes=5)},
+             '$inc': {'fencing_token': 1}})
+        target = register(base_url, '/steal')
+        append_events(['subscription.created'] * BATCH_SIZE)
+        before = checkpoint(target)
+        stats = webhook_worker.run_cycle()
+        check(stats['lease_lost'] and checkpoint(target) == before,
+              "a cycle whose lease was taken over stops without moving the checkpoint")
+        check(webhook_worker.run_cycle() is None, "the next cycle leaves delivery to the new holder")
+    finally:
+        app.config['WEBHOOK_LEASE_SECONDS'] = Config.WEBHOOK_LEASE_SECONDS
+        StubReceiver.slow_seconds = 0.0
+        StubReceiver.steal = None
+
+
+def main():
+    app = build_app()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubReceiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        with app.app_context():
+            check_filtering_and_checkpoint(base_url)
+            check_backoff_and_dead_letters(base_url)
+            check_lease(base_url, app)
+    finally:
+        server.shutdown()
+    print("All webhook delivery checks passed.")
+
+
+if __name__ == '__main__':
+    main()
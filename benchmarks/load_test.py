@@ -0,0 +1,300 @@
+"""
+Load/benchmark suite for the subscription API.
+
+Boots `create_app` against a local stand-in MongoDB (mongomock by default, or a
+real mongod via --mongo-uri), seeds plans and subscriptions, drives every
+endpoint concurrently through Flask test clients and reports throughput and
+p50/p95/p99 latency per endpoint. It also times the bulk expiration job at
+several backlog sizes. Results are written as JSON so runs can be compared:
+
+    python benchmarks/load_test.py --output before.json
+    python benchmarks/load_test.py --output after.json --compare before.json
+
+Use a throwaway database: the suite drops the plans and subscriptions
+collections of the database it is pointed at.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app  # noqa: E402
+from app.core.config import Config  # noqa: E402
+
+PLANS = [
+    ('Free Trial', '0.00', 14, ['Up to 1 project', 'Community support']),
+    ('Basic', '9.99', 30, ['Up to 5 projects', 'Email support', '10 GB storage']),
+    ('Pro', '29.99', 30, ['Unlimited projects', 'Priority support', '100 GB storage', 'API access']),
+    ('Team', '79.99', 30, ['Everything in Pro', 'Up to 20 seats', 'SSO', 'Audit log', 'Shared workspaces']),
+    ('Enterprise', '899.00', 365, ['Everything in Team', 'Unlimited seats', 'Dedicated support', 'Custom SLA',
+                                   'On-prem connector', 'Data residency']),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_app(mongo_uri):
+    settings = {'host': mongo_uri or 'mongodb://localhost/subscription_bench'}
+    if not mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install -r benchmarks/requirements.txt, or pass --mongo-uri.")
+        settings['mongo_client_class'] = mongomock.MongoClient
+
+    class BenchConfig(Config):
+        MONGODB_SETTINGS = settings
+        SCHEDULER_API_ENABLED = False
+        DEBUG = False
+        if not mongo_uri:
+            # mongomock has no sessions, which catalog reads from secondaries use
+            MONGO_CATALOG_READ_PREFERENCE = 'primary'
+
+    app = create_app(BenchConfig)
+    app.logger.setLevel(logging.WARNING)
+    return app
+
+
+def seed(app, users, new_users):
+    from app.models.plan import Plan
+    from app.models.subscription import Subscription
+    from app.core.security import generate_token
+
+    with app.app_context():
+        Plan.drop_collection()
+        Subscription.drop_collection()
+        plans = [Plan(name=name, price=price, duration_days=days, features=features).save()
+                 for name, price, days, features in PLANS]
+
+        now = datetime.now(timezone.utc)
+        collection = Subscription._get_collection()
+        Subscription.ensure_indexes()
+        docs = []
+        for i in range(users):
+            plan = plans[i % len(plans)]
+            sub = Subscription(user_id=f'bench-user-{i}', start_date=now, created_at=now, updated_at=now)
+            sub.set_plan(plan)
+            sub._calculate_end_date()
+            docs.append(sub.to_mongo().to_dict())
+            # Some history per user, as long-lived accounts have
+            for months_ago in range(1, 1 + i % 4):
+                past = now - timedelta(days=31 * months_ago)
+                docs.append(dict(docs[-1], _id=None, start_date=past, end_date=past + timedelta(days=30),
+                                 status='EXPIRED'))
+                docs[-1].pop('_id')
+        collection.insert_many(docs)
+
+        tokens = {f'bench-user-{i}': generate_token(f'bench-user-{i}') for i in range(users)}
+        tokens.update({f'bench-new-{i}': generate_token(f'bench-new-{i}') for i in range(new_users)})
+        return [str(plan.id) for plan in plans], tokens
+
+
+def make_scenarios(plan_ids, users):
+    """Each scenario is (name, method, path_fn, body_fn, user_fn); *_fn receive the request index."""
+    def seeded_user(i):
+        return f'bench-user-{i % users}'
+
+    def new_user(i):
+        # POST creates one subscription per new user; DELETE then cancels each once
+        return f'bench-new-{i}'
+
+    return [
+        ('GET /health', 'GET', lambda i: '/health', None, None),
+        ('GET /api/plans', 'GET', lambda i: '/api/plans', None, None),
+        ('GET /api/plans/<id>', 'GET', lambda i: f'/api/plans/{plan_ids[i % len(plan_ids)]}', None, None),
+        ('GET /api/subscriptions/<user_id>', 'GET',
+         lambda i: f'/api/subscriptions/{seeded_user(i)}', None, seeded_user),
+        ('PUT /api/subscriptions/<user_id>', 'PUT',
+         lambda i: f'/api/subscriptions/{seeded_user(i)}',
+         lambda i: {'plan_id': plan_ids[(i // users + 1 + i) % len(plan_ids)]}, seeded_user),
+        ('POST /api/subscriptions', 'POST', lambda i: '/api/subscriptions',
+         lambda i: {'plan_id': plan_ids[i % len(plan_ids)]}, new_user),
+        ('DELETE /api/subscriptions/<user_id>', 'DELETE',
+         lambda i: f'/api/subscriptions/{new_user(i)}', None, new_user),
+    ]
+
+
+def run_scenario(app, scenario, tokens, requests_count, concurrency):
+    name, method, path_fn, body_fn, user_fn = scenario
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        headers = {}
+        if user_fn is not None:
+            headers['Authorization'] = f'Bearer {tokens[user_fn(i)]}'
+        kwargs = {'headers': headers}
+        if body_fn is not None:
+            kwargs['json'] = body_fn(i)
+        started = time.perf_counter()
+        response = client.open(path_fn(i), method=method, **kwargs)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 3),
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def run_expiration(app, size, batch_size):
+    from app.models.subscription import Subscription
+    from app.services.expiration_service import ExpirationService
+
+    with app.app_context():
+        Subscription.drop_collection()
+        Subscription.ensure_indexes()
+        collection = Subscription._get_collection()
+        past = datetime.now(timezone.utc) - timedelta(days=1)
+        chunk = 10000
+        for start in range(0, size, chunk):
+            collection.insert_many([
+                {'user_id': f'expire-{i}', 'plan': None, 'start_date': past - timedelta(days=30),
+                 'end_date': past, 'status': 'ACTIVE', 'created_at': past, 'updated_at': past}
+                for i in range(start, min(size, start + chunk))
+            ])
+        result = ExpirationService.expire_due_subscriptions(batch_size=batch_size, max_batches=0)
+        data = result.as_dict()
+        data.pop('cutoff')
+        data['documents'] = size
+        data['batch_size'] = batch_size
+        data['docs_per_second'] = round(result.expired / result.duration_seconds, 1) if result.duration_seconds else None
+        return data
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as fh:
+        previous = json.load(fh)
+    print(f"\nComparison with {previous_path} (rev {previous['meta'].get('git_revision')}):")
+    print(f"{'endpoint':<40}{'rps':>12}{'p50':>12}{'p95':>12}{'p99':>12}")
+
+    def delta(new, old):
+        if not old or new is None:
+            return 'n/a'
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    for name, stats in current['endpoints'].items():
+        old = previous.get('endpoints', {}).get(name)
+        if not old:
+            continue
+        print(f"{name:<40}{delta(stats['throughput_rps'], old['throughput_rps']):>12}"
+              + ''.join(f"{delta(stats['latency_ms'][p], old['latency_ms'][p]):>12}" for p in ('p50', 'p95', 'p99')))
+    old_expiration = {run['documents']: run for run in previous.get('expiration', [])}
+    for run in current['expiration']:
+        old = old_expiration.get(run['documents'])
+        if old:
+            print(f"{'expiration ' + str(run['documents']):<40}"
+                  f"{delta(run['docs_per_second'], old['docs_per_second']):>12} docs/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', help='Real MongoDB URI (with database name). Default: in-memory mongomock.')
+    parser.add_argument('--users', type=int, default=500, help='Seeded users with subscriptions.')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--expiration-sizes', default=None,
+                        help='Comma-separated backlog sizes for the expiration job '
+                             '(default 10000,100000,1000000 with --mongo-uri; 1000 with mongomock, '
+                             'whose in-memory updates get slow on large backlogs).')
+    parser.add_argument('--expiration-batch-size', type=int, default=1000)
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--skip-expiration', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write JSON results to this file.')
+    parser.add_argument('--compare', help='Previous JSON results to compare against.')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = build_app(args.mongo_uri)
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': 'mongodb' if args.mongo_uri else 'mongomock',
+            'users': args.users,
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'endpoints': {},
+        'expiration': [],
+    }
+
+    if not args.skip_endpoints:
+        plan_ids, tokens = seed(app, args.users, args.requests)
+        print(f"{'endpoint':<40}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  status codes")
+        for scenario in make_scenarios(plan_ids, args.users):
+            stats = run_scenario(app, scenario, tokens, args.requests, args.concurrency)
+            results['endpoints'][scenario[0]] = stats
+            lat = stats['latency_ms']
+            print(f"{scenario[0]:<40}{stats['throughput_rps']:>10}{lat['p50']:>10}{lat['p95']:>10}{lat['p99']:>10}"
+                  f"  {stats['status_codes']}")
+
+    if not args.skip_expiration:
+        sizes = args.expiration_sizes or ('10000,100000,1000000' if args.mongo_uri else '1000')
+        for size in (int(s) for s in sizes.split(',') if s.strip()):
+            run = run_expiration(app, size, args.expiration_batch_size)
+            results['expiration'].append(run)
+            print(f"expiration {size:>9} docs: {run['duration_seconds']:.3f}s, {run['batches']} batches, "
+                  f"{run['docs_per_second']} docs/s")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
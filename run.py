@@ -1,5 +1,29 @@
-from app import create_app
-from app.core.config import Config
+import sys
+import time
+
+# `python run.py --profile-startup` times each startup component, prints the
+# report and exits without serving (see app/core/startup_profile.py).
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+_boot_started = time.perf_counter()
+_modules_at_boot = set(sys.modules)
+
+from app import create_app  # noqa: E402
+from app.core.config import Config  # noqa: E402
+from app.core.startup_profile import profiler  # noqa: E402
+
+if PROFILE_STARTUP:
+    profiler.enable()
+    profiler.record('import app package', _boot_started, _modules_at_boot)
+
+    class ProfileConfig(Config):
+        # Starting the scheduler would run an expiration cycle immediately.
+        SCHEDULER_API_ENABLED = False
+
+    app = create_app(ProfileConfig)
+    print(profiler.report())
+    print("\nThe scheduler is not started while profiling. "
+          "Run with `python -X importtime` for a per-module breakdown.")
+    sys.exit(0)
 
 app = create_app(Config)
 